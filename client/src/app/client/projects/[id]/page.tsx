@@ -140,8 +140,7 @@ export default function ProjectDetailPage() {
         setLoadingProposals(true);
         try {
           const projectId = parseInt(project.id.split('-')[0].replace('project', ''));
-          const response = await proposalsService.getProjectProposals(projectId);
-          setProposals(response.results);
+          setProposals(await proposalsService.getAllProjectProposals(projectId));
         } catch (error) {
           console.error('Failed to fetch proposals:', error);
         } finally {
@@ -331,13 +330,11 @@ export default function ProjectDetailPage() {
         
         // Refresh proposals to get server data
         const projectId = parseInt(project.id.split('-')[0].replace('project', ''));
-        const proposalsResponse = await proposalsService.getProjectProposals(projectId);
-        setProposals(proposalsResponse.results);
+        setProposals(await proposalsService.getAllProjectProposals(projectId));
       } else {
         // Refresh proposals if no contract was created
         const projectId = parseInt(project.id.split('-')[0].replace('project', ''));
-        const proposalsResponse = await proposalsService.getProjectProposals(projectId);
-        setProposals(proposalsResponse.results);
+        setProposals(await proposalsService.getAllProjectProposals(projectId));
       }
     } catch (error) {
       console.error('Failed to accept proposal:', error);
@@ -350,8 +347,7 @@ export default function ProjectDetailPage() {
       await proposalsService.rejectProposal(proposalId, reason);
       // Refresh proposals
       const projectId = parseInt(project.id.split('-')[0].replace('project', ''));
-      const response = await proposalsService.getProjectProposals(projectId);
-      setProposals(response.results);
+      setProposals(await proposalsService.getAllProjectProposals(projectId));
       setShowProposalModal(false);
     } catch (error) {
       console.error('Failed to reject proposal:', error);
@@ -78,6 +78,8 @@ export default function MessagesPage() {
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const fileInputRef = useRef<HTMLInputElement>(null);
   const wsRef = useRef<WebSocket | null>(null);
+  const selectedChatRef = useRef<number | null>(null);
+  const [wsReady, setWsReady] = useState(false);
 
   // Load initial data
   useEffect(() => {
@@ -115,18 +117,36 @@ export default function MessagesPage() {
     loadInitialData();
   }, [searchParams]);
 
-  // Load messages for selected conversation and setup WebSocket
+  // One WebSocket for all conversations, closed when leaving the page
   useEffect(() => {
+    setupWebSocket();
+    
+    return () => {
+      if (wsRef.current) {
+        wsRef.current.close();
+      }
+    };
+  }, []);
+
+  // Follow every listed conversation over the shared socket
+  useEffect(() => {
+    if (wsReady) {
+      subscribe([...conversations.map(conv => conv.id), ...(selectedChat ? [selectedChat] : [])]);
+    }
+  }, [conversations.length, wsReady]);
+
+  // Load messages for selected conversation
+  useEffect(() => {
+    selectedChatRef.current = selectedChat;
+    
     const loadMessages = async () => {
       if (selectedChat) {
         try {
+          subscribe([selectedChat]);
           const response = await messagingService.getMessages(selectedChat);
           setMessages(response.results.reverse()); // Reverse to show oldest first
           // Mark conversation as read
           await messagingService.markConversationAsRead(selectedChat);
-          
-          // Setup WebSocket for real-time messaging
-          setupWebSocket(selectedChat);
         } catch (error) {
           console.error('Error loading messages:', error);
         }
@@ -134,13 +154,6 @@ export default function MessagesPage() {
     };
 
     loadMessages();
-    
-    // Cleanup WebSocket on conversation change
-    return () => {
-      if (wsRef.current) {
-        wsRef.current.close();
-      }
-    };
   }, [selectedChat]);
   
   // State for auto-scroll control
@@ -158,8 +171,15 @@ export default function MessagesPage() {
     }
   }, [messages.length, autoScroll, userScrolledUp]); // Only trigger when length changes, not content
   
-  // Setup WebSocket connection for real-time messaging
-  const setupWebSocket = (conversationId: number) => {
+  // Subscribe the shared socket to conversations, already subscribed ones are ignored
+  const subscribe = (conversationIds: number[]) => {
+    if (conversationIds.length > 0 && wsRef.current?.readyState === WebSocket.OPEN) {
+      wsRef.current.send(JSON.stringify({ type: 'subscribe', conversation_ids: conversationIds }));
+    }
+  };
+
+  // Setup the multiplexed WebSocket connection for real-time messaging
+  const setupWebSocket = () => {
     if (wsRef.current) {
       wsRef.current.close();
     }
@@ -174,32 +194,36 @@ export default function MessagesPage() {
       
       // Add token to WebSocket URL as query parameter
       const wsUrl = token 
-        ? `ws://localhost:8000/ws/chat/${conversationId}/?token=${token}`
-        : `ws://localhost:8000/ws/chat/${conversationId}/`;
+        ? `ws://localhost:8000/ws/?token=${token}`
+        : `ws://localhost:8000/ws/`;
       
-      wsRef.current = new WebSocket(wsUrl);
+      const ws = new WebSocket(wsUrl);
+      wsRef.current = ws;
       
-      wsRef.current.onopen = () => {
+      ws.onopen = () => {
         console.log('WebSocket connected successfully to:', wsUrl);
+        setWsReady(true);
       };
       
-      wsRef.current.onmessage = (event) => {
+      ws.onmessage = (event) => {
         const data = JSON.parse(event.data);
         console.log('WebSocket message received:', data);
         
         if (data.type === 'new_message') {
-          setMessages(prev => {
-            // Check if message already exists
-            const exists = prev.some(msg => msg.id === data.message.id);
-            if (!exists) {
-              return [...prev, data.message];
-            }
-            return prev;
-          });
+          if (data.conversation_id === selectedChatRef.current) {
+            setMessages(prev => {
+              // Check if message already exists
+              const exists = prev.some(msg => msg.id === data.message.id);
+              if (!exists) {
+                return [...prev, data.message];
+              }
+              return prev;
+            });
+          }
           
           // Update conversation list with new message
           setConversations(prev => prev.map(conv => 
-            conv.id === conversationId 
+            conv.id === data.conversation_id 
               ? { ...conv, last_message: data.message, unread_count: data.message.sender.id !== currentUser?.id ? conv.unread_count + 1 : 0 }
               : conv
           ));
@@ -213,14 +237,15 @@ export default function MessagesPage() {
         }
       };
       
-      wsRef.current.onerror = (error) => {
+      ws.onerror = (error) => {
         console.error('WebSocket connection failed:', error);
         console.error('WebSocket URL was:', wsUrl);
         console.error('Token available:', !!token);
       };
       
-      wsRef.current.onclose = (event) => {
+      ws.onclose = (event) => {
         console.log('WebSocket disconnected. Code:', event.code, 'Reason:', event.reason);
+        setWsReady(false);
       };
     } catch (error) {
       console.warn('WebSocket not supported or backend not configured for WebSocket');
@@ -359,7 +384,8 @@ export default function MessagesPage() {
       // Send message to server
       const messageData = {
         content: messageContent || 'File attachment',
-        message_type: filesToUpload.length > 0 ? 'file' : 'text' as const
+        message_type: filesToUpload.length > 0 ? 'file' : 'text' as const,
+        upload_ids: uploadedAttachments.map(upload => upload.upload_id)
       };
       
       const sentMessage = await messagingService.sendMessage(selectedChat, messageData);
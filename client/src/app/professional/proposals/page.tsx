@@ -30,7 +30,9 @@ export default function ProposalsPage() {
   const [searchQuery, setSearchQuery] = useState('');
   const [selectedFilter, setSelectedFilter] = useState('all');
   const [proposals, setProposals] = useState<Proposal[]>([]);
+  const [nextPage, setNextPage] = useState<string | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string | null>(null);
 
   // Fetch proposals from backend
@@ -39,6 +41,7 @@ export default function ProposalsPage() {
       try {
         setLoading(true);
         setError(null);
+        setNextPage(null);
         const response = await proposalsService.getProfessionalProposals({
           status: selectedTab === 'all' ? undefined : selectedTab,
           search: searchQuery || undefined
@@ -47,8 +50,9 @@ export default function ProposalsPage() {
         // Handle different response formats
         if (Array.isArray(response)) {
           setProposals(response);
-        } else if (response && Array.isArray(response.proposals)) {
-          setProposals(response.proposals);
+        } else if (response && Array.isArray(response.results)) {
+          setProposals(response.results);
+          setNextPage(response.next);
         } else {
           setProposals([]);
         }
@@ -68,6 +72,21 @@ export default function ProposalsPage() {
     }
   }, [isAuthenticated, isLoading, user, selectedTab, searchQuery]);
 
+  // Proposals are keyset paginated, older ones are fetched from `next`
+  const loadMoreProposals = async () => {
+    if (!nextPage) return;
+    try {
+      setLoadingMore(true);
+      const response = await proposalsService.getNextProposals(nextPage);
+      setProposals(current => [...current, ...response.results]);
+      setNextPage(response.next);
+    } catch (err) {
+      console.error('Error fetching more proposals:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const tabs = [
     { id: 'all', label: 'All Proposals', count: proposals.length },
     { id: 'pending', label: 'Pending', count: proposals.filter(p => p.status === 'pending').length },
@@ -437,6 +456,18 @@ export default function ProposalsPage() {
                 </div>
               </div>
             ))}
+
+            {nextPage && (
+              <div className="text-center">
+                <button
+                  onClick={loadMoreProposals}
+                  disabled={loadingMore}
+                  className="border border-gray-300 text-gray-700 px-6 py-3 rounded-xl font-semibold hover:bg-gray-50 transition-colors duration-200 disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load More Proposals'}
+                </button>
+              </div>
+            )}
           </div>
         )}
 
@@ -84,8 +84,7 @@ export default function ProjectDetailsPage() {
          // Use project ID from the fetched project data
          const projectId = projectData?.id || project?.id;
          if (projectId) {
-           const proposalsData = await proposalsService.getProjectProposals(projectId);
-           setProposals(proposalsData.results);
+           setProposals(await proposalsService.getAllProjectProposals(projectId));
          }
        } catch (err) {
          console.error('Error fetching proposals:', err);
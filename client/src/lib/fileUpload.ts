@@ -40,6 +40,32 @@ export interface UploadedFile {
   updated_at: string;
 }
 
+export interface UploadSession {
+  upload_id: string;
+  target: 'file' | 'message_attachment';
+  filename: string;
+  mime_type: string;
+  total_size: number;
+  received_size: number;
+  is_complete: boolean;
+  expires_at: string;
+  created_at: string;
+}
+
+export interface ChunkedUploadOptions {
+  target?: 'file' | 'message_attachment';
+  upload_purpose?: FileUploadData['upload_purpose'];
+  category?: number;
+  description?: string;
+  tags?: string[];
+  is_public?: boolean;
+  chunkSize?: number;
+  onProgress?: (received: number, total: number) => void;
+}
+
+const CHUNK_SIZE = 4 * 1024 * 1024;
+const CHUNK_RETRIES = 3;
+
 export const fileUploadService = {
   // Upload a single file
   async uploadFile(data: FileUploadData): Promise<UploadedFile> {
@@ -82,6 +108,57 @@ export const fileUploadService = {
     return response.data;
   },
 
+  // Upload a file in resumable chunks, returns the complete session (not yet committed)
+  async uploadInChunks(file: File, options: ChunkedUploadOptions = {}): Promise<UploadSession> {
+    const { chunkSize = CHUNK_SIZE, onProgress, ...fields } = options;
+    const started = await api.post('/files/uploads/', {
+      ...fields,
+      filename: file.name,
+      total_size: file.size,
+      mime_type: file.type || 'application/octet-stream',
+    });
+    let session: UploadSession = started.data;
+    let failures = 0;
+
+    while (session.received_size < session.total_size) {
+      const offset = session.received_size;
+      try {
+        const response = await api.put(
+          `/files/uploads/${session.upload_id}/`,
+          file.slice(offset, offset + chunkSize),
+          {
+            headers: {
+              'Content-Type': 'application/octet-stream',
+              'Upload-Offset': offset.toString(),
+            },
+          }
+        );
+        session = response.data;
+        failures = 0;
+        onProgress?.(session.received_size, session.total_size);
+      } catch (error) {
+        if (++failures > CHUNK_RETRIES) {
+          throw error;
+        }
+        // Resume from whatever the server actually stored
+        session = (await api.get(`/files/uploads/${session.upload_id}/`)).data;
+      }
+    }
+    return session;
+  },
+
+  // Turn a complete upload into an uploaded file
+  async commitUpload(uploadId: string): Promise<UploadedFile> {
+    const response = await api.post(`/files/uploads/${uploadId}/commit/`);
+    return response.data;
+  },
+
+  // Upload a file of any size in chunks and commit it
+  async uploadLargeFile(file: File, options: ChunkedUploadOptions = {}): Promise<UploadedFile> {
+    const session = await this.uploadInChunks(file, { ...options, target: 'file' });
+    return this.commitUpload(session.upload_id);
+  },
+
   // Upload multiple files
   async uploadMultipleFiles(files: FileUploadData[]): Promise<UploadedFile[]> {
     const uploadPromises = files.map(fileData => this.uploadFile(fileData));
@@ -1,4 +1,5 @@
 import api from './api';
+import { fileUploadService, UploadSession } from './fileUpload';
 
 // Message interfaces
 export interface User {
@@ -77,12 +78,14 @@ export interface CreateMessageData {
   content: string;
   message_type?: 'text' | 'image' | 'file' | 'audio' | 'video';
   reply_to?: number;
+  // Chunked uploads attached to the message when it is created
+  upload_ids?: string[];
 }
 
 // Messaging service
 export const messagingService = {
   // Get all conversations
-  async getConversations(): Promise<{ count: number; results: Conversation[] }> {
+  async getConversations(): Promise<{ next: string | null; previous: string | null; results: Conversation[] }> {
     const response = await api.get('/messages/conversations/');
     return response.data;
   },
@@ -108,9 +111,9 @@ export const messagingService = {
     return response.data;
   },
 
-  // Get messages for a conversation
-  async getMessages(conversationId: number, page?: number): Promise<{ count: number; results: Message[] }> {
-    const params = page ? { page } : {};
+  // Get messages for a conversation, newest first. Pass before (older) or after (newer) a message id to scroll
+  async getMessages(conversationId: number, cursor?: { before?: number; after?: number }): Promise<{ next: string | null; previous: string | null; results: Message[] }> {
+    const params = cursor || {};
     const response = await api.get(`/messages/conversations/${conversationId}/messages/`, { params });
     return response.data;
   },
@@ -131,21 +134,9 @@ export const messagingService = {
     await api.delete(`/messages/conversations/${conversationId}/delete/`);
   },
 
-  // Upload message attachment
-  async uploadMessageAttachment(conversationId: number, file: File): Promise<MessageAttachment> {
-    const formData = new FormData();
-    formData.append('file', file);
-    
-    const response = await api.post(
-      `/messages/conversations/${conversationId}/attachments/upload/`,
-      formData,
-      {
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-      }
-    );
-    return response.data;
+  // Upload message attachment in resumable chunks, pass its upload_id to sendMessage
+  async uploadMessageAttachment(conversationId: number, file: File): Promise<UploadSession> {
+    return fileUploadService.uploadInChunks(file, { target: 'message_attachment' });
   },
 
   // Add message reaction
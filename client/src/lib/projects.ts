@@ -51,7 +51,10 @@ export const projectsService = {
     search?: string;
     page?: number;
   }): Promise<{ results: Project[]; count: number; next: string | null; previous: string | null }> {
-    const response = await api.get('/projects/my/', { params });
+    // The list shows the assigned professional's name, avatar and rating
+    const response = await api.get('/projects/my/', {
+      params: { ...params, expand: 'assigned_professional' }
+    });
     return response.data;
   },
 
@@ -71,20 +71,44 @@ export interface CreateProposalData {
   milestones?: Omit<ProposalMilestone, 'id' | 'created_at' | 'updated_at'>[];
 }
 
+// One keyset page of proposals, follow `next` for older ones
+export interface ProposalPage {
+  next: string | null;
+  previous: string | null;
+  results: Proposal[];
+}
+
 // Proposals service
 export const proposalsService = {
   // Get all proposals
-  async getProposals(): Promise<{ count: number; results: Proposal[] }> {
+  async getProposals(): Promise<ProposalPage> {
     const response = await api.get('/proposals/');
     return response.data;
   },
 
   // Get proposals for a specific project
-  async getProjectProposals(projectId: number): Promise<{ count: number; results: Proposal[] }> {
+  async getProjectProposals(projectId: number): Promise<ProposalPage> {
     const response = await api.get(`/proposals/project/${projectId}/`);
     return response.data;
   },
 
+  // Get the page a previous page's `next` link points to
+  async getNextProposals(next: string): Promise<ProposalPage> {
+    const response = await api.get(next);
+    return response.data;
+  },
+
+  // Get every proposal of a project, following `next` through all pages
+  async getAllProjectProposals(projectId: number): Promise<Proposal[]> {
+    let page = await proposalsService.getProjectProposals(projectId);
+    const proposals = [...page.results];
+    while (page.next) {
+      page = await proposalsService.getNextProposals(page.next);
+      proposals.push(...page.results);
+    }
+    return proposals;
+  },
+
   // Get proposal details
   async getProposal(proposalId: string): Promise<Proposal> {
     const response = await api.get(`/proposals/${proposalId}/`);
@@ -120,7 +144,7 @@ export const proposalsService = {
     status?: string;
     priority?: string;
     search?: string;
-  }): Promise<{ proposals: Proposal[]; count: number }> {
+  }): Promise<ProposalPage> {
     const searchParams = new URLSearchParams();
     if (params?.status) searchParams.append('status', params.status);
     if (params?.priority) searchParams.append('priority', params.priority);
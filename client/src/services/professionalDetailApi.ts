@@ -1,6 +1,6 @@
 import { apiClient } from './api';
 import { portfolioService } from '../lib/portfolio';
-import { proposalsService } from '../lib/proposals';
+import { proposalsService, ProposalPage } from '../lib/proposals';
 import { contractsService } from '../lib/contracts';
 import { messagingService } from '../lib/messaging';
 
@@ -209,17 +209,11 @@ class ProfessionalDetailApiService {
     }
   }
 
-  // Get professional proposals
-  async getProfessionalProposals(professionalId: number): Promise<{
-    results: any[];
-    count: number;
-  }> {
+  // Get the first page of professional proposals, follow `next` for more.
+  // Proposals are keyset paginated, no total is returned
+  async getProfessionalProposals(professionalId: number): Promise<ProposalPage> {
     try {
-      const response = await proposalsService.getProfessionalProposals();
-      return {
-        results: response.proposals,
-        count: response.count
-      };
+      return await proposalsService.getProfessionalProposals();
     } catch (error) {
       console.error('Error fetching professional proposals:', error);
       throw error;
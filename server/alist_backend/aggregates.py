@@ -0,0 +1,61 @@
+"""
+Conditional aggregation for stat endpoints.
+
+Instead of one COUNT or SUM query per status, type or purpose, each bucket
+becomes an aggregate with a filter (FILTER (WHERE ...) or CASE WHEN,
+depending on the database) so a whole stats payload comes back from one
+query:
+
+    stats = aggregate_totals(
+        entries,
+        total=Count('pk'),
+        **count_by('status', ['pending', 'approved'], prefix='status_'),
+    )
+    by_status = buckets(stats, 'status_')
+
+pivot() covers the open-ended case where the bucket values aren't known up
+front, with a single GROUP BY query.
+"""
+from django.db.models import Count, Q, Sum
+
+
+def count_by(field, values, prefix=''):
+    """{prefix + value: Count of rows where ``field`` equals value} for each value"""
+    return {
+        f'{prefix}{value}': Count('pk', filter=Q(**{field: value}))
+        for value in values
+    }
+
+
+def sum_by(field, values, sum_field, prefix=''):
+    """{prefix + value: Sum of ``sum_field`` over rows where ``field`` equals value}"""
+    return {
+        f'{prefix}{value}': Sum(sum_field, filter=Q(**{field: value}))
+        for value in values
+    }
+
+
+def aggregate_totals(queryset, **aggregates):
+    """queryset.aggregate() with empty sums reported as 0 instead of None"""
+    return {
+        name: 0 if value is None else value
+        for name, value in queryset.aggregate(**aggregates).items()
+    }
+
+
+def buckets(totals, prefix, skip_empty=False):
+    """The entries of ``totals`` named ``prefix + value`` as {value: total}"""
+    return {
+        name[len(prefix):]: value
+        for name, value in totals.items()
+        if name.startswith(prefix) and not (skip_empty and not value)
+    }
+
+
+def pivot(queryset, field, **aggregates):
+    """{value of ``field``: {aggregate: value}} from one GROUP BY query"""
+    rows = queryset.order_by().values(field).annotate(**aggregates)
+    return {
+        row.pop(field): {name: 0 if value is None else value for name, value in row.items()}
+        for row in rows
+    }
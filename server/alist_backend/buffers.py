@@ -0,0 +1,114 @@
+"""
+In-process write buffers for hot counters.
+
+Requests add items to a WriteBuffer instead of writing a row each. The
+buffer is written on a background thread once it holds its batch size, and
+a timer writes whatever is left ``interval`` seconds after the first item
+came in, so the last items of a quiet period don't wait for another
+request. Items of a failed write are put back for the next flush.
+
+Subclasses name the settings holding the batch size and interval, and
+define how items are kept (empty, store, restore) and written (write,
+written). len() of the container is the batch size compared against.
+"""
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+
+class WriteBuffer:
+    """Items written to the database in batches, by size or after an interval"""
+    batch_setting = None
+    default_batch = 100
+    interval_setting = None
+    default_interval = 10
+
+    def __init__(self):
+        self.items = self.empty()
+        self.lock = threading.Lock()
+        self.flushing = False
+        self.timer = None
+
+    def empty(self):
+        """A new, empty container of items"""
+        raise NotImplementedError
+
+    def store(self, items, *item):
+        """Add one item to ``items``"""
+        raise NotImplementedError
+
+    def restore(self, items):
+        """Put back the items of a failed write"""
+        raise NotImplementedError
+
+    def write(self, items):
+        """Write ``items``, returns the ones written"""
+        raise NotImplementedError
+
+    def written(self, items):
+        """Called with the written items once they are saved"""
+
+    def batch_size(self):
+        return getattr(settings, self.batch_setting, self.default_batch)
+
+    def interval(self):
+        return getattr(settings, self.interval_setting, self.default_interval)
+
+    def add(self, *item):
+        with self.lock:
+            self.store(self.items, *item)
+            due = not self.flushing and len(self.items) >= self.batch_size()
+            if due:
+                self.flushing = True
+            else:
+                self.schedule()
+        if due:
+            threading.Thread(target=self.flush_in_background, daemon=True).start()
+
+    def schedule(self):
+        """Start the flush timer unless one is running, call with the lock held"""
+        if self.timer is None:
+            self.timer = threading.Timer(self.interval(), self.flush_on_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush_on_timer(self):
+        with self.lock:
+            self.timer = None
+            # A running flush schedules the timer again for what it left
+            if self.flushing or not self.items:
+                return
+            self.flushing = True
+        self.flush_in_background()
+
+    def flush_in_background(self):
+        try:
+            self.flush()
+        finally:
+            with self.lock:
+                self.flushing = False
+                if self.items:
+                    self.schedule()
+            # The thread's own connection isn't closed by the request cycle
+            connection.close()
+
+    def flush(self):
+        """Write the buffered items, returns how many were written"""
+        with self.lock:
+            items, self.items = self.items, self.empty()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not items:
+            return 0
+        try:
+            written = self.write(items)
+        except Exception:
+            # Keep the items for the next flush rather than losing them
+            with self.lock:
+                self.restore(items)
+                self.schedule()
+            raise
+        self.written(written)
+        return len(written)
@@ -26,6 +26,14 @@ app.conf.beat_schedule = {
         'task': 'projects.tasks.update_project_statistics',
         'schedule': 3600.0,  # Run every hour
     },
+    'refresh-dashboard-stats': {
+        'task': 'dashboard.tasks.refresh_dashboard_stats',
+        'schedule': 3600.0,  # Run every hour
+    },
+    'collect-unreferenced-blobs': {
+        'task': 'file_management.tasks.collect_unreferenced_blobs',
+        'schedule': 3600.0,  # Run every hour
+    },
     'cleanup-old-sessions': {
         'task': 'authentication.tasks.cleanup_old_sessions',
         'schedule': 86400.0,  # Run daily
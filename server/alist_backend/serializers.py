@@ -0,0 +1,67 @@
+"""
+Serializer helpers shared by the apps.
+
+SparseFieldsetMixin lets list endpoints return only what a client asks for:
+
+    ?fields=id,title,status       only these fields
+    ?expand=assigned_professional  swap in the serializer the field has in
+                                   Meta.expandable_fields
+
+    class ProjectListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+        class Meta:
+            expandable_fields = {
+                'assigned_professional': (UserBasicSerializer, {'read_only': True}),
+            }
+
+Fields left out are removed before serialization, so their
+SerializerMethodFields and nested serializers never run. Expansions that
+need related rows are prefetched by the view, see expand_requested().
+"""
+from django.utils.module_loading import import_string
+from rest_framework import serializers
+
+FIELDS_QUERY_PARAM = 'fields'
+EXPAND_QUERY_PARAM = 'expand'
+
+
+def query_names(request, param):
+    """The comma separated names in the request's ``param``, empty when absent"""
+    value = request.query_params.get(param) if request is not None else None
+    if not value:
+        return set()
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def expand_requested(request, name):
+    """Whether the request asks for ``name`` with ``?expand=``"""
+    return name in query_names(request, EXPAND_QUERY_PARAM)
+
+
+class SparseFieldsetMixin:
+    def is_top_level(self):
+        """Whether this is the serializer the view created, or its list's child"""
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_top_level():
+            return fields
+        request = self.context.get('request')
+
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for name in query_names(request, EXPAND_QUERY_PARAM) & set(expandable):
+            serializer_class, kwargs = expandable[name]
+            if isinstance(serializer_class, str):
+                # Dotted path, for serializers of apps that import this one
+                serializer_class = import_string(serializer_class)
+            fields[name] = serializer_class(**kwargs)
+
+        requested = query_names(request, FIELDS_QUERY_PARAM)
+        if requested:
+            kept = {name: field for name, field in fields.items() if name in requested}
+            # Unknown names alone would otherwise return empty objects
+            fields = kept or fields
+        return fields
@@ -71,6 +71,7 @@ LOCAL_APPS = [
     'file_management',
     'location_services',
     'dashboard',
+    'search',
 ]
 
 INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
@@ -179,7 +180,8 @@ AUTH_USER_MODEL = 'authentication.User'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Plain JWTAuthentication unless JWT_USER_CACHE_REST is on
+        'authentication.token_cache.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
@@ -193,6 +195,9 @@ REST_FRAMEWORK = {
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Reverse proxies in front of the app whose X-Forwarded-For is trusted,
+    # with none the client address is REMOTE_ADDR
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 
 # JWT Configuration
@@ -222,6 +227,12 @@ SIMPLE_JWT = {
     'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(days=1),
 }
 
+# Users resolved from access tokens are cached per process for up to
+# JWT_USER_CACHE_TTL seconds (WebSocket handshakes always, REST when enabled)
+JWT_USER_CACHE_TTL = int(os.environ.get('JWT_USER_CACHE_TTL', 60))
+JWT_USER_CACHE_SIZE = 10000
+JWT_USER_CACHE_REST = os.environ.get('JWT_USER_CACHE_REST', 'False').lower() == 'true'
+
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -319,6 +330,35 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+# Run tasks in the calling process instead of a worker, for setups without one
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'False').lower() == 'true'
+
+# Dashboard rollups: refresh DashboardStats in Celery instead of on commit
+DASHBOARD_ROLLUP_ASYNC = os.environ.get('DASHBOARD_ROLLUP_ASYNC', 'False').lower() == 'true'
+
+# Full-text search: dotted path of a search.backends class, chosen from the
+# database vendor when empty (FTS5 on SQLite, GIN/tsvector on PostgreSQL)
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', '')
+
+# Chat write pipeline: WebSocket messages are buffered per conversation for
+# this many seconds (or until the batch is full) and persisted together
+MESSAGING_WRITE_DELAY = float(os.environ.get('MESSAGING_WRITE_DELAY', 0.005))
+MESSAGING_WRITE_BATCH_SIZE = int(os.environ.get('MESSAGING_WRITE_BATCH_SIZE', 100))
+
+# Conversation membership cache: per-process LRU in front of the default cache
+MESSAGING_MEMBERSHIP_CACHE_SIZE = 1024
+MESSAGING_MEMBERSHIP_LOCAL_TTL = 5
+MESSAGING_MEMBERSHIP_CACHE_TIMEOUT = 300
+
+# Presence registry: sockets without a heartbeat for this many seconds are
+# offline; typing indicators stop on their own after MESSAGING_TYPING_TIMEOUT.
+# Each user tracks at most MESSAGING_PRESENCE_SLOTS sockets per conversation
+MESSAGING_PRESENCE_TTL = 60
+MESSAGING_PRESENCE_SLOTS = 8
+MESSAGING_TYPING_TIMEOUT = 5
+
+# Multiplexed WebSocket (ws/): most conversations one socket may subscribe to
+MESSAGING_MAX_SUBSCRIPTIONS = 500
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -343,6 +383,48 @@ TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER', '')
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Chunked uploads (file_management.uploads): part files are kept here until
+# committed or expired, keep it on the same filesystem as MEDIA_ROOT so
+# commits are a rename
+CHUNKED_UPLOAD_DIR = os.environ.get('CHUNKED_UPLOAD_DIR', str(BASE_DIR / 'partial_uploads'))
+CHUNKED_UPLOAD_MAX_SIZE = 1024 * 1024 * 1024  # 1GB
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB
+CHUNKED_UPLOAD_EXPIRY_HOURS = 24
+
+# Content-addressed file storage: unreferenced blobs are deleted once their
+# content has not been saved again for this many seconds
+BLOB_GC_GRACE_SECONDS = 3600
+
+# File downloads: 'x-accel-redirect' (nginx, with an internal location at
+# FILE_DOWNLOAD_ACCEL_PREFIX aliasing MEDIA_ROOT) or 'x-sendfile' hands the
+# body to the front proxy, unset serves it from Django
+FILE_DOWNLOAD_OFFLOAD = os.environ.get('FILE_DOWNLOAD_OFFLOAD') or None
+FILE_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+# Buffered download counts are written after this many files or seconds
+FILE_DOWNLOAD_COUNT_BATCH = 100
+FILE_DOWNLOAD_COUNT_INTERVAL = 10
+
+# Thumbnails of uploaded images and videos: longest side of each size, and
+# whether they are rendered by a Celery worker. Only development and eager
+# Celery setups render them on commit in the web process by default
+THUMBNAIL_SIZES = {'small': 160, 'medium': 480, 'large': 1280}
+THUMBNAIL_QUALITY = 80
+MEDIA_VARIANTS_ASYNC = os.environ.get(
+    'MEDIA_VARIANTS_ASYNC', str(not (DEBUG or CELERY_TASK_ALWAYS_EAGER))
+).lower() == 'true'
+
+# Project views: repeat views by the same user or IP within the dedupe window
+# aren't counted, the rest are written after this many views or seconds
+PROJECT_VIEW_DEDUPE_SECONDS = 30 * 60
+PROJECT_VIEW_FLUSH_BATCH = 500
+PROJECT_VIEW_FLUSH_INTERVAL = 10
+PROJECT_TRENDING_HOURS = 24
+
+# Project category catalog: how long the cached catalog lives without an
+# invalidating change, and how long clients and CDNs may reuse a response
+CATEGORY_CATALOG_TIMEOUT = 60 * 60
+CATEGORY_CATALOG_MAX_AGE = 5 * 60
+
 # Security Settings
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
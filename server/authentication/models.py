@@ -202,15 +202,15 @@ class User(AbstractUser):
         return self.get_full_name() or self.username
     
     def update_rating(self, new_rating):
-        """Update user's average rating"""
-        if self.rating_count == 0:
-            self.rating_average = new_rating
-        else:
-            total_rating = self.rating_average * self.rating_count + new_rating
-            self.rating_average = total_rating / (self.rating_count + 1)
-        
-        self.rating_count += 1
-        self.save(update_fields=['rating_average', 'rating_count'])
+        """Add a rating to the running average in one atomic UPDATE"""
+        # Both expressions read the values from before the update
+        User.objects.filter(pk=self.pk).update(
+            rating_average=(
+                models.F('rating_average') * models.F('rating_count') + new_rating
+            ) / (models.F('rating_count') + 1),
+            rating_count=models.F('rating_count') + 1
+        )
+        self.refresh_from_db(fields=['rating_average', 'rating_count'])
     
     def is_professional(self):
         """Check if user is a professional (not client)"""
@@ -3,6 +3,7 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from phonenumber_field.serializerfields import PhoneNumberField
+from alist_backend.serializers import SparseFieldsetMixin
 from .models import User, UserProfile
 
 
@@ -447,7 +448,7 @@ class UserListSerializer(serializers.ModelSerializer):
         return obj.get_verification_badge()
 
 
-class ProfessionalListSerializer(serializers.ModelSerializer):
+class ProfessionalListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer خاص لقائمة المحترفين مع بيانات شاملة
     """
@@ -524,10 +525,13 @@ class ProfessionalListSerializer(serializers.ModelSerializer):
     def get_recent_reviews(self, obj):
         """Get recent reviews for this professional"""
         try:
-            from reviews.models import Review
-            reviews = Review.objects.filter(
-                professional=obj
-            ).order_by('-created_at')[:3]
+            # Prefetched for the page by ProfessionalListView
+            reviews = getattr(obj, 'recent_review_list', None)
+            if reviews is None:
+                from reviews.models import Review
+                reviews = Review.objects.filter(
+                    professional=obj
+                ).select_related('client').order_by('-created_at')[:3]
             
             return [{
                 'id': review.id,
@@ -0,0 +1,14 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .token_cache import token_users
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def drop_cached_tokens(sender, instance, **kwargs):
+    """Deactivation, password changes and deletions must not be served from the token cache"""
+    token_users.invalidate_user(instance.pk)
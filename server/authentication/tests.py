@@ -1,3 +1,44 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from .token_cache import CachedJWTAuthentication, token_users
+
+User = get_user_model()
+
+
+@override_settings(JWT_USER_CACHE_REST=True)
+class TokenUserCacheTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        token_users.clear()
+        self.user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.request = RequestFactory().get(
+            '/api/auth/user/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}'
+        )
+
+    def test_repeated_token_is_resolved_without_queries(self):
+        """The second authentication of a token is served from the cache"""
+        user, _ = CachedJWTAuthentication().authenticate(self.request)
+        self.assertEqual(user, self.user)
+
+        with self.assertNumQueries(0):
+            cached_user, token = CachedJWTAuthentication().authenticate(self.request)
+        self.assertEqual(cached_user, self.user)
+        self.assertIsNot(cached_user, user)
+        self.assertEqual(token['user_id'], self.user.id)
+
+    def test_deactivation_drops_cached_tokens(self):
+        """Saving the user invalidates the tokens cached for them"""
+        CachedJWTAuthentication().authenticate(self.request)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(self.request)
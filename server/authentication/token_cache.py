@@ -0,0 +1,112 @@
+"""
+Short-lived cache of users resolved from JWT access tokens.
+
+WebSocket handshakes (messaging.middleware.JWTAuthMiddleware) and, when
+JWT_USER_CACHE_REST is on, REST requests (CachedJWTAuthentication) look the
+raw token up here before validating it and loading the user. Entries live
+for JWT_USER_CACHE_TTL seconds at most, never past the token's own expiry,
+and the cache holds at most JWT_USER_CACHE_SIZE tokens.
+
+Saving or deleting a user drops every token cached for them (see
+signals.py), which covers deactivation and password changes in this
+process; other processes pick the change up when their entries expire.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+def _key(raw_token):
+    return raw_token.encode() if isinstance(raw_token, str) else raw_token
+
+
+class TokenUserCache:
+    """Thread-safe LRU of raw token -> (user, validated token)"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.tokens_by_user = {}
+        self.lock = threading.Lock()
+
+    def get(self, raw_token):
+        """(user, validated_token) for a cached token, the user is a private copy"""
+        key = _key(raw_token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            user, validated_token, expires = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+        # Requests may modify request.user, don't share the instance
+        return copy.copy(user), validated_token
+
+    def set(self, raw_token, user, validated_token):
+        lifetime = min(self.ttl, validated_token.get('exp', 0) - time.time())
+        if lifetime <= 0 or not user.is_active:
+            return
+        key = _key(raw_token)
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (copy.copy(user), validated_token, time.monotonic() + lifetime)
+            self.tokens_by_user.setdefault(user.pk, set()).add(key)
+            while len(self.entries) > self.maxsize:
+                self._remove(next(iter(self.entries)))
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for key in list(self.tokens_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tokens_by_user.clear()
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        tokens = self.tokens_by_user.get(entry[0].pk)
+        if tokens is not None:
+            tokens.discard(key)
+            if not tokens:
+                del self.tokens_by_user[entry[0].pk]
+
+
+token_users = TokenUserCache(
+    getattr(settings, 'JWT_USER_CACHE_SIZE', 10000),
+    getattr(settings, 'JWT_USER_CACHE_TTL', 60),
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that shares token_users when JWT_USER_CACHE_REST is on"""
+
+    def authenticate(self, request):
+        if not getattr(settings, 'JWT_USER_CACHE_REST', False):
+            return super().authenticate(request)
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        cached = token_users.get(raw_token)
+        if cached is not None:
+            return cached
+
+        validated_token = self.get_validated_token(raw_token)
+        user = self.get_user(validated_token)
+        token_users.set(raw_token, user, validated_token)
+        return user, validated_token
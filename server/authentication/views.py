@@ -7,12 +7,14 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
 from django.conf import settings
-from django.db.models import Q
 from django.utils import timezone
+from django.db.models import Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from drf_spectacular.utils import extend_schema, OpenApiParameter, extend_schema_field
 from drf_spectacular.types import OpenApiTypes
+from reviews.models import Review
+from search.index import rank_queryset
 from .models import User, UserProfile
 from .serializers import (
     UserRegistrationSerializer,
@@ -382,7 +384,12 @@ class ProfessionalListView(generics.ListAPIView):
                 # Search in skills for category
                 queryset = queryset.filter(skills__icontains=category)
         
-        return queryset
+        # The serializer's recent_reviews, for the whole page in one query
+        return queryset.prefetch_related(Prefetch(
+            'received_reviews',
+            queryset=Review.objects.select_related('client').order_by('-created_at')[:3],
+            to_attr='recent_review_list'
+        ))
     
     @extend_schema(
         operation_id="list_professionals",
@@ -701,23 +708,18 @@ def user_search(request):
     if not query:
         return Response({'error': 'Query parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Build search query
-    search_query = Q(is_active=True) & (
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query) |
-        Q(company_name__icontains=query) |
-        Q(skills__icontains=query)
-    )
-    
+    users = User.objects.filter(is_active=True)
     if user_type:
-        search_query &= Q(user_type=user_type)
+        users = users.filter(user_type=user_type)
     
-    users = User.objects.filter(search_query)[:20]  # Limit results
+    # Ranked matches from the full-text index on name, company and skills
+    users = rank_queryset(users, 'user', query)
+    users = users.order_by('-search_rank', '-pk')[:20]  # Limit results
     
     serializer = UserListSerializer(users, many=True)
     return Response({
         'results': serializer.data,
-        'count': users.count()
+        'count': len(serializer.data)
     }, status=status.HTTP_200_OK)
 
 
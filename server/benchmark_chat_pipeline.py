@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+Load benchmark for chat message persistence.
+
+Simulates bursty WebSocket chats: every participant of every synthetic
+conversation sends messages back to back, all conversations at once, and
+the persisted messages/sec is compared between:
+
+- per message: the previous ChatConsumer path, one database_sync_to_async
+  call to create the message and another to save the conversation
+- pipeline: messaging.pipeline, buffered per conversation and bulk inserted
+
+Database work runs on the single sync thread used for thread-sensitive
+calls, as under an ASGI server. Synthetic users, conversations and
+messages are deleted at the end.
+
+Usage:
+    python benchmark_chat_pipeline.py [--conversations 50] [--messages 100]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alist_backend.settings')
+django.setup()
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+
+from messaging.models import Conversation, Message
+from messaging.pipeline import MessageWritePipeline
+from messaging.serializers import MessageResponseSerializer
+
+User = get_user_model()
+
+
+def create_conversations(count):
+    """Two-person conversations, returns [(conversation_id, users)]"""
+    users = User.objects.bulk_create([
+        User(username=f'bench_chat_{i}', email=f'bench_chat_{i}@example.com', password='!')
+        for i in range(count * 2)
+    ])
+    conversations = []
+    for i in range(count):
+        conversation = Conversation.objects.create()
+        conversation.participants.add(*users[2 * i:2 * i + 2])
+        conversations.append((conversation.id, users[2 * i:2 * i + 2]))
+    return conversations
+
+
+def cleanup():
+    conversation_ids = list(Conversation.objects.filter(
+        participants__username__startswith='bench_chat_'
+    ).values_list('id', flat=True).distinct())
+    Message.objects.filter(conversation_id__in=conversation_ids).delete()
+    Conversation.objects.filter(id__in=conversation_ids).delete()
+    User.objects.filter(username__startswith='bench_chat_').delete()
+
+
+@database_sync_to_async
+def create_message(conversation_id, sender, content):
+    conversation = Conversation.objects.get(id=conversation_id)
+    return Message.objects.create(conversation=conversation, sender=sender, content=content)
+
+
+@database_sync_to_async
+def serialize_message(message):
+    return MessageResponseSerializer(message).data
+
+
+@database_sync_to_async
+def update_conversation_last_message(conversation_id, message):
+    conversation = Conversation.objects.get(id=conversation_id)
+    conversation.last_message = message.content
+    conversation.last_message_sender = message.sender
+    conversation.last_message_at = message.created_at
+    conversation.save()
+
+
+async def per_message_sender(conversation_id, sender, count):
+    channel_layer = get_channel_layer()
+    for i in range(count):
+        message = await create_message(conversation_id, sender, f'Message {i}')
+        data = await serialize_message(message)
+        await channel_layer.group_send(f'chat_{conversation_id}', {'type': 'new_message', 'conversation_id': conversation_id, 'message': data})
+        await update_conversation_last_message(conversation_id, message)
+
+
+async def pipeline_sender(pipeline, conversation_id, sender, count):
+    for i in range(count):
+        await pipeline.submit(conversation_id, sender, f'Message {i}')
+
+
+async def run_load(label, make_sender, conversations, count):
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        make_sender(conversation_id, sender, count)
+        for conversation_id, users in conversations for sender in users
+    ])
+    elapsed = time.perf_counter() - start
+    total = len(conversations) * 2 * count
+    print(f"{label:<12} {total / elapsed:9.0f} messages/sec  ({total} in {elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--conversations', type=int, default=50)
+    parser.add_argument('--messages', type=int, default=100, help='Messages per participant')
+    args = parser.parse_args()
+
+    cleanup()
+    try:
+        conversations = create_conversations(args.conversations)
+        print(f"{args.conversations} conversations, 2 senders each, {args.messages} messages per sender\n")
+
+        asyncio.run(run_load('per message', per_message_sender, conversations, args.messages))
+
+        pipeline = MessageWritePipeline()
+        asyncio.run(run_load(
+            'pipeline',
+            lambda conversation_id, sender, count: pipeline_sender(pipeline, conversation_id, sender, count),
+            conversations,
+            args.messages
+        ))
+    finally:
+        cleanup()
+        print("\nSynthetic data deleted")
+
+
+if __name__ == '__main__':
+    main()
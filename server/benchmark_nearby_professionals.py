@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""
+Benchmark nearby professional search against synthetic locations.
+
+Countries and cities come from create_sample_locations.py; every synthetic
+professional gets a public address with random coordinates inside the
+continental United States. The data is created inside a transaction that is
+rolled back at the end, so the database is left untouched.
+
+Usage:
+    python benchmark_nearby_professionals.py [--count 100000] [--queries 50]
+"""
+import argparse
+import os
+import random
+import time
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alist_backend.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from create_sample_locations import create_sample_countries, create_sample_cities
+from location_services.geo import encode_geohash, haversine_km
+from location_services.models import Address, UserLocation
+from location_services.views import LocationSearchViewSet
+
+User = get_user_model()
+
+# Continental United States
+LAT_RANGE = (25.0, 49.0)
+LNG_RANGE = (-124.0, -67.0)
+BATCH_SIZE = 5000
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_synthetic_professionals(count, cities):
+    """Create ``count`` professionals with one public location each"""
+    rng = random.Random(42)
+    user_types = ['home_pro', 'specialist', 'crew_member']
+
+    for start in range(0, count, BATCH_SIZE):
+        size = min(BATCH_SIZE, count - start)
+        users = User.objects.bulk_create([
+            User(
+                username=f'bench_pro_{start + i}',
+                email=f'bench_pro_{start + i}@example.com',
+                user_type=user_types[i % 3],
+                password='!',
+            )
+            for i in range(size)
+        ])
+
+        addresses = []
+        for i in range(size):
+            lat = rng.uniform(*LAT_RANGE)
+            lng = rng.uniform(*LNG_RANGE)
+            addresses.append(Address(
+                street_address=f'{start + i} Benchmark St',
+                city=cities[i % len(cities)],
+                latitude=round(lat, 8),
+                longitude=round(lng, 8),
+                geohash=encode_geohash(lat, lng),
+            ))
+        Address.objects.bulk_create(addresses)
+
+        UserLocation.objects.bulk_create([
+            UserLocation(user=user, address=address, privacy_level='public', is_primary=True)
+            for user, address in zip(users, addresses)
+        ])
+
+
+def linear_scan(lat, lng, radius_km):
+    """The previous implementation: load every professional and sort in Python"""
+    user_locations = UserLocation.objects.filter(
+        Q(user__user_type__in=['home_pro', 'specialist', 'crew_member'],
+          is_active=True,
+          privacy_level__in=['public', 'professional'])
+    ).select_related('user', 'address', 'address__city')
+
+    results = []
+    for location in user_locations:
+        if location.address.latitude and location.address.longitude:
+            distance = haversine_km(
+                lat, lng, float(location.address.latitude), float(location.address.longitude)
+            )
+            if distance <= radius_km:
+                results.append((distance, location.id))
+    results.sort()
+    return len(results)
+
+
+def indexed_search(lat, lng, radius_km):
+    _, total = LocationSearchViewSet()._find_nearby_professionals(lat, lng, radius_km)
+    return total
+
+
+def run_benchmark(label, search, queries, radius_km):
+    start = time.perf_counter()
+    found = [search(lat, lng, radius_km) for lat, lng in queries]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<16} {elapsed / len(queries) * 1000:9.2f} ms/query  "
+          f"(avg {sum(found) / len(found):.1f} matches)")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--radius', type=int, default=25)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    queries = [
+        (rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE))
+        for _ in range(args.queries)
+    ]
+
+    try:
+        with transaction.atomic():
+            create_sample_countries()
+            cities = create_sample_cities()
+
+            print(f"Creating {args.count} synthetic professional locations...")
+            start = time.perf_counter()
+            create_synthetic_professionals(args.count, cities)
+            print(f"Created in {time.perf_counter() - start:.1f}s\n")
+
+            print(f"{args.queries} queries, radius {args.radius} km")
+            baseline = run_benchmark('linear scan', linear_scan, queries, args.radius)
+            indexed = run_benchmark('geohash index', indexed_search, queries, args.radius)
+            if baseline != indexed:
+                print("WARNING: result counts differ between implementations")
+
+            raise Rollback()
+    except Rollback:
+        print("\nSynthetic data rolled back")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+"""
+Benchmark read watermarks against per-message read status rows.
+
+Builds a synthetic corpus of two-person conversations (1M messages by
+default, senders alternating) and compares the previous per-message read
+tracking, one MessageReadStatus row per message per reader, with the
+watermark kept in ConversationReadTime:
+
+- catch-up: each participant reads a whole conversation for the first time
+- incremental: a few new messages arrive and the reader marks them read
+- storage: size of the read state tables once everything has been read
+
+The data is created inside a transaction that is rolled back at the end, so
+the database is left untouched.
+
+Usage:
+    python benchmark_read_watermarks.py [--conversations 1000] [--messages 1000]
+"""
+import argparse
+import os
+import random
+import time
+
+import django
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'alist_backend.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from messaging.models import Conversation, ConversationReadTime, Message, MessageReadStatus
+from messaging.read_state import mark_conversation_read
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_corpus(conversation_count, messages_per_conversation):
+    """Two-person conversations with alternating senders, returns [(conversation, users)]"""
+    users = User.objects.bulk_create([
+        User(username=f'bench_reader_{i}', email=f'bench_reader_{i}@example.com', password='!')
+        for i in range(conversation_count * 2)
+    ])
+    conversations = Conversation.objects.bulk_create([Conversation() for _ in range(conversation_count)])
+
+    through = Conversation.participants.through
+    pairs = [(conversation, users[2 * i:2 * i + 2]) for i, conversation in enumerate(conversations)]
+    through.objects.bulk_create([
+        through(conversation_id=conversation.id, user_id=user.id)
+        for conversation, participants in pairs for user in participants
+    ], batch_size=BATCH_SIZE)
+    # bulk_create skips the signals that normally create these rows
+    ConversationReadTime.objects.bulk_create([
+        ConversationReadTime(conversation=conversation, user=user, unread_count=messages_per_conversation // 2)
+        for conversation, participants in pairs for user in participants
+    ], batch_size=BATCH_SIZE)
+
+    batch = []
+    for conversation, participants in pairs:
+        for i in range(messages_per_conversation):
+            batch.append(Message(conversation=conversation, sender=participants[i % 2], content=f'Message {i}'))
+            if len(batch) >= BATCH_SIZE:
+                Message.objects.bulk_create(batch)
+                batch = []
+    Message.objects.bulk_create(batch)
+    return pairs
+
+
+def legacy_mark_read(conversation, user):
+    """The previous implementation: one read status row per unread message"""
+    already_read = MessageReadStatus.objects.filter(message=OuterRef('pk'), user=user)
+    unread_ids = Message.objects.filter(conversation=conversation).exclude(sender=user).exclude(
+        Exists(already_read)
+    ).values_list('id', flat=True)
+    MessageReadStatus.objects.bulk_create(
+        [MessageReadStatus(user=user, message_id=message_id) for message_id in unread_ids],
+        ignore_conflicts=True,
+        batch_size=BATCH_SIZE,
+    )
+    ConversationReadTime.objects.filter(conversation=conversation, user=user).update(last_read_at=timezone.now())
+
+
+def table_size(table):
+    """Bytes used by a table and its indexes"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+        else:
+            cursor.execute(
+                'SELECT SUM(pgsize) FROM dbstat WHERE name IN '
+                '(SELECT name FROM sqlite_master WHERE tbl_name = %s)',
+                [table]
+            )
+        return cursor.fetchone()[0] or 0
+
+
+def time_reads(label, mark_read, reads):
+    start = time.perf_counter()
+    for conversation, user in reads:
+        mark_read(conversation, user)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<12} {elapsed / len(reads) * 1000:9.2f} ms/read")
+
+
+def add_messages(pairs, count):
+    Message.objects.bulk_create([
+        Message(conversation=conversation, sender=participants[1], content=f'New message {i}')
+        for conversation, participants in pairs for i in range(count)
+    ], batch_size=BATCH_SIZE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--conversations', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=1000, help='Messages per conversation')
+    parser.add_argument('--samples', type=int, default=100, help='Conversations used for incremental reads')
+    parser.add_argument('--new-messages', type=int, default=20)
+    args = parser.parse_args()
+
+    try:
+        with transaction.atomic():
+            total = args.conversations * args.messages
+            print(f"Creating {total} messages in {args.conversations} conversations...")
+            start = time.perf_counter()
+            pairs = create_corpus(args.conversations, args.messages)
+            print(f"Created in {time.perf_counter() - start:.1f}s\n")
+
+            reads = [(conversation, user) for conversation, participants in pairs for user in participants]
+            print(f"Catch-up, {len(reads)} first reads of {args.messages // 2} unread messages")
+            time_reads('read status', legacy_mark_read, reads)
+            time_reads('watermark', mark_conversation_read, reads)
+
+            samples = random.Random(42).sample(pairs, min(args.samples, len(pairs)))
+            add_messages(samples, args.new_messages)
+            reads = [(conversation, participants[0]) for conversation, participants in samples]
+            print(f"\nIncremental, {len(reads)} reads of {args.new_messages} new messages")
+            time_reads('read status', legacy_mark_read, reads)
+            time_reads('watermark', mark_conversation_read, reads)
+
+            print("\nStorage once everything is read")
+            for label, model in [('read status', MessageReadStatus), ('watermark', ConversationReadTime)]:
+                size = table_size(model._meta.db_table)
+                print(f"  {label:<12} {model.objects.count():>9} rows  {size / 1024 / 1024:9.2f} MB")
+
+            raise Rollback()
+    except Rollback:
+        print("\nSynthetic data rolled back")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+"""
+Availability engine for professional calendars.
+
+Working hours (ProfessionalAvailability), unavailable dates (UnavailableDate)
+and booked appointments are loaded once for a date range and turned into a
+sorted list of merged free intervals per day. Slots are then produced by a
+single sweep over those intervals instead of re-checking every appointment
+for every candidate slot.
+
+All times are handled as minutes since midnight.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import Appointment, ProfessionalAvailability, UnavailableDate
+
+# Used when a professional has not saved a weekly schedule
+DEFAULT_WORKING_HOURS = (9 * 60, 18 * 60)
+DEFAULT_SLOT_STEP = 30
+MINUTES_PER_DAY = 24 * 60
+
+BOOKED_STATUSES = ['scheduled', 'confirmed']
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def merge_intervals(intervals):
+    """Merge overlapping or touching (start, end) intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def subtract_intervals(free, busy):
+    """Remove merged, sorted ``busy`` intervals from sorted ``free`` intervals"""
+    result = []
+    i = 0
+    for start, end in free:
+        # Skip busy intervals that end before this free interval starts
+        while i < len(busy) and busy[i][1] <= start:
+            i += 1
+        j = i
+        cursor = start
+        while j < len(busy) and busy[j][0] < end:
+            if busy[j][0] > cursor:
+                result.append((cursor, busy[j][0]))
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if cursor < end:
+            result.append((cursor, end))
+    return result
+
+
+def sweep_slots(free, duration, step=DEFAULT_SLOT_STEP, anchor=None):
+    """
+    Generate (start, end) slots of ``duration`` minutes that fit in the free
+    intervals. Slot starts are aligned to a ``step`` grid beginning at
+    ``anchor`` (the start of the working day).
+    """
+    if not free:
+        return []
+    if anchor is None:
+        anchor = free[0][0]
+
+    slots = []
+    for start, end in free:
+        # First grid point at or after the interval start (ceil division)
+        slot_start = anchor + max(0, -(-(start - anchor) // step)) * step
+        while slot_start + duration <= end:
+            slots.append((slot_start, slot_start + duration))
+            slot_start += step
+    return slots
+
+
+class AvailabilityEngine:
+    """
+    Free time of one professional over a date range, built from three
+    queries regardless of the number of days or appointments.
+    """
+
+    def __init__(self, professional, start_date, end_date=None, buffer_minutes=0, appointments=None):
+        self.professional = professional
+        self.start_date = start_date
+        self.end_date = end_date or start_date
+        self.buffer_minutes = buffer_minutes
+
+        self.schedule = self._load_schedule()
+        self.unavailable = {
+            item.date: item
+            for item in UnavailableDate.objects.filter(
+                professional=professional,
+                date__range=[self.start_date, self.end_date]
+            )
+        }
+
+        if appointments is None:
+            appointments = Appointment.objects.filter(
+                professional=professional,
+                date__range=[self.start_date, self.end_date],
+                status__in=BOOKED_STATUSES
+            ).only('date', 'time', 'duration', 'status')
+
+        self.busy = defaultdict(list)
+        for appointment in appointments:
+            if appointment.status not in BOOKED_STATUSES:
+                continue
+            start = to_minutes(appointment.time) - buffer_minutes
+            end = to_minutes(appointment.time) + appointment.duration + buffer_minutes
+            self.busy[appointment.date].append((max(start, 0), min(end, MINUTES_PER_DAY)))
+
+        self._free_cache = {}
+
+    def _load_schedule(self):
+        """Working intervals per weekday, or None to use the default hours"""
+        records = list(ProfessionalAvailability.objects.filter(professional=self.professional))
+        if not records:
+            return None
+
+        schedule = defaultdict(list)
+        for record in records:
+            if not record.is_available:
+                continue
+            working = [(to_minutes(record.start_time), to_minutes(record.end_time))]
+            if record.break_start and record.break_end:
+                working = subtract_intervals(
+                    working,
+                    [(to_minutes(record.break_start), to_minutes(record.break_end))]
+                )
+            schedule[record.weekday].extend(working)
+        return {weekday: merge_intervals(intervals) for weekday, intervals in schedule.items()}
+
+    def working_intervals(self, day):
+        if self.schedule is None:
+            return [DEFAULT_WORKING_HOURS]
+        return self.schedule.get(day.weekday(), [])
+
+    def free_intervals(self, day):
+        """Sorted, non-overlapping free (start, end) intervals for a day"""
+        if day in self._free_cache:
+            return self._free_cache[day]
+
+        free = self.working_intervals(day)
+        blocked = list(self.busy.get(day, []))
+
+        unavailable = self.unavailable.get(day)
+        if unavailable:
+            if unavailable.is_full_day or not (unavailable.start_time and unavailable.end_time):
+                free = []
+            else:
+                blocked.append((to_minutes(unavailable.start_time), to_minutes(unavailable.end_time)))
+
+        free = subtract_intervals(free, merge_intervals(blocked))
+        self._free_cache[day] = free
+        return free
+
+    def slots(self, day, duration=60, step=DEFAULT_SLOT_STEP):
+        """Bookable (start, end) slots of ``duration`` minutes on a day"""
+        working = self.working_intervals(day)
+        if not working:
+            return []
+        return sweep_slots(self.free_intervals(day), duration, step=step, anchor=working[0][0])
+
+    def days(self):
+        day = self.start_date
+        while day <= self.end_date:
+            yield day
+            day += timedelta(days=1)
+
+    def slots_by_day(self, duration=60, step=DEFAULT_SLOT_STEP):
+        """{date: [(start, end), ...]} for every day in the range"""
+        return {day: self.slots(day, duration=duration, step=step) for day in self.days()}
+
+
+def build_calendar(professional, start_date, end_date, today=None):
+    """
+    Calendar days between ``start_date`` and ``end_date`` (inclusive) with
+    their appointments and bookable one-hour slot counts.
+
+    Appointments are fetched once with their clients and grouped in memory,
+    and the same rows feed the availability engine, so the number of
+    queries does not depend on the number of days or appointments.
+    """
+    today = today or timezone.now().date()
+    appointments = list(
+        Appointment.objects.filter(
+            professional=professional,
+            date__range=[start_date, end_date]
+        ).select_related('client').order_by('date', 'time')
+    )
+
+    appointments_by_day = defaultdict(list)
+    for appointment in appointments:
+        appointments_by_day[appointment.date].append(appointment)
+
+    engine = AvailabilityEngine(professional, start_date, end_date, appointments=appointments)
+
+    calendar_data = {}
+    for day in engine.days():
+        date_str = day.strftime('%Y-%m-%d')
+        bookable = professional.is_available and day >= today
+        calendar_data[date_str] = {
+            'date': date_str,
+            'day_of_week': day.strftime('%A'),
+            'is_weekend': day.weekday() >= 5,
+            'is_available': bookable,
+            'appointments': [
+                {
+                    'id': app.id,
+                    'title': app.title,
+                    'time': app.time.strftime('%H:%M'),
+                    'duration': app.duration,
+                    'status': app.status,
+                    'client': f"{app.client.first_name} {app.client.last_name}" if app.client else None
+                }
+                for app in appointments_by_day[day]
+            ],
+            'available_slots_count': len(engine.slots(day, duration=60)) if bookable else 0
+        }
+    return calendar_data
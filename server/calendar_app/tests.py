@@ -1,8 +1,11 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from datetime import date, time
-from .models import Appointment
+from datetime import date, time, timedelta
+from .models import Appointment, ProfessionalAvailability, UnavailableDate
+from .availability import AvailabilityEngine, format_minutes, merge_intervals, subtract_intervals
 from projects.models import Project, Category
 
 User = get_user_model()
@@ -153,4 +156,134 @@ class AppointmentViewTest(TestCase):
         """Test appointment list for authenticated user"""
         self.client.force_login(self.client_user)
         response = self.client.get('/api/calendar/appointments/')
-        self.assertEqual(response.status_code, 200) 
\ No newline at end of file
+        self.assertEqual(response.status_code, 200) 
+
+class AvailabilityEngineTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.professional_user = User.objects.create_user(
+            username='professional1',
+            email='professional1@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        # A Monday
+        self.day = date(2030, 1, 7)
+
+    def book(self, start, duration, day=None, status='scheduled'):
+        return Appointment.objects.create(
+            title='Booked',
+            professional=self.professional_user,
+            client=self.client_user,
+            date=day or self.day,
+            time=start,
+            duration=duration,
+            status=status
+        )
+
+    def test_merge_and_subtract_intervals(self):
+        """Overlapping busy intervals are merged before being removed"""
+        busy = merge_intervals([(600, 660), (630, 700), (800, 860)])
+        self.assertEqual(busy, [(600, 700), (800, 860)])
+        free = subtract_intervals([(540, 1080)], busy)
+        self.assertEqual(free, [(540, 600), (700, 800), (860, 1080)])
+
+    def test_default_hours_skip_booked_appointments(self):
+        """Slots avoid appointments and cancelled ones are ignored"""
+        self.book(time(10, 0), 60)
+        self.book(time(13, 0), 60, status='cancelled')
+
+        slots = AvailabilityEngine(self.professional_user, self.day).slots(self.day, duration=60)
+        starts = [format_minutes(start) for start, _ in slots]
+
+        self.assertEqual(starts[0], '09:00')
+        self.assertNotIn('09:30', starts)
+        self.assertNotIn('10:00', starts)
+        self.assertIn('11:00', starts)
+        self.assertIn('13:00', starts)
+        self.assertEqual(starts[-1], '17:00')
+
+    def test_buffer_schedule_and_unavailable_dates(self):
+        """Weekly schedule, breaks, buffers and unavailable dates are honoured"""
+        ProfessionalAvailability.objects.create(
+            professional=self.professional_user,
+            weekday=0,
+            start_time=time(8, 0),
+            end_time=time(12, 0),
+            break_start=time(10, 0),
+            break_end=time(10, 30)
+        )
+        UnavailableDate.objects.create(professional=self.professional_user, date=self.day + timedelta(days=7))
+        self.book(time(9, 0), 30)
+
+        engine = AvailabilityEngine(
+            self.professional_user, self.day, self.day + timedelta(days=7), buffer_minutes=15
+        )
+        slots = engine.slots_by_day(duration=30)
+
+        self.assertEqual(
+            [(format_minutes(s), format_minutes(e)) for s, e in slots[self.day]],
+            [('08:00', '08:30'), ('10:30', '11:00'), ('11:00', '11:30'), ('11:30', '12:00')]
+        )
+        # Tuesday is not part of the weekly schedule, next Monday is blocked
+        self.assertEqual(slots[self.day + timedelta(days=1)], [])
+        self.assertEqual(slots[self.day + timedelta(days=7)], [])
+
+    def test_available_slots_endpoint_multi_day(self):
+        """get_available_slots returns a slot list per day for a range"""
+        self.book(time(9, 0), 480)
+        self.client.force_login(self.client_user)
+        response = self.client.get('/api/calendar/available-slots/', {
+            'professional_id': self.professional_user.id,
+            'date': '2030-01-07',
+            'end_date': '2030-01-08',
+            'duration': 60,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['days']['2030-01-07'], [{'start_time': '17:00', 'end_time': '18:00', 'duration': 60}])
+        self.assertEqual(len(data['days']['2030-01-08']), 17)
+        self.assertEqual(data['total_slots'], 18)
+
+    def test_professional_calendar_query_count(self):
+        """The month calendar uses a fixed number of queries however busy it is"""
+        self.book(time(9, 0), 60)
+        self.client.force_login(self.client_user)
+        params = {'professional_id': self.professional_user.id, 'year': 2030, 'month': 1}
+
+        with CaptureQueriesContext(connection) as baseline:
+            self.client.get('/api/calendar/professional-calendar/', params)
+
+        for offset in range(1, 28):
+            self.book(time(9, 0), 60, day=self.day + timedelta(days=offset % 20))
+            self.book(time(14, 0), 30, day=self.day + timedelta(days=offset % 20))
+
+        with self.assertNumQueries(len(baseline.captured_queries)):
+            response = self.client.get('/api/calendar/professional-calendar/', params)
+
+        self.assertEqual(response.status_code, 200)
+        calendar = response.json()['calendar']
+        self.assertEqual(len(calendar), 31)
+        self.assertEqual(len(calendar['2030-01-08']['appointments']), 4)
+        self.assertEqual(calendar['2030-01-07']['available_slots_count'], 13)
+
+    def test_professional_calendar_week_view(self):
+        """week_start returns seven consecutive days"""
+        self.client.force_login(self.client_user)
+        response = self.client.get('/api/calendar/professional-calendar/', {
+            'professional_id': self.professional_user.id,
+            'week_start': '2030-01-07',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['week_end'], '2030-01-13')
+        self.assertEqual(list(data['calendar'])[0], '2030-01-07')
+        self.assertEqual(len(data['calendar']), 7)
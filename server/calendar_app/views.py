@@ -5,12 +5,16 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
-from datetime import datetime, timedelta, time
+from datetime import datetime, timedelta
 from django.utils import timezone
 from django.db import models
 
 from .models import Appointment, ProfessionalAvailability
 from .serializers import AppointmentSerializer, AppointmentCreateSerializer
+from .availability import AvailabilityEngine, build_calendar, format_minutes
+
+# Longest range accepted by get_available_slots in a single call
+MAX_SLOT_RANGE_DAYS = 31
 
 
 class AppointmentListView(generics.ListAPIView):
@@ -259,6 +263,18 @@ def get_appointment_stats(request):
             description="Appointment duration in minutes (default: 60)",
             required=False,
             type=OpenApiTypes.INT
+        ),
+        OpenApiParameter(
+            name="end_date",
+            description="Last date of a multi-day range (YYYY-MM-DD, at most 31 days after date)",
+            required=False,
+            type=OpenApiTypes.DATE
+        ),
+        OpenApiParameter(
+            name="buffer",
+            description="Buffer in minutes kept free before and after existing appointments (default: 0)",
+            required=False,
+            type=OpenApiTypes.INT
         )
     ]
 )
@@ -268,7 +284,7 @@ def get_available_slots(request):
     
     professional_id = request.query_params.get('professional_id')
     date_str = request.query_params.get('date')
-    duration = int(request.query_params.get('duration', 60))  # Default 1 hour
+    end_date_str = request.query_params.get('end_date')
     
     if not professional_id or not date_str:
         return Response(
@@ -276,6 +292,17 @@ def get_available_slots(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    try:
+        duration = int(request.query_params.get('duration', 60))  # Default 1 hour
+        buffer_minutes = int(request.query_params.get('buffer', 0))
+        if duration <= 0 or buffer_minutes < 0:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {'error': 'duration and buffer must be positive integers'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
     try:
         professional = User.objects.get(
             id=professional_id, 
@@ -283,12 +310,19 @@ def get_available_slots(request):
             is_active=True
         )
         appointment_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date() if end_date_str else appointment_date
     except (User.DoesNotExist, ValueError):
         return Response(
             {'error': 'Invalid professional or date format'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    if end_date < appointment_date or (end_date - appointment_date).days > MAX_SLOT_RANGE_DAYS:
+        return Response(
+            {'error': f'end_date must be within {MAX_SLOT_RANGE_DAYS} days after date'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
     # Check if professional is available on this date
     if not professional.is_available:
         return Response({
@@ -296,52 +330,23 @@ def get_available_slots(request):
             'message': 'Professional is currently unavailable'
         })
     
-    # Get professional's working hours (default 9 AM to 6 PM)
-    working_start = time(9, 0)  # 9:00 AM
-    working_end = time(18, 0)   # 6:00 PM
-    
-    # Get existing appointments for this date
-    existing_appointments = Appointment.objects.filter(
-        professional=professional,
-        date=appointment_date,
-        status__in=['scheduled', 'confirmed']
-    ).order_by('time')
-    
-    # Generate available slots
-    available_slots = []
-    current_time = working_start
-    
-    while current_time < working_end:
-        slot_end = (datetime.combine(appointment_date, current_time) + 
-                   timedelta(minutes=duration)).time()
-        
-        if slot_end > working_end:
-            break
-            
-        # Check if this slot conflicts with existing appointments
-        slot_available = True
-        for appointment in existing_appointments:
-            app_start = appointment.time
-            app_end = (datetime.combine(appointment_date, app_start) + 
-                      timedelta(minutes=appointment.duration)).time()
-            
-            # Check for overlap
-            if (current_time < app_end and slot_end > app_start):
-                slot_available = False
-                break
-        
-        if slot_available:
-            available_slots.append({
-                'start_time': current_time.strftime('%H:%M'),
-                'end_time': slot_end.strftime('%H:%M'),
+    engine = AvailabilityEngine(
+        professional, appointment_date, end_date, buffer_minutes=buffer_minutes
+    )
+    slots_by_day = {
+        day: [
+            {
+                'start_time': format_minutes(start),
+                'end_time': format_minutes(end),
                 'duration': duration
-            })
-        
-        # Move to next 30-minute slot
-        current_time = (datetime.combine(appointment_date, current_time) + 
-                       timedelta(minutes=30)).time()
+            }
+            for start, end in slots
+        ]
+        for day, slots in engine.slots_by_day(duration=duration).items()
+    }
+    available_slots = slots_by_day[appointment_date]
     
-    return Response({
+    response_data = {
         'professional': {
             'id': professional.id,
             'name': f"{professional.first_name} {professional.last_name}",
@@ -351,7 +356,16 @@ def get_available_slots(request):
         'date': date_str,
         'available_slots': available_slots,
         'total_slots': len(available_slots)
-    })
+    }
+    
+    if end_date_str:
+        response_data['end_date'] = end_date_str
+        response_data['days'] = {
+            day.strftime('%Y-%m-%d'): slots for day, slots in slots_by_day.items()
+        }
+        response_data['total_slots'] = sum(len(slots) for slots in slots_by_day.values())
+    
+    return Response(response_data)
 
 
 @api_view(['GET'])
@@ -359,7 +373,7 @@ def get_available_slots(request):
 @extend_schema(
     operation_id="get_professional_calendar",
     summary="Get Professional Calendar",
-    description="Get professional's calendar for a specific month",
+    description="Get professional's calendar for a specific month, or for the week starting at week_start",
     tags=["Calendar"],
     parameters=[
         OpenApiParameter(
@@ -370,28 +384,35 @@ def get_available_slots(request):
         ),
         OpenApiParameter(
             name="year",
-            description="Year (YYYY)",
-            required=True,
+            description="Year (YYYY), required unless week_start is given",
+            required=False,
             type=OpenApiTypes.INT
         ),
         OpenApiParameter(
             name="month",
-            description="Month (1-12)",
-            required=True,
+            description="Month (1-12), required unless week_start is given",
+            required=False,
             type=OpenApiTypes.INT
+        ),
+        OpenApiParameter(
+            name="week_start",
+            description="First day of a 7-day week view (YYYY-MM-DD)",
+            required=False,
+            type=OpenApiTypes.DATE
         )
     ]
 )
 def get_professional_calendar(request):
-    """Get professional's calendar for a specific month"""
+    """Get professional's calendar for a specific month or week"""
     from authentication.models import User
     from calendar import monthrange
     
     professional_id = request.query_params.get('professional_id')
     year = request.query_params.get('year')
     month = request.query_params.get('month')
+    week_start = request.query_params.get('week_start')
     
-    if not all([professional_id, year, month]):
+    if not professional_id or not (week_start or (year and month)):
         return Response(
             {'error': 'professional_id, year, and month are required'}, 
             status=status.HTTP_400_BAD_REQUEST
@@ -403,63 +424,39 @@ def get_professional_calendar(request):
             user_type__in=['home_pro', 'specialist', 'crew_member'],
             is_active=True
         )
-        year = int(year)
-        month = int(month)
+        if week_start:
+            range_start = datetime.strptime(week_start, '%Y-%m-%d').date()
+            range_end = range_start + timedelta(days=6)
+        else:
+            year = int(year)
+            month = int(month)
+            # Get month range
+            _, days_in_month = monthrange(year, month)
+            range_start = datetime(year, month, 1).date()
+            range_end = datetime(year, month, days_in_month).date()
     except (User.DoesNotExist, ValueError):
         return Response(
             {'error': 'Invalid professional, year, or month'}, 
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Get month range
-    _, days_in_month = monthrange(year, month)
-    month_start = datetime(year, month, 1).date()
-    month_end = datetime(year, month, days_in_month).date()
-    
-    # Get appointments for the month
-    appointments = Appointment.objects.filter(
-        professional=professional,
-        date__range=[month_start, month_end]
-    ).order_by('date', 'time')
-    
-    # Build calendar data
-    calendar_data = {}
-    for day in range(1, days_in_month + 1):
-        date = datetime(year, month, day).date()
-        date_str = date.strftime('%Y-%m-%d')
-        
-        day_appointments = appointments.filter(date=date)
-        
-        calendar_data[date_str] = {
-            'date': date_str,
-            'day_of_week': date.strftime('%A'),
-            'is_weekend': date.weekday() >= 5,
-            'is_available': professional.is_available and date >= timezone.now().date(),
-            'appointments': [
-                {
-                    'id': app.id,
-                    'title': app.title,
-                    'time': app.time.strftime('%H:%M'),
-                    'duration': app.duration,
-                    'status': app.status,
-                    'client': f"{app.client.first_name} {app.client.last_name}" if app.client else None
-                }
-                for app in day_appointments
-            ],
-            'available_slots_count': len(get_day_available_slots(professional, date))
-        }
-    
-    return Response({
+    response_data = {
         'professional': {
             'id': professional.id,
             'name': f"{professional.first_name} {professional.last_name}",
             'specialization': getattr(professional, 'specialization', ''),
             'is_available': professional.is_available
-        },
-        'year': year,
-        'month': month,
-        'calendar': calendar_data
-    })
+        }
+    }
+    if week_start:
+        response_data['week_start'] = range_start.strftime('%Y-%m-%d')
+        response_data['week_end'] = range_end.strftime('%Y-%m-%d')
+    else:
+        response_data['year'] = year
+        response_data['month'] = month
+    response_data['calendar'] = build_calendar(professional, range_start, range_end)
+    
+    return Response(response_data)
 
 
 def get_day_available_slots(professional, date):
@@ -467,46 +464,14 @@ def get_day_available_slots(professional, date):
     if not professional.is_available or date < timezone.now().date():
         return []
     
-    working_start = time(9, 0)
-    working_end = time(18, 0)
-    slot_duration = 60  # 1 hour slots
-    
-    existing_appointments = Appointment.objects.filter(
-        professional=professional,
-        date=date,
-        status__in=['scheduled', 'confirmed']
-    )
-    
-    available_slots = []
-    current_time = working_start
-    
-    while current_time < working_end:
-        slot_end = (datetime.combine(date, current_time) + 
-                   timedelta(minutes=slot_duration)).time()
-        
-        if slot_end > working_end:
-            break
-            
-        slot_available = True
-        for appointment in existing_appointments:
-            app_start = appointment.time
-            app_end = (datetime.combine(date, app_start) + 
-                      timedelta(minutes=appointment.duration)).time()
-            
-            if (current_time < app_end and slot_end > app_start):
-                slot_available = False
-                break
-        
-        if slot_available:
-            available_slots.append({
-                'start_time': current_time.strftime('%H:%M'),
-                'end_time': slot_end.strftime('%H:%M')
-            })
-        
-        current_time = (datetime.combine(date, current_time) + 
-                       timedelta(minutes=30)).time()
-    
-    return available_slots
+    engine = AvailabilityEngine(professional, date)
+    return [
+        {
+            'start_time': format_minutes(start),
+            'end_time': format_minutes(end)
+        }
+        for start, end in engine.slots(date, duration=60)  # 1 hour slots
+    ]
 
 
 @api_view(['POST'])
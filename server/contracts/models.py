@@ -128,10 +128,18 @@ class Contract(models.Model):
     def __str__(self):
         return f"{self.contract_number} - {self.title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Status as loaded, dashboard.signals counts completions from transitions
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.contract_number:
             self.contract_number = f"CON-{timezone.now().year}-{str(uuid.uuid4())[:8].upper()}"
         super().save(*args, **kwargs)
+        self._loaded_status = self.status
     
     @property
     def remaining_amount(self):
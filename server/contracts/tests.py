@@ -1,3 +1,73 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from projects.models import Project, Category
+from .models import Contract
+
+User = get_user_model()
+
+
+class ContractStatsViewTest(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.professional = User.objects.create_user(
+            username='pro1',
+            email='pro1@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.project = Project.objects.create(
+            title='Fix sink',
+            description='Leaking kitchen sink',
+            client=self.client_user,
+            category=Category.objects.create(name='Plumbing', description='Plumbing work'),
+            budget_min=100,
+            budget_max=200,
+            location='New York',
+            status='published'
+        )
+        self.api = APIClient()
+
+    def create_contract(self, status, amount, paid='0'):
+        return Contract.objects.create(
+            title='Sink repair',
+            description='Repair the sink',
+            client=self.client_user,
+            professional=self.professional,
+            project=self.project,
+            total_amount=Decimal(amount),
+            paid_amount=Decimal(paid),
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=7),
+            status=status
+        )
+
+    def test_stats_come_from_one_query(self):
+        """Counts per status and amounts are aggregated together"""
+        self.create_contract('active', '100.00', paid='40.00')
+        self.create_contract('completed', '300.00', paid='300.00')
+        self.create_contract('cancelled', '50.00')
+        self.api.force_authenticate(self.professional)
+
+        with self.assertNumQueries(1):
+            response = self.api.get('/api/contracts/stats/')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'total_contracts': 3,
+            'active_contracts': 1,
+            'completed_contracts': 1,
+            'total_value': 450.0,
+            'paid_amount': 340.0,
+            'pending_amount': 110.0,
+            'completion_rate': 33.33
+        })
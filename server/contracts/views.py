@@ -4,6 +4,7 @@ from rest_framework.views import APIView
 from django.db.models import Q, Sum, Count
 from django.utils import timezone
 from drf_spectacular.utils import extend_schema
+from alist_backend.aggregates import aggregate_totals, count_by
 from .models import Contract, ContractMilestone, ContractDocument, ContractLocation, ContractCalendarEvent
 from .serializers import (
     ContractSerializer, ContractDetailSerializer, ContractMilestoneSerializer,
@@ -446,19 +447,19 @@ class ContractStatsView(APIView):
             Q(client=user) | Q(professional=user)
         )
         
-        # Calculate statistics
-        total_contracts = user_contracts.count()
-        active_contracts = user_contracts.filter(status='active').count()
-        completed_contracts = user_contracts.filter(status='completed').count()
-        
-        # Calculate financial statistics
-        total_value = user_contracts.aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
-        
-        paid_amount = user_contracts.aggregate(
-            paid=Sum('paid_amount')
-        )['paid'] or 0
+        # Counts and financial statistics in one query
+        stats = aggregate_totals(
+            user_contracts,
+            total_contracts=Count('pk'),
+            total_value=Sum('total_amount'),
+            paid_amount=Sum('paid_amount'),
+            **count_by('status', ['active', 'completed'], prefix='status_')
+        )
+        total_contracts = stats['total_contracts']
+        active_contracts = stats['status_active']
+        completed_contracts = stats['status_completed']
+        total_value = stats['total_value']
+        paid_amount = stats['paid_amount']
         
         pending_amount = total_value - paid_amount
         
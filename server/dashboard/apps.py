@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        """Register the signal handlers that keep rollups and denormalized counters fresh"""
+        import dashboard.signals  # noqa: F401
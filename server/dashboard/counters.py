@@ -0,0 +1,106 @@
+"""
+Denormalized counters on Project and User.
+
+    Project.proposals_count      proposals on the project
+    Project.favorites_count      ProjectFavorite rows
+    User.rating_count            reviews of the professional
+    User.rating_average          their average rating
+    User.projects_completed      completed contracts of the professional
+
+Every change is a single UPDATE whose new value is computed in SQL, F()
+arithmetic for the counts and correlated subqueries for ratings, so no row
+is read first and concurrent writers can't lose each other's updates.
+Contract status transitions are detected from the status the row was loaded
+with (Contract._loaded_status), not by fetching it again.
+
+reconcile_counters() recomputes every counter from the source tables, for
+the rebuild after bulk updates, which bypass the signals.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Avg, Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Round
+
+User = get_user_model()
+
+
+def adjust(model, pk, field, delta):
+    """Add ``delta`` to a counter, never below zero"""
+    if pk and delta:
+        model.objects.filter(pk=pk).update(**{field: Greatest(F(field) + delta, Value(0))})
+
+
+def count_of(model, field, **filters):
+    """Correlated subquery counting ``model`` rows pointing at the outer row"""
+    rows = model.objects.filter(**{field: OuterRef('pk')}, **filters).order_by().values(field)
+    return Coalesce(Subquery(rows.annotate(total=Count('pk')).values('total')), 0)
+
+
+def rating_expressions():
+    from reviews.models import Review
+
+    reviews = Review.objects.filter(professional=OuterRef('pk')).order_by().values('professional')
+    return {
+        'rating_count': count_of(Review, 'professional'),
+        'rating_average': Coalesce(
+            Subquery(reviews.annotate(average=Round(Avg('rating'), 2)).values('average')), 0.0
+        ),
+    }
+
+
+def counter_expressions():
+    """{model: {counter field: expression computing it from the source tables}}"""
+    from contracts.models import Contract
+    from projects.models import Project, ProjectFavorite
+    from proposals.models import Proposal
+
+    return {
+        Project: {
+            'proposals_count': count_of(Proposal, 'project'),
+            'favorites_count': count_of(ProjectFavorite, 'project'),
+        },
+        User: {
+            **rating_expressions(),
+            'projects_completed': count_of(Contract, 'professional', status='completed'),
+        },
+    }
+
+
+def refresh_rating(user_id):
+    """Recompute a professional's rating count and average in one UPDATE"""
+    if user_id:
+        User.objects.filter(pk=user_id).update(**rating_expressions())
+
+
+def _same(stored, expected):
+    if isinstance(stored, Decimal):
+        return stored.quantize(Decimal('0.01')) == Decimal(str(expected)).quantize(Decimal('0.01'))
+    return stored == expected
+
+
+def reconcile_counters(fix=True):
+    """
+    Compare every counter with its source tables, returns
+    [(model, pk, {field: (stored, expected)})] for the drifted rows and
+    corrects them unless ``fix`` is False.
+    """
+    drift = []
+    for model, expressions in counter_expressions().items():
+        rows = model.objects.order_by().annotate(
+            **{f'expected_{field}': expression for field, expression in expressions.items()}
+        ).values('pk', *expressions, *(f'expected_{field}' for field in expressions))
+        for row in rows.iterator():
+            changed = {
+                field: (row[field], row[f'expected_{field}'])
+                for field in expressions
+                if not _same(row[field], row[f'expected_{field}'])
+            }
+            if not changed:
+                continue
+            drift.append((model, row['pk'], changed))
+            if fix:
+                model.objects.filter(pk=row['pk']).update(
+                    **{field: expected for field, (_, expected) in changed.items()}
+                )
+    return drift
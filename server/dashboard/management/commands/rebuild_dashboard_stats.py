@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from dashboard.models import DashboardStats
+from dashboard.rollups import PROFESSIONAL_TYPES, diff_professional_stats, refresh_professional_stats
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild DashboardStats rollups from scratch or check them for drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report drifted rollups, do not write anything; exits non-zero on drift',
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='Limit to the given user id (may be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not user_ids:
+            user_ids = list(
+                User.objects.filter(user_type__in=PROFESSIONAL_TYPES).values_list('id', flat=True)
+            )
+
+        if options['check']:
+            self.check_drift(user_ids)
+        else:
+            self.rebuild(user_ids)
+
+    def rebuild(self, user_ids):
+        self.stdout.write(f'Rebuilding dashboard stats for {len(user_ids)} users...')
+        for user_id in user_ids:
+            refresh_professional_stats(user_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(user_ids)} dashboard stats rows'))
+
+    def check_drift(self, user_ids):
+        now = timezone.now()
+        stored = {
+            stats.user_id: stats
+            for stats in DashboardStats.objects.filter(user_id__in=user_ids)
+        }
+
+        drifted = 0
+        for user_id in user_ids:
+            stats = stored.get(user_id)
+            if stats is None:
+                drifted += 1
+                self.stdout.write(self.style.WARNING(f'User {user_id}: missing stats row'))
+                continue
+
+            drift = diff_professional_stats(stats, now=now)
+            if drift:
+                drifted += 1
+                details = ', '.join(
+                    f'{field}: {old} != {new}' for field, (old, new) in sorted(drift.items())
+                )
+                self.stdout.write(self.style.WARNING(f'User {user_id}: {details}'))
+
+        if drifted:
+            raise CommandError(f'{drifted} of {len(user_ids)} rollups drifted')
+        self.stdout.write(self.style.SUCCESS(f'All {len(user_ids)} rollups are up to date'))
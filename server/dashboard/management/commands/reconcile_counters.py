@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute denormalized project and user counters from their source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report drifted counters, do not write anything',
+        )
+
+    def handle(self, *args, **options):
+        drift = reconcile_counters(fix=not options['check'])
+        for model, pk, changed in drift:
+            fields = ', '.join(
+                f'{field} {stored} -> {expected}' for field, (stored, expected) in changed.items()
+            )
+            self.stdout.write(self.style.WARNING(f'{model.__name__} {pk}: {fields}'))
+
+        if options['check']:
+            self.stdout.write(f'{len(drift)} rows with drifted counters')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Corrected counters of {len(drift)} rows'))
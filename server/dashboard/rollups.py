@@ -0,0 +1,154 @@
+"""
+Rollup engine for DashboardStats.
+
+Professional dashboard statistics are materialized into the DashboardStats row
+of each user. Rows are rebuilt per user with a handful of aggregate queries
+whenever one of the source tables (contracts, proposals, reviews, payments)
+changes, so the dashboard endpoints only need to read a single row.
+"""
+import threading
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from .models import DashboardStats
+
+ACTIVE_CONTRACT_STATUSES = ['active', 'in_progress']
+
+# User types that have a professional dashboard
+PROFESSIONAL_TYPES = ['home_pro', 'specialist', 'crew_member']
+
+# Fields of DashboardStats maintained by the rollup engine
+ROLLUP_FIELDS = [
+    'active_jobs', 'total_earned', 'proposals_sent', 'success_rate',
+    'completed_jobs', 'pending_payments', 'average_rating', 'total_clients',
+    'monthly_earnings', 'weekly_earnings', 'jobs_this_month',
+    'proposals_this_month',
+]
+
+_pending = threading.local()
+
+
+def _quantize(value):
+    return Decimal(value or 0).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+def compute_professional_stats(user_id, now=None):
+    """Compute the professional rollup values for a user from source tables"""
+    from contracts.models import Contract
+    from payments.models import Payment
+    from proposals.models import Proposal
+    from reviews.models import Review
+
+    now = now or timezone.now()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    week_ago = now - timedelta(days=7)
+
+    active = Q(status__in=ACTIVE_CONTRACT_STATUSES)
+    completed = Q(status='completed')
+    contracts = Contract.objects.filter(professional_id=user_id).aggregate(
+        active_jobs=Count('id', filter=active),
+        completed_jobs=Count('id', filter=completed),
+        total_earned=Sum('total_amount', filter=completed),
+        monthly_earnings=Sum('total_amount', filter=completed & Q(created_at__gte=month_start)),
+        weekly_earnings=Sum('total_amount', filter=completed & Q(created_at__gte=week_ago)),
+        jobs_this_month=Count('id', filter=active & Q(created_at__gte=month_start)),
+        total_clients=Count('client', filter=active, distinct=True),
+    )
+
+    proposals = Proposal.objects.filter(professional_id=user_id).aggregate(
+        sent=Count('id'),
+        accepted=Count('id', filter=Q(status='accepted')),
+        this_month=Count('id', filter=Q(created_at__gte=month_start)),
+    )
+
+    average_rating = Review.objects.filter(professional_id=user_id).aggregate(
+        value=Avg('rating')
+    )['value']
+
+    pending_payments = Payment.objects.filter(
+        contract__professional_id=user_id,
+        status='pending'
+    ).count()
+
+    if proposals['sent']:
+        success_rate = Decimal(proposals['accepted'] * 100) / proposals['sent']
+    else:
+        success_rate = 0
+
+    return {
+        'active_jobs': contracts['active_jobs'],
+        'completed_jobs': contracts['completed_jobs'],
+        'total_earned': _quantize(contracts['total_earned']),
+        'monthly_earnings': _quantize(contracts['monthly_earnings']),
+        'weekly_earnings': _quantize(contracts['weekly_earnings']),
+        'jobs_this_month': contracts['jobs_this_month'],
+        'total_clients': contracts['total_clients'],
+        'proposals_sent': proposals['sent'],
+        'proposals_this_month': proposals['this_month'],
+        'success_rate': _quantize(success_rate),
+        'average_rating': _quantize(average_rating),
+        'pending_payments': pending_payments,
+    }
+
+
+def refresh_professional_stats(user_id, now=None):
+    """Rebuild and store the DashboardStats row of a single professional"""
+    values = compute_professional_stats(user_id, now=now)
+    stats, _ = DashboardStats.objects.update_or_create(user_id=user_id, defaults=values)
+    return stats
+
+
+def get_professional_stats(user):
+    """Return the stored stats row, building it on first access"""
+    stats = DashboardStats.objects.filter(user=user).first()
+    if stats is None:
+        stats = refresh_professional_stats(user.pk)
+    return stats
+
+
+def diff_professional_stats(stats, now=None):
+    """Return {field: (stored, expected)} for every drifted rollup field"""
+    expected = compute_professional_stats(stats.user_id, now=now)
+    drift = {}
+    for field in ROLLUP_FIELDS:
+        stored = getattr(stats, field)
+        if isinstance(expected[field], Decimal):
+            stored = _quantize(stored)
+        if stored != expected[field]:
+            drift[field] = (stored, expected[field])
+    return drift
+
+
+def _flush_pending():
+    user_ids = getattr(_pending, 'user_ids', set())
+    _pending.user_ids = set()
+    if not user_ids:
+        return
+
+    if getattr(settings, 'DASHBOARD_ROLLUP_ASYNC', False):
+        from .tasks import refresh_dashboard_stats
+        refresh_dashboard_stats.delay(sorted(user_ids))
+        return
+
+    for user_id in user_ids:
+        refresh_professional_stats(user_id)
+
+
+def schedule_refresh(user_id):
+    """
+    Queue a rollup refresh for a professional once the current transaction
+    commits. Several changes for the same user inside one transaction are
+    coalesced: the first commit callback refreshes every pending user and the
+    remaining callbacks find nothing left to do.
+    """
+    if not user_id:
+        return
+    if not hasattr(_pending, 'user_ids'):
+        _pending.user_ids = set()
+    _pending.user_ids.add(user_id)
+    transaction.on_commit(_flush_pending)
@@ -0,0 +1,82 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from contracts.models import Contract
+from payments.models import Payment
+from projects.models import Project, ProjectFavorite
+from proposals.models import Proposal
+from reviews.models import Review
+
+from .counters import User, adjust, refresh_rating
+from .rollups import schedule_refresh
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+@receiver(post_save, sender=Proposal)
+@receiver(post_delete, sender=Proposal)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def refresh_professional_rollup(sender, instance, **kwargs):
+    """Refresh the professional's dashboard stats when a source row changes"""
+    schedule_refresh(instance.professional_id)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def refresh_payment_rollup(sender, instance, **kwargs):
+    """Refresh pending payment counts of the contract's professional"""
+    if not instance.contract_id:
+        return
+    professional_id = Contract.objects.filter(
+        pk=instance.contract_id
+    ).values_list('professional_id', flat=True).first()
+    schedule_refresh(professional_id)
+
+
+@receiver(post_save, sender=Proposal)
+def count_new_proposal(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust(Project, instance.project_id, 'proposals_count', 1)
+
+
+@receiver(post_delete, sender=Proposal)
+def uncount_proposal(sender, instance, **kwargs):
+    adjust(Project, instance.project_id, 'proposals_count', -1)
+
+
+@receiver(post_save, sender=ProjectFavorite)
+def count_new_favorite(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust(Project, instance.project_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=ProjectFavorite)
+def uncount_favorite(sender, instance, **kwargs):
+    adjust(Project, instance.project_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def refresh_professional_rating(sender, instance, **kwargs):
+    if not kwargs.get('raw'):
+        refresh_rating(instance.professional_id)
+
+
+@receiver(post_save, sender=Contract)
+def count_completed_contract(sender, instance, created, raw=False, **kwargs):
+    """Follow transitions into and out of 'completed' using the status the row was loaded with"""
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_loaded_status', None)
+    was_completed = previous == 'completed'
+    if created or previous is not None:
+        is_completed = instance.status == 'completed'
+        if is_completed != was_completed:
+            adjust(User, instance.professional_id, 'projects_completed', 1 if is_completed else -1)
+
+
+@receiver(post_delete, sender=Contract)
+def uncount_completed_contract(sender, instance, **kwargs):
+    if getattr(instance, '_loaded_status', instance.status) == 'completed':
+        adjust(User, instance.professional_id, 'projects_completed', -1)
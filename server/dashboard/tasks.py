@@ -0,0 +1,26 @@
+from celery import shared_task
+from django.contrib.auth import get_user_model
+
+from .rollups import PROFESSIONAL_TYPES, refresh_professional_stats
+
+User = get_user_model()
+
+
+@shared_task
+def refresh_dashboard_stats(user_ids=None):
+    """
+    Rebuild DashboardStats rollups for the given users, or for every
+    professional when no ids are given. Time-windowed values (monthly and
+    weekly earnings) drift as time passes without writes, so the full
+    rebuild is scheduled periodically from Celery beat.
+    """
+    if user_ids is None:
+        user_ids = User.objects.filter(
+            user_type__in=PROFESSIONAL_TYPES
+        ).values_list('id', flat=True).iterator()
+
+    refreshed = 0
+    for user_id in user_ids:
+        refresh_professional_stats(user_id)
+        refreshed += 1
+    return refreshed
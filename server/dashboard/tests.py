@@ -1,3 +1,230 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from contracts.models import Contract
+from projects.models import Project, Category, ProjectFavorite
+from proposals.models import Proposal
+from reviews.models import Review
+from .counters import reconcile_counters
+from .models import DashboardStats
+
+User = get_user_model()
+
+
+class DashboardRollupTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.professional = User.objects.create_user(
+            username='pro1',
+            email='pro1@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.category = Category.objects.create(name='Plumbing', description='Plumbing work')
+        self.project = Project.objects.create(
+            title='Fix sink',
+            description='Leaking kitchen sink',
+            client=self.client_user,
+            category=self.category,
+            budget_min=100,
+            budget_max=200,
+            location='New York',
+            status='published'
+        )
+
+    def create_contract(self, status, amount):
+        return Contract.objects.create(
+            title='Sink repair',
+            description='Repair the sink',
+            client=self.client_user,
+            professional=self.professional,
+            project=self.project,
+            total_amount=Decimal(amount),
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=7),
+            status=status
+        )
+
+    def test_signals_refresh_stats_on_commit(self):
+        """Source changes are rolled up into DashboardStats after commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_contract('completed', '150.00')
+            self.create_contract('active', '80.00')
+            Proposal.objects.create(
+                project=self.project,
+                professional=self.professional,
+                cover_letter='I can fix it',
+                amount=Decimal('150.00'),
+                timeline='1 day',
+                status='accepted'
+            )
+            Review.objects.create(
+                project=self.project,
+                professional=self.professional,
+                client=self.client_user,
+                rating=4
+            )
+
+        stats = DashboardStats.objects.get(user=self.professional)
+        self.assertEqual(stats.active_jobs, 1)
+        self.assertEqual(stats.completed_jobs, 1)
+        self.assertEqual(stats.total_earned, Decimal('150.00'))
+        self.assertEqual(stats.proposals_sent, 1)
+        self.assertEqual(stats.success_rate, Decimal('100.00'))
+        self.assertEqual(stats.average_rating, Decimal('4.00'))
+        self.assertEqual(stats.total_clients, 1)
+
+    def test_professional_dashboard_reads_stats_without_writing(self):
+        """The dashboard endpoint serves the stored rollup row"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_contract('completed', '150.00')
+        updated_at = DashboardStats.objects.get(user=self.professional).updated_at
+
+        api = APIClient()
+        api.force_authenticate(self.professional)
+        response = api.get('/api/dashboard/professional/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stats']['total_earned'], 150.0)
+        self.assertEqual(DashboardStats.objects.get(user=self.professional).updated_at, updated_at)
+
+    def test_rebuild_command_detects_and_fixes_drift(self):
+        """rebuild_dashboard_stats --check reports drift, a rebuild clears it"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_contract('completed', '150.00')
+        DashboardStats.objects.filter(user=self.professional).update(completed_jobs=7)
+
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, '1 of 1 rollups drifted'):
+            call_command('rebuild_dashboard_stats', '--check', stdout=out)
+        self.assertIn('completed_jobs: 7 != 1', out.getvalue())
+
+        call_command('rebuild_dashboard_stats', stdout=StringIO())
+        out = StringIO()
+        call_command('rebuild_dashboard_stats', '--check', stdout=out)
+        self.assertIn('up to date', out.getvalue())
+
+
+class CounterTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.professional = User.objects.create_user(
+            username='pro1',
+            email='pro1@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.category = Category.objects.create(name='Plumbing', description='Plumbing work')
+        self.project = Project.objects.create(
+            title='Fix sink',
+            description='Leaking kitchen sink',
+            client=self.client_user,
+            category=self.category,
+            budget_min=100,
+            budget_max=200,
+            location='New York',
+            status='published'
+        )
+
+    def create_contract(self, status, amount):
+        return Contract.objects.create(
+            title='Sink repair',
+            description='Repair the sink',
+            client=self.client_user,
+            professional=self.professional,
+            project=self.project,
+            total_amount=Decimal(amount),
+            start_date=date.today(),
+            end_date=date.today() + timedelta(days=7),
+            status=status
+        )
+
+    def create_proposal(self, professional=None, status='pending'):
+        return Proposal.objects.create(
+            project=self.project,
+            professional=professional or self.professional,
+            cover_letter='I can fix it',
+            amount=Decimal('150.00'),
+            timeline='1 day',
+            status=status
+        )
+
+    def test_counters_follow_rows_and_transitions(self):
+        """Counters change with single UPDATEs as rows are added, changed and removed"""
+        proposal = self.create_proposal()
+        ProjectFavorite.objects.create(user=self.professional, project=self.project)
+        Review.objects.create(project=self.project, professional=self.professional, client=self.client_user, rating=4)
+        other_client = User.objects.create_user(
+            username='client2',
+            email='client2@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        review = Review.objects.create(
+            project=self.project, professional=self.professional, client=other_client, rating=5
+        )
+        contract = self.create_contract('active', '80.00')
+
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.proposals_count, self.project.favorites_count), (1, 1))
+        self.professional.refresh_from_db()
+        self.assertEqual((self.professional.rating_count, self.professional.rating_average), (2, Decimal('4.50')))
+        self.assertEqual(self.professional.projects_completed, 0)
+
+        # Status transitions are seen without reading the row back
+        proposal = Proposal.objects.get(pk=proposal.pk)
+        proposal.status = 'accepted'
+        with self.assertNumQueries(1):
+            proposal.save(update_fields=['status'])
+        self.assertIsNotNone(Proposal.objects.get(pk=proposal.pk).responded_at)
+
+        contract = Contract.objects.get(pk=contract.pk)
+        contract.status = 'completed'
+        contract.save()
+        contract.save()
+        self.professional.refresh_from_db()
+        self.assertEqual(self.professional.projects_completed, 1)
+
+        review.delete()
+        proposal.delete()
+        self.professional.refresh_from_db()
+        self.assertEqual((self.professional.rating_count, self.professional.rating_average), (1, Decimal('4.00')))
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.proposals_count, 0)
+
+    def test_reconcile_command_fixes_drift(self):
+        """reconcile_counters --check reports drift, a plain run corrects it"""
+        self.create_proposal()
+        self.create_contract('completed', '150.00')
+        Project.objects.filter(pk=self.project.pk).update(proposals_count=5)
+        User.objects.filter(pk=self.professional.pk).update(projects_completed=0, rating_count=3)
+
+        out = StringIO()
+        call_command('reconcile_counters', '--check', stdout=out)
+        self.assertIn(f'Project {self.project.pk}: proposals_count 5 -> 1', out.getvalue())
+        self.assertIn('2 rows with drifted counters', out.getvalue())
 
-# Create your tests here.
+        call_command('reconcile_counters', stdout=StringIO())
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.proposals_count, 1)
+        self.professional.refresh_from_db()
+        self.assertEqual((self.professional.projects_completed, self.professional.rating_count), (1, 0))
+        self.assertEqual(reconcile_counters(fix=False), [])
@@ -21,6 +21,7 @@ from contracts.models import Contract
 from payments.models import Payment
 from messaging.models import Message, Conversation
 from reviews.models import Review
+from .rollups import ACTIVE_CONTRACT_STATUSES, get_professional_stats
 import json
 import traceback
 
@@ -35,63 +36,12 @@ def professional_dashboard(request):
         
         user = request.user
         
-        # Get or create dashboard stats
-        stats, created = DashboardStats.objects.get_or_create(user=user)
-        
-        # Calculate stats from actual data
-        active_contracts = Contract.objects.filter(professional=user, status__in=['active', 'in_progress'])
-        completed_contracts = Contract.objects.filter(professional=user, status='completed')
-        proposals = Proposal.objects.filter(professional=user)
-        
-        # Update stats
-        stats.active_jobs = active_contracts.count()
-        stats.completed_jobs = completed_contracts.count()
-        stats.proposals_sent = proposals.count()
-        
-        # Calculate earnings
-        total_earned = sum([contract.total_amount for contract in completed_contracts])
-        stats.total_earned = total_earned
-        
-        # Calculate success rate
-        if proposals.count() > 0:
-            accepted_proposals = proposals.filter(status='accepted').count()
-            stats.success_rate = (accepted_proposals / proposals.count()) * 100
-        else:
-            stats.success_rate = 0
-            
-        # Calculate monthly earnings
-        current_month = timezone.now().month
-        monthly_contracts = completed_contracts.filter(created_at__month=current_month)
-        stats.monthly_earnings = sum([contract.total_amount for contract in monthly_contracts])
-        
-        # Calculate weekly earnings
-        week_ago = timezone.now() - timedelta(days=7)
-        weekly_contracts = completed_contracts.filter(created_at__gte=week_ago)
-        stats.weekly_earnings = sum([contract.total_amount for contract in weekly_contracts])
-        
-        # Calculate jobs this month
-        stats.jobs_this_month = active_contracts.filter(created_at__month=current_month).count()
+        # Stats are maintained by the rollup engine, this is a single row read
+        stats = get_professional_stats(user)
         
-        # Calculate proposals this month
-        stats.proposals_this_month = proposals.filter(created_at__month=current_month).count()
-        
-        # Calculate average rating
-        reviews = Review.objects.filter(professional=user)
-        if reviews.exists():
-            stats.average_rating = sum([review.rating for review in reviews]) / reviews.count()
-        else:
-            stats.average_rating = 0
-            
-        # Calculate total clients
-        stats.total_clients = active_contracts.values('client').distinct().count()
-        
-        # Calculate pending payments
-        stats.pending_payments = Payment.objects.filter(
-            contract__professional=user, 
-            status='pending'
-        ).count()
-        
-        stats.save()
+        active_contracts = Contract.objects.filter(
+            professional=user, status__in=ACTIVE_CONTRACT_STATUSES
+        ).select_related('client', 'project__category')
         
         # Get active jobs (contracts)
         active_jobs = []
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     FileCategory, UploadedFile, FileShare, FileVersion, 
-    FileComment, FileActivityLog, FileFolder, FileSettings
+    FileComment, FileActivityLog, FileFolder, FileSettings, UploadSession, Blob
 )
 
 
@@ -154,4 +154,20 @@ class FileSettingsAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    ) 
\ No newline at end of file
+    ) 
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'uploaded_by', 'target', 'received_size', 'total_size', 'expires_at']
+    list_filter = ['target', 'created_at']
+    search_fields = ['filename', 'uploaded_by__username']
+    readonly_fields = ['upload_id', 'received_size', 'created_at', 'updated_at']
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'ref_count', 'updated_at']
+    list_filter = ['created_at']
+    search_fields = ['name', 'sha256']
+    readonly_fields = ['name', 'sha256', 'size', 'ref_count', 'created_at', 'updated_at']
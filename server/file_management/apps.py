@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class FileManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'file_management'
-    verbose_name = 'File Management' 
\ No newline at end of file
+    verbose_name = 'File Management' 
+
+    def ready(self):
+        """Register the signal handlers for blob references and thumbnails"""
+        import file_management.signals  # noqa: F401
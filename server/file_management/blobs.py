@@ -0,0 +1,130 @@
+"""
+Reference counting and garbage collection for content-addressed blobs.
+
+Every model field stored in BlobStorage (BLOB_FIELDS) keeps the ref_count
+of the Blob it points at up to date through signals.py: saving a row that
+points at a blob adds a reference, pointing it elsewhere or deleting it
+drops one. Queryset update() bypasses the signals, recount_references()
+repairs the counts from the rows.
+
+Blobs without references are deleted by collect_garbage(), as soon as the
+transaction dropping the last reference commits, or later by the
+collect_unreferenced_blobs task. A blob whose content was saved within
+BLOB_GC_GRACE_SECONDS is left alone either way, so a row being saved with
+content that is already stored can't lose the file before its reference
+is counted.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Blob
+from .storage import blob_storage, is_blob_name
+from .thumbnails import delete_variants, digest_variant_dir
+
+# (model label, field name) of every field stored in BlobStorage
+BLOB_FIELDS = [
+    ('file_management.UploadedFile', 'file'),
+    ('file_management.FileVersion', 'file'),
+    ('messaging.MessageAttachment', 'file'),
+    ('projects.ProjectFile', 'file'),
+    ('portfolio.PortfolioImage', 'image'),
+]
+
+
+def blob_fields():
+    """[(model, field name)] for BLOB_FIELDS"""
+    return [(apps.get_model(label), field_name) for label, field_name in BLOB_FIELDS]
+
+
+def gc_grace():
+    return timedelta(seconds=getattr(settings, 'BLOB_GC_GRACE_SECONDS', 3600))
+
+
+def add_reference(name):
+    if is_blob_name(name):
+        Blob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def drop_reference(name):
+    if not is_blob_name(name):
+        return
+    Blob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+    transaction.on_commit(lambda: collect_garbage([name]))
+
+
+def collect_garbage(names=None, grace=None):
+    """
+    Delete unreferenced blobs whose content was not saved within ``grace``
+    (BLOB_GC_GRACE_SECONDS by default), limited to ``names`` when given.
+    Returns how many were deleted.
+    """
+    cutoff = timezone.now() - (gc_grace() if grace is None else grace)
+    candidates = Blob.objects.filter(ref_count=0, updated_at__lt=cutoff)
+    if names is not None:
+        candidates = candidates.filter(name__in=names)
+
+    deleted = 0
+    for blob_id in list(candidates.values_list('id', flat=True)):
+        # Saves of the same content touch the row first, so they wait for
+        # this lock and then write the file again
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(
+                id=blob_id, ref_count=0, updated_at__lt=cutoff
+            ).first()
+            if blob is None:
+                continue
+            blob_storage.delete(blob.name)
+            delete_variants(digest_variant_dir(blob.sha256))
+            blob.delete()
+            deleted += 1
+    return deleted
+
+
+def recount_references():
+    """Recompute every ref_count from the rows pointing at blobs, returns how many changed"""
+    counts = Counter()
+    for model, field_name in blob_fields():
+        rows = model.objects.filter(**{f'{field_name}__startswith': 'blobs/'}).values(field_name).annotate(
+            refs=Count('pk')
+        )
+        for row in rows:
+            counts[row[field_name]] += row['refs']
+
+    changed = 0
+    for blob in Blob.objects.only('name', 'ref_count').iterator():
+        if blob.ref_count != counts.get(blob.name, 0):
+            Blob.objects.filter(pk=blob.pk).update(ref_count=counts.get(blob.name, 0))
+            changed += 1
+    return changed
+
+
+def import_legacy_files(delete_originals=False):
+    """
+    Move files stored before BlobStorage (names outside blobs/) into the blob
+    store and point their rows at the blobs. Returns how many rows moved.
+    """
+    moved = 0
+    for model, field_name in blob_fields():
+        rows = model.objects.exclude(**{f'{field_name}__startswith': 'blobs/'}).exclude(**{field_name: ''})
+        for instance in rows.iterator():
+            field_file = getattr(instance, field_name)
+            original = field_file.name
+            if not blob_storage.exists(original):
+                continue
+            with blob_storage.open(original, 'rb') as content:
+                name = blob_storage.save(original, content)
+            with transaction.atomic():
+                model.objects.filter(pk=instance.pk).update(**{field_name: name})
+                add_reference(name)
+            if delete_originals and not any(
+                other.objects.filter(**{other_field: original}).exists() for other, other_field in blob_fields()
+            ):
+                blob_storage.delete(original)
+            moved += 1
+    return moved
@@ -0,0 +1,180 @@
+"""
+File download responses.
+
+serve_file() answers conditional requests (If-None-Match, If-Modified-Since)
+with 304 before the file is opened and serves single byte ranges with 206,
+so video players can seek and clients revalidate without the body being
+sent again. With FILE_DOWNLOAD_OFFLOAD set the body is left to the front
+proxy instead: 'x-accel-redirect' for nginx, where the protected location
+FILE_DOWNLOAD_ACCEL_PREFIX aliases MEDIA_ROOT, or 'x-sendfile' for Apache
+and lighttpd. The proxy then handles ranges itself.
+
+Download counts are buffered in process by DownloadCounter and written as
+one UPDATE per file on a background thread, instead of a save on every
+download.
+"""
+import atexit
+import os
+import re
+from collections import Counter
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db.models import F
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_etags, parse_http_date_safe
+
+from alist_backend.buffers import WriteBuffer
+
+from .storage import is_blob_name
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+READ_SIZE = 64 * 1024
+
+
+def file_etag(uploaded):
+    """Strong ETag of an UploadedFile, its SHA-256 when known"""
+    name = uploaded.file.name
+    if is_blob_name(name):
+        return '"%s"' % os.path.splitext(os.path.basename(name))[0]
+    digest = (uploaded.metadata or {}).get('sha256')
+    if digest:
+        return f'"{digest}"'
+    return '"%x-%x"' % (uploaded.file_size, int(uploaded.updated_at.timestamp()))
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single ``bytes=`` range, None when the
+    header is absent or not one we serve partially. Raises ValueError when
+    the range can't be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        # Suffix range, the last N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or end < start:
+        raise ValueError('Range not satisfiable')
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """Whether a Range may be honoured given the request's If-Range"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return etag in parse_etags(if_range)
+    since = parse_http_date_safe(if_range)
+    return since is not None and last_modified is not None and int(last_modified) <= since
+
+
+def read_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def offload_response(field_file):
+    """Empty response telling the front proxy to send the file, None when not configured"""
+    offload = getattr(settings, 'FILE_DOWNLOAD_OFFLOAD', None)
+    if offload == 'x-accel-redirect':
+        response = HttpResponse()
+        prefix = getattr(settings, 'FILE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(field_file.name)
+        return response
+    if offload == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = field_file.path
+        return response
+    return None
+
+
+def serve_file(request, field_file, filename, content_type, size, etag=None, last_modified=None):
+    """
+    Response for downloading ``field_file`` of ``size`` bytes as an
+    attachment, honouring conditional and Range requests.
+    ``last_modified`` is a POSIX timestamp.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = offload_response(field_file)
+    if response is None:
+        byte_range = None
+        if request.method in ('GET', 'HEAD') and if_range_matches(request, etag, last_modified):
+            try:
+                byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+        if byte_range is None:
+            response = FileResponse(field_file.open('rb'))
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                read_range(field_file.open('rb'), start, end - start + 1), status=206
+            )
+            response['Content-Length'] = str(end - start + 1)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Accept-Ranges'] = 'bytes'
+
+    if response.status_code != 304:
+        response['Content-Type'] = content_type
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+    # Access is checked per user, shared caches must not keep the file
+    response['Cache-Control'] = 'private, no-cache'
+    if etag:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class DownloadCounter(WriteBuffer):
+    """Download counts per UploadedFile id, written to the database in batches"""
+    batch_setting = 'FILE_DOWNLOAD_COUNT_BATCH'
+    interval_setting = 'FILE_DOWNLOAD_COUNT_INTERVAL'
+
+    def empty(self):
+        return Counter()
+
+    def store(self, counts, file_pk):
+        counts[file_pk] += 1
+
+    def restore(self, counts):
+        self.items.update(counts)
+
+    def write(self, counts):
+        from .models import UploadedFile
+
+        now = timezone.now()
+        for file_pk, count in counts.items():
+            UploadedFile.objects.filter(pk=file_pk).update(
+                download_count=F('download_count') + count, last_accessed=now
+            )
+        return counts
+
+
+download_counter = DownloadCounter()
+# Counts still buffered when the worker stops
+atexit.register(download_counter.flush)
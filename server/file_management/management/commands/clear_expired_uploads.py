@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from file_management.uploads import clear_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked upload sessions that expired before being committed, with their part files'
+
+    def handle(self, *args, **options):
+        count = clear_expired()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired upload sessions'))
@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from file_management.blobs import collect_garbage, import_legacy_files, recount_references
+
+
+class Command(BaseCommand):
+    help = 'Delete unreferenced content-addressed blobs, optionally repairing reference counts first'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--import-legacy',
+            action='store_true',
+            help='First move files stored before the blob store into it',
+        )
+        parser.add_argument(
+            '--delete-originals',
+            action='store_true',
+            help='With --import-legacy, delete the original files once no row uses them',
+        )
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Recompute reference counts from the rows before collecting',
+        )
+        parser.add_argument(
+            '--grace',
+            type=int,
+            help='Seconds since a blob was last saved before it may be deleted (default BLOB_GC_GRACE_SECONDS)',
+        )
+
+    def handle(self, *args, **options):
+        if options['import_legacy']:
+            moved = import_legacy_files(delete_originals=options['delete_originals'])
+            self.stdout.write(f'Moved {moved} files into the blob store')
+
+        if options['recount']:
+            changed = recount_references()
+            self.stdout.write(f'Corrected {changed} reference counts')
+
+        grace = timedelta(seconds=options['grace']) if options['grace'] is not None else None
+        deleted = collect_garbage(grace=grace)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} unreferenced blobs'))
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:53
+
+from django.db import migrations, models
+import file_management.models
+import file_management.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file_management', '0002_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fileversion',
+            name='file',
+            field=models.FileField(storage=file_management.storage.get_blob_storage, upload_to=file_management.models.user_file_path),
+        ),
+        migrations.AlterField(
+            model_name='uploadedfile',
+            name='file',
+            field=models.FileField(storage=file_management.storage.get_blob_storage, upload_to=file_management.models.user_file_path),
+        ),
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Blob',
+                'verbose_name_plural': 'Blobs',
+                'db_table': 'file_blobs',
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='file_blobs_ref_cou_186701_idx')],
+            },
+        ),
+    ]
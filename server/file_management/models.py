@@ -5,6 +5,8 @@ from django.utils import timezone
 import uuid
 import os
 
+from .storage import get_blob_storage
+
 User = get_user_model()
 
 
@@ -38,6 +40,31 @@ def user_file_path(instance, filename):
     return f"files/{instance.uploaded_by.id}/{timezone.now().year}/{timezone.now().month}/{filename}"
 
 
+class Blob(models.Model):
+    """الملفات المخزنة حسب المحتوى"""
+    # Storage name, blobs/<aa>/<bb>/<sha256><ext>
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    
+    # Model rows pointing at the blob, collected once it drops to zero
+    ref_count = models.PositiveIntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'file_blobs'
+        verbose_name = 'Blob'
+        verbose_name_plural = 'Blobs'
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
 class UploadedFile(models.Model):
     """الملفات المرفوعة"""
     FILE_TYPES = [
@@ -61,7 +88,7 @@ class UploadedFile(models.Model):
     
     # Basic file info
     file_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
-    file = models.FileField(upload_to=user_file_path)
+    file = models.FileField(upload_to=user_file_path, storage=get_blob_storage)
     original_filename = models.CharField(max_length=255)
     file_size = models.PositiveIntegerField()  # in bytes
     file_type = models.CharField(max_length=20, choices=FILE_TYPES)
@@ -79,6 +106,8 @@ class UploadedFile(models.Model):
     
     # Thumbnail for images and videos
     thumbnail = models.ImageField(upload_to='thumbnails/%Y/%m/%d/', null=True, blank=True)
+    # Resized WebP/JPEG renditions per size, see thumbnails.py
+    variants = models.JSONField(default=dict, blank=True)
     
     # Security and validation
     is_scanned = models.BooleanField(default=False)
@@ -147,6 +176,18 @@ class UploadedFile(models.Model):
         """Check if file is a video"""
         return self.file_type == 'video'
     
+    def snapshot(self, uploaded_by=None, change_description=''):
+        """Record the current content as a new version, it shares the stored blob"""
+        last = self.versions.aggregate(last=models.Max('version_number'))['last'] or 0
+        return FileVersion.objects.create(
+            original_file=self,
+            version_number=last + 1,
+            file=self.file.name,
+            file_size=self.file_size,
+            change_description=change_description,
+            uploaded_by=uploaded_by or self.uploaded_by
+        )
+    
     def can_preview(self):
         """Check if file can be previewed"""
         preview_types = ['image', 'document']  # Add more as needed
@@ -158,6 +199,48 @@ class UploadedFile(models.Model):
         )
 
 
+class UploadSession(models.Model):
+    """جلسات الرفع على دفعات"""
+    TARGETS = [
+        ('file', 'Uploaded File'),
+        ('message_attachment', 'Message Attachment'),
+    ]
+    
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    uploaded_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=30, choices=TARGETS, default='file')
+    
+    # Declared by the client when the session starts
+    filename = models.CharField(max_length=255)
+    mime_type = models.CharField(max_length=100)
+    total_size = models.PositiveBigIntegerField()
+    
+    # Bytes stored so far, chunks must start here
+    received_size = models.PositiveBigIntegerField(default=0)
+    
+    # Fields for the row created on commit (upload_purpose, description, ...)
+    options = models.JSONField(default=dict, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'upload_sessions'
+        verbose_name = 'Upload Session'
+        verbose_name_plural = 'Upload Sessions'
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received_size}/{self.total_size})"
+    
+    @property
+    def is_complete(self):
+        return self.received_size == self.total_size
+
+
 class FileShare(models.Model):
     """مشاركة الملفات"""
     PERMISSION_TYPES = [
@@ -220,7 +303,7 @@ class FileVersion(models.Model):
         related_name='versions'
     )
     version_number = models.PositiveIntegerField()
-    file = models.FileField(upload_to=user_file_path)
+    file = models.FileField(upload_to=user_file_path, storage=get_blob_storage)
     file_size = models.PositiveIntegerField()
     
     # Changes
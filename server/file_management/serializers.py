@@ -1,13 +1,32 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from alist_backend.serializers import SparseFieldsetMixin
 from .models import (
     FileCategory, UploadedFile, FileShare, FileVersion, 
-    FileComment, FileFolder, FileSettings
+    FileComment, FileFolder, FileSettings, UploadSession
 )
+from .thumbnails import FORMATS
+from .uploads import uploaded_file_type
 
 User = get_user_model()
 
 
+class MediaVariantsField(serializers.ReadOnlyField):
+    """Thumbnail variants of a row (see thumbnails.py) with their URLs"""
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        variants = {}
+        for size, variant in (value or {}).items():
+            variants[size] = dict(variant)
+            for key in FORMATS:
+                if variant.get(key):
+                    url = default_storage.url(variant[key])
+                    variants[size][key] = request.build_absolute_uri(url) if request else url
+        return variants
+
+
 class UserBasicSerializer(serializers.ModelSerializer):
     """Serializer أساسي للمستخدم"""
     class Meta:
@@ -32,6 +51,7 @@ class UploadedFileSerializer(serializers.ModelSerializer):
     file_size_formatted = serializers.ReadOnlyField()
     file_extension = serializers.ReadOnlyField()
     category_name = serializers.CharField(source='category.name', read_only=True)
+    variants = MediaVariantsField()
     
     class Meta:
         model = UploadedFile
@@ -39,8 +59,8 @@ class UploadedFileSerializer(serializers.ModelSerializer):
             'id', 'file_id', 'file', 'original_filename', 'file_size', 
             'file_size_formatted', 'file_type', 'mime_type', 'file_extension',
             'uploaded_by', 'upload_purpose', 'category', 'category_name',
-            'width', 'height', 'duration', 'thumbnail', 'is_public', 'is_temp',
-            'expires_at', 'download_count', 'last_accessed', 'tags', 'description',
+            'width', 'height', 'duration', 'thumbnail', 'variants', 'is_public',
+            'is_temp', 'expires_at', 'download_count', 'last_accessed', 'tags', 'description',
             'created_at', 'updated_at'
         ]
         read_only_fields = [
@@ -81,23 +101,50 @@ class FileUploadSerializer(serializers.ModelSerializer):
         validated_data['mime_type'] = getattr(file, 'content_type', 'application/octet-stream')
         
         # Determine file type based on mime type
-        mime_type = validated_data['mime_type']
-        if mime_type.startswith('image/'):
-            validated_data['file_type'] = 'image'
-        elif mime_type.startswith('video/'):
-            validated_data['file_type'] = 'video'
-        elif mime_type.startswith('audio/'):
-            validated_data['file_type'] = 'audio'
-        elif mime_type in ['application/pdf', 'application/msword', 'text/plain']:
-            validated_data['file_type'] = 'document'
-        elif mime_type in ['application/zip', 'application/x-rar']:
-            validated_data['file_type'] = 'archive'
-        else:
-            validated_data['file_type'] = 'other'
+        validated_data['file_type'] = uploaded_file_type(validated_data['mime_type'])
         
         return super().create(validated_data)
 
 
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer لجلسات الرفع على دفعات"""
+    class Meta:
+        model = UploadSession
+        fields = [
+            'upload_id', 'target', 'filename', 'mime_type', 'total_size',
+            'received_size', 'is_complete', 'expires_at', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    """Serializer لبدء رفع ملف على دفعات"""
+    filename = serializers.CharField(max_length=255)
+    total_size = serializers.IntegerField(min_value=0)
+    mime_type = serializers.CharField(max_length=100, default='application/octet-stream')
+    target = serializers.ChoiceField(choices=UploadSession.TARGETS, default='file')
+    
+    # Stored on the UploadedFile created on commit
+    upload_purpose = serializers.ChoiceField(choices=UploadedFile.UPLOAD_PURPOSES, default='general')
+    category = serializers.PrimaryKeyRelatedField(queryset=FileCategory.objects.all(), required=False)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    tags = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    is_public = serializers.BooleanField(default=False)
+    
+    def get_options(self):
+        """Fields of the row created on commit"""
+        data = self.validated_data
+        options = {
+            'upload_purpose': data['upload_purpose'],
+            'description': data['description'],
+            'tags': data['tags'],
+            'is_public': data['is_public'],
+        }
+        if data.get('category'):
+            options['category'] = data['category'].pk
+        return options
+
+
 class FileShareSerializer(serializers.ModelSerializer):
     """Serializer لمشاركة الملفات"""
     file = UploadedFileSerializer(read_only=True)
@@ -196,7 +243,7 @@ class FileCommentSerializer(serializers.ModelSerializer):
         return []
 
 
-class FileFolderSerializer(serializers.ModelSerializer):
+class FileFolderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer لمجلدات الملفات"""
     owner = UserBasicSerializer(read_only=True)
     full_path = serializers.ReadOnlyField(source='get_full_path')
@@ -213,10 +260,14 @@ class FileFolderSerializer(serializers.ModelSerializer):
     
     def get_files_count(self, obj):
         """Get number of files in folder"""
+        if hasattr(obj, 'list_files_count'):
+            return obj.list_files_count
         return obj.files.count()
     
     def get_subfolders_count(self, obj):
         """Get number of subfolders"""
+        if hasattr(obj, 'list_subfolders_count'):
+            return obj.list_subfolders_count
         return obj.subfolders.count()
 
 
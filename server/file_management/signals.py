@@ -0,0 +1,100 @@
+"""
+Keep Blob reference counts in step with the rows of blobs.BLOB_FIELDS, and
+generate thumbnails for images and videos saved to thumbnails.MEDIA_FIELDS.
+"""
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+
+from .blobs import add_reference, blob_fields, drop_reference
+from .storage import is_blob_name
+from .thumbnails import MEDIA_FIELDS, delete_variants, media_kind, schedule_variants, variant_dir
+
+# Model class -> name of its BlobStorage field
+FIELD_NAMES = {}
+
+
+def _name(value):
+    return (getattr(value, 'name', value) or '') if value is not None else ''
+
+
+def remember_blob(sender, instance, **kwargs):
+    """Note the stored name a row was loaded with, without loading deferred fields"""
+    field_name = FIELD_NAMES[sender]
+    if instance.pk is not None and field_name in instance.__dict__:
+        instance._stored_blob = _name(instance.__dict__[field_name])
+
+
+def load_stored_blob(sender, instance, raw=False, **kwargs):
+    """Fetch the stored name of rows that were not loaded with it"""
+    if raw or instance._state.adding or hasattr(instance, '_stored_blob'):
+        return
+    field_name = FIELD_NAMES[sender]
+    stored = sender._default_manager.filter(pk=instance.pk).values_list(field_name, flat=True).first()
+    instance._stored_blob = stored or ''
+
+
+def count_blob_reference(sender, instance, created, raw=False, **kwargs):
+    """Move the reference from the previously stored blob to the current one"""
+    if raw:
+        return
+    current = _name(getattr(instance, FIELD_NAMES[sender]))
+    previous = '' if created else getattr(instance, '_stored_blob', '')
+    if current != previous:
+        add_reference(current)
+        drop_reference(previous)
+    instance._stored_blob = current
+
+
+def drop_blob_reference(sender, instance, **kwargs):
+    drop_reference(getattr(instance, '_stored_blob', None) or _name(getattr(instance, FIELD_NAMES[sender])))
+
+
+def connect_blob_fields():
+    for model, field_name in blob_fields():
+        FIELD_NAMES[model] = field_name
+        uid = f'blob_refs_{model._meta.label_lower}'
+        post_init.connect(remember_blob, sender=model, dispatch_uid=uid)
+        pre_save.connect(load_stored_blob, sender=model, dispatch_uid=uid)
+        post_save.connect(count_blob_reference, sender=model, dispatch_uid=uid)
+        post_delete.connect(drop_blob_reference, sender=model, dispatch_uid=uid)
+
+
+def remember_media(sender, instance, **kwargs):
+    field_name = MEDIA_FIELDS[sender._meta.label]
+    if instance.pk is not None and field_name in instance.__dict__:
+        instance._media_source = _name(instance.__dict__[field_name])
+
+
+def queue_media_variants(sender, instance, created, raw=False, **kwargs):
+    """Generate variants once a new or replaced image or video is committed"""
+    if raw:
+        return
+    current = _name(getattr(instance, MEDIA_FIELDS[sender._meta.label]))
+    # Rows loaded without the field are taken to keep their file
+    previous = '' if created else getattr(instance, '_media_source', current)
+    if current and current != previous and media_kind(instance):
+        label, pk = sender._meta.label, instance.pk
+        transaction.on_commit(lambda: schedule_variants(label, pk))
+    instance._media_source = current
+
+
+def delete_media_variants(sender, instance, **kwargs):
+    # Variants of blobs are shared by content and go with the blob
+    field_name = MEDIA_FIELDS[sender._meta.label]
+    if not is_blob_name(_name(getattr(instance, field_name))):
+        directory = variant_dir(instance, field_name)
+        transaction.on_commit(lambda: delete_variants(directory))
+
+
+def connect_media_fields():
+    for label in MEDIA_FIELDS:
+        model = apps.get_model(label)
+        uid = f'media_variants_{model._meta.label_lower}'
+        post_init.connect(remember_media, sender=model, dispatch_uid=uid)
+        post_save.connect(queue_media_variants, sender=model, dispatch_uid=uid)
+        post_delete.connect(delete_media_variants, sender=model, dispatch_uid=uid)
+
+
+connect_blob_fields()
+connect_media_fields()
@@ -0,0 +1,81 @@
+"""
+Content-addressed file storage.
+
+Files saved through BlobStorage are stored once per distinct content, at
+``blobs/<aa>/<bb>/<sha256><ext>``, whatever name the model's upload_to
+produces. Saving content that is already stored writes nothing and returns
+the existing name, so the same PDF attached to ten conversations takes the
+space of one.
+
+Each stored file has a Blob row counting the model rows that point at it
+(see blobs.py). Blobs are only deleted by blobs.collect_garbage, which never
+touches one saved or referenced within BLOB_GC_GRACE_SECONDS.
+"""
+import hashlib
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+
+BLOB_PREFIX = 'blobs/'
+
+
+def content_sha256(content):
+    """SHA-256 hex digest of a File, read in chunks"""
+    hasher = hashlib.sha256()
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+class BlobStorage(FileSystemStorage):
+    """FileSystemStorage that names files after their SHA-256"""
+
+    def blob_name(self, digest, name):
+        # Keep a short extension so the file is still served with the right type
+        ext = os.path.splitext(name)[1].lower()
+        if not re.fullmatch(r'\.[a-z0-9]{1,10}', ext):
+            ext = ''
+        return f'{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+    def get_available_name(self, name, max_length=None):
+        # Names come from the content, the same name means the same bytes
+        return name
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        # Uploads that were hashed while streaming (uploads.PartFile) carry their digest
+        digest = getattr(content, 'sha256', None) or content_sha256(content)
+        blob_name = self.blob_name(digest, name)
+
+        # Touching the row keeps the blob from being collected before the
+        # new reference is saved
+        if Blob.objects.filter(name=blob_name).update(updated_at=timezone.now()) and self.exists(blob_name):
+            return blob_name
+
+        # Written under a unique name and renamed, so concurrent saves of the
+        # same content can't interleave
+        incoming = super()._save(f'{BLOB_PREFIX}incoming/{uuid.uuid4().hex}', content)
+        os.makedirs(os.path.dirname(self.path(blob_name)), exist_ok=True)
+        os.replace(self.path(incoming), self.path(blob_name))
+
+        # A concurrent save of the same content may insert the row first,
+        # the conflict is skipped and the update below applies to its row
+        size = self.size(blob_name)
+        Blob.objects.bulk_create([Blob(name=blob_name, sha256=digest, size=size)], ignore_conflicts=True)
+        Blob.objects.filter(name=blob_name).update(sha256=digest, size=size, updated_at=timezone.now())
+        return blob_name
+
+
+blob_storage = BlobStorage()
+
+
+def get_blob_storage():
+    return blob_storage
@@ -0,0 +1,16 @@
+from celery import shared_task
+
+from .blobs import collect_garbage
+from .thumbnails import generate_variants
+
+
+@shared_task
+def collect_unreferenced_blobs():
+    """Delete stored files no row has referenced for BLOB_GC_GRACE_SECONDS"""
+    return collect_garbage()
+
+
+@shared_task
+def generate_media_variants(model_label, pk):
+    """Thumbnails, dimensions and duration of a newly saved image or video"""
+    generate_variants(model_label, pk)
@@ -1,11 +1,28 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Sum
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from alist_backend.aggregates import pivot
 from .models import (
     FileCategory, UploadedFile, FileShare, FileVersion, 
-    FileComment, FileFolder, FileSettings
+    FileComment, FileFolder, FileSettings, UploadSession, Blob
 )
+from .blobs import collect_garbage
+from .downloads import download_counter
+from .serializers import UploadedFileSerializer
+from .uploads import UploadError, append_chunk, stage_chunk
 
 User = get_user_model()
 
@@ -272,4 +289,452 @@ class FileSettingsModelTest(TestCase):
         
         self.assertIn('.jpg', settings.allowed_image_extensions)
         self.assertIn('.pdf', settings.allowed_document_extensions)
-        self.assertIn('.mp4', settings.allowed_video_extensions) 
\ No newline at end of file
+        self.assertIn('.mp4', settings.allowed_video_extensions) 
+
+
+class ChunkedUploadTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_dir, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_ROOT=os.path.join(self.storage_dir, 'media'),
+            CHUNKED_UPLOAD_DIR=os.path.join(self.storage_dir, 'partial'),
+            CHUNKED_UPLOAD_MAX_CHUNK_SIZE=4,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_login(self.user)
+
+    def start(self, content, **fields):
+        response = self.client.post('/api/files/uploads/', {
+            'filename': 'notes.txt',
+            'total_size': len(content),
+            'mime_type': 'text/plain',
+            **fields
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return response.json()['upload_id']
+
+    def put(self, upload_id, offset, chunk):
+        return self.client.put(
+            f'/api/files/uploads/{upload_id}/', chunk,
+            content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_chunks_are_resumed_and_committed_to_a_file(self):
+        """Chunks must continue at received_size, commit checks the SHA-256 and creates the file"""
+        content = b'hello world'
+        upload_id = self.start(content, upload_purpose='contract_document')
+
+        self.assertEqual(self.put(upload_id, 0, content[:4]).json()['received_size'], 4)
+        response = self.put(upload_id, 0, content[4:8])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['received_size'], 4)
+        self.assertEqual(self.put(upload_id, 4, content[4:]).status_code, 400)
+        self.put(upload_id, 4, content[4:8])
+        self.assertTrue(self.put(upload_id, 8, content[8:]).json()['is_complete'])
+
+        response = self.client.post(f'/api/files/uploads/{upload_id}/commit/', {
+            'sha256': hashlib.sha256(b'something else').hexdigest()
+        })
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(f'/api/files/uploads/{upload_id}/commit/', {
+            'sha256': hashlib.sha256(content).hexdigest()
+        })
+        self.assertEqual(response.status_code, 201)
+        uploaded = UploadedFile.objects.get(file_id=response.json()['file_id'])
+        self.assertEqual(uploaded.file_size, len(content))
+        self.assertEqual(uploaded.file_type, 'document')
+        self.assertEqual(uploaded.upload_purpose, 'contract_document')
+        self.assertEqual(uploaded.metadata['sha256'], hashlib.sha256(content).hexdigest())
+        with uploaded.file.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.storage_dir, 'partial')), [])
+
+    def test_chunk_staged_at_a_taken_offset_is_refused(self):
+        """Two chunks staged for one offset, only the first one locked in is appended"""
+        upload_id = self.start(b'abcdef')
+        session = UploadSession.objects.get(upload_id=upload_id)
+        first = stage_chunk(session, 0, BytesIO(b'abcd'), 4)
+        second = stage_chunk(session, 0, BytesIO(b'wxyz'), 4)
+
+        append_chunk(session, first)
+        with self.assertRaises(UploadError):
+            append_chunk(session, second)
+        second.discard()
+
+        session.refresh_from_db()
+        self.assertEqual(session.received_size, 4)
+        self.assertEqual(self.put(upload_id, 4, b'ef').status_code, 200)
+        response = self.client.post(f'/api/files/uploads/{upload_id}/commit/', {
+            'sha256': hashlib.sha256(b'abcdef').hexdigest()
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(os.listdir(os.path.join(self.storage_dir, 'partial')), [])
+
+    def test_message_is_not_sent_when_an_upload_fails_to_commit(self):
+        """A failing upload leaves neither the message nor the attachments committed before it"""
+        from messaging.models import Conversation, Message, MessageAttachment
+        from . import uploads
+
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.user, other)
+
+        def send(path, target, data, **kwargs):
+            upload_ids = []
+            for content in (b'abcd', b'efgh'):
+                upload_id = self.start(content, target='message_attachment')
+                self.put(upload_id, 0, content)
+                upload_ids.append(upload_id)
+            calls = []
+
+            def commit(session, message=None):
+                calls.append(session)
+                if len(calls) == 2:
+                    raise uploads.UploadError("Upload was already committed", status_code=409)
+                return uploads.commit_upload(session, message=message)
+
+            with mock.patch(target, side_effect=commit):
+                return self.client.post(path, {**data, 'upload_ids': upload_ids}, content_type='application/json')
+
+        response = send(
+            f'/api/messages/conversations/{conversation.id}/messages/create/',
+            'messaging.serializers.commit_upload', {'content': 'See attached'}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = send(
+            '/api/messages/send/', 'messaging.views.commit_upload',
+            {'conversation_id': conversation.id, 'message': 'See attached'}
+        )
+        self.assertEqual(response.status_code, 409)
+
+        self.assertFalse(Message.objects.exists())
+        self.assertFalse(MessageAttachment.objects.exists())
+        self.assertEqual(UploadSession.objects.count(), 4)
+
+        # A session another request committed meanwhile is refused
+        stale = UploadSession.objects.first()
+        UploadSession.objects.filter(pk=stale.pk).delete()
+        with self.assertRaisesMessage(uploads.UploadError, 'already committed'):
+            uploads.lock_sessions([stale])
+
+    def test_upload_is_attached_when_the_message_is_sent(self):
+        """A complete attachment upload becomes a MessageAttachment of the new message"""
+        from messaging.models import Conversation
+
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.user, other)
+
+        upload_id = self.start(b'abcdef', target='message_attachment')
+        response = self.client.post(f'/api/messages/conversations/{conversation.id}/messages/create/', {
+            'content': 'See attached',
+            'upload_ids': [upload_id]
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        self.put(upload_id, 0, b'abcd')
+        self.put(upload_id, 4, b'ef')
+        response = self.client.post(f'/api/messages/conversations/{conversation.id}/messages/create/', {
+            'content': 'See attached',
+            'upload_ids': [upload_id]
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        attachment = conversation.messages.get().attachments.get()
+        self.assertEqual((attachment.original_filename, attachment.file_size), ('notes.txt', 6))
+        self.assertFalse(UploadSession.objects.exists())
+
+
+class BlobStoreTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_dir, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.storage_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def upload(self, name, content):
+        return UploadedFile.objects.create(
+            file=SimpleUploadedFile(name, content),
+            original_filename=name,
+            file_size=len(content),
+            file_type='document',
+            mime_type='text/plain',
+            uploaded_by=self.user
+        )
+
+    def test_identical_content_is_stored_once(self):
+        """Rows with the same content share one blob, counted once per row"""
+        from messaging.models import Conversation, Message, MessageAttachment
+
+        content = b'same bytes'
+        first = self.upload('a.txt', content)
+        message = Message.objects.create(
+            conversation=Conversation.objects.create(), sender=self.user, content='attached'
+        )
+        attachment = MessageAttachment.objects.create(
+            message=message,
+            file=SimpleUploadedFile('b.txt', content),
+            original_filename='b.txt',
+            file_size=len(content),
+            file_type='document',
+            mime_type='text/plain'
+        )
+
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(first.file.name, f'blobs/{digest[:2]}/{digest[2:4]}/{digest}.txt')
+        self.assertEqual(attachment.file.name, first.file.name)
+        blob = Blob.objects.get()
+        self.assertEqual((blob.sha256, blob.size, blob.ref_count), (digest, len(content), 2))
+
+        first.snapshot(change_description='before edit')
+        self.assertEqual(FileVersion.objects.get().file.name, first.file.name)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 3)
+
+    def test_blob_row_saved_by_a_concurrent_upload_is_reused(self):
+        """A row inserted after the file was checked keeps its id and references"""
+        content = b'raced bytes'
+        digest = hashlib.sha256(content).hexdigest()
+        name = f'blobs/{digest[:2]}/{digest[2:4]}/{digest}.txt'
+        # The file isn't stored yet, as when the other upload's rename hasn't happened
+        raced = Blob.objects.create(name=name, sha256=digest, size=0)
+
+        uploaded = self.upload('a.txt', content)
+        self.assertEqual(uploaded.file.name, name)
+        blob = Blob.objects.get()
+        self.assertEqual((blob.pk, blob.size, blob.ref_count), (raced.pk, len(content), 1))
+
+    def test_unreferenced_blobs_are_collected_after_grace(self):
+        """Deleting the last row leaves the blob until its grace period is over"""
+        uploaded = self.upload('a.txt', b'only copy')
+        path = uploaded.file.path
+        version = uploaded.snapshot()
+
+        version.delete()
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        uploaded.delete()
+        self.assertEqual(Blob.objects.get().ref_count, 0)
+
+        self.assertEqual(collect_garbage(), 0)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(collect_garbage(grace=timedelta(0)), 1)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(Blob.objects.exists())
+
+
+class FileDownloadTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_dir, ignore_errors=True)
+        # A long interval keeps counts buffered until the test flushes them
+        settings_override = override_settings(MEDIA_ROOT=self.storage_dir, FILE_DOWNLOAD_COUNT_INTERVAL=3600)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(download_counter.flush)
+
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.client.force_login(self.user)
+        self.content = b'0123456789'
+        self.file = UploadedFile.objects.create(
+            file=SimpleUploadedFile('clip.mp4', self.content),
+            original_filename='clip.mp4',
+            file_size=len(self.content),
+            file_type='video',
+            mime_type='video/mp4',
+            uploaded_by=self.user
+        )
+        self.url = f'/api/files/files/{self.file.file_id}/download/'
+
+    def test_ranges_and_revalidation(self):
+        """Byte ranges answer 206, a matching ETag 304, and downloads are counted in batches"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        etag = response['ETag']
+        self.assertEqual(etag, '"%s"' % hashlib.sha256(self.content).hexdigest())
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3', HTTP_IF_RANGE=etag)
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self.file.refresh_from_db()
+        self.assertEqual(self.file.download_count, 0)
+        # Written by the timer if nothing flushes them sooner
+        self.assertEqual(download_counter.timer.interval, 3600)
+        download_counter.flush()
+        self.assertIsNone(download_counter.timer)
+        self.file.refresh_from_db()
+        # The full downloads, not the partial or revalidating requests
+        self.assertEqual(self.file.download_count, 2)
+
+    @override_settings(FILE_DOWNLOAD_OFFLOAD='x-accel-redirect')
+    def test_offload_to_front_proxy(self):
+        """With offloading the response carries no body, only the proxy's redirect"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.file.file.name}')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="clip.mp4"')
+
+
+# Rendered on commit, without a Celery worker
+@override_settings(THUMBNAIL_SIZES={'small': 40, 'medium': 100}, MEDIA_VARIANTS_ASYNC=False)
+class MediaVariantsTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_dir, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.storage_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+
+    def png(self, width, height):
+        buffer = BytesIO()
+        Image.new('RGBA', (width, height), (200, 30, 30, 128)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_images_get_dimensions_and_variants_on_commit(self):
+        """Each size is rendered as WebP and JPEG, and identical images share them"""
+        content = self.png(400, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            uploaded = UploadedFile.objects.create(
+                file=SimpleUploadedFile('photo.png', content),
+                original_filename='photo.png',
+                file_size=len(content),
+                file_type='image',
+                mime_type='image/png',
+                uploaded_by=self.user
+            )
+        uploaded.refresh_from_db()
+        self.assertEqual((uploaded.width, uploaded.height), (400, 200))
+        self.assertEqual(set(uploaded.variants), {'small', 'medium'})
+        small = uploaded.variants['small']
+        self.assertEqual((small['width'], small['height']), (40, 20))
+        with Image.open(os.path.join(self.storage_dir, small['webp'])) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (40, 20)))
+        self.assertEqual(uploaded.thumbnail.name, uploaded.variants['medium']['jpeg'])
+
+        data = UploadedFileSerializer(uploaded).data
+        self.assertEqual(data['variants']['small']['webp'], f"/media/{small['webp']}")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            copy = UploadedFile.objects.create(
+                file=SimpleUploadedFile('copy.png', content),
+                original_filename='copy.png',
+                file_size=len(content),
+                file_type='image',
+                mime_type='image/png',
+                uploaded_by=self.user
+            )
+        copy.refresh_from_db()
+        self.assertEqual(copy.variants, uploaded.variants)
+
+    def test_unreadable_images_are_left_alone(self):
+        """A file that isn't really an image gets no variants and no error"""
+        with self.captureOnCommitCallbacks(execute=True):
+            uploaded = UploadedFile.objects.create(
+                file=SimpleUploadedFile('broken.jpg', b'not an image'),
+                original_filename='broken.jpg',
+                file_size=12,
+                file_type='image',
+                mime_type='image/jpeg',
+                uploaded_by=self.user
+            )
+        uploaded.refresh_from_db()
+        self.assertEqual(uploaded.variants, {})
+        self.assertIsNone(uploaded.width)
+
+
+class FileStatsTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.storage_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.storage_dir, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.storage_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpass123'
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def upload(self, name, file_type, purpose, size):
+        return UploadedFile.objects.create(
+            file=SimpleUploadedFile(name, b'x' * size),
+            original_filename=name,
+            file_size=size,
+            file_type=file_type,
+            mime_type='application/octet-stream',
+            upload_purpose=purpose,
+            uploaded_by=self.user
+        )
+
+    def test_stats_come_from_two_queries(self):
+        """Totals and types are conditional aggregates, purposes one GROUP BY"""
+        self.upload('a.pdf', 'document', 'contract_document', 10)
+        self.upload('b.pdf', 'document', 'general', 20)
+        self.upload('c.zip', 'archive', 'general', 30)
+
+        with self.assertNumQueries(2):
+            response = self.api.get('/api/files/stats/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_files'], 3)
+        self.assertEqual(response.data['total_size'], 60)
+        self.assertEqual(response.data['recent_uploads'], 3)
+        self.assertEqual(response.data['files_by_type'], {'document': 2, 'archive': 1})
+        self.assertEqual(response.data['files_by_purpose'], {'contract_document': 1, 'general': 2})
+
+        self.assertEqual(pivot(UploadedFile.objects.all(), 'file_type', count=Count('pk'), size=Sum('file_size')), {
+            'document': {'count': 2, 'size': 30},
+            'archive': {'count': 1, 'size': 30},
+        })
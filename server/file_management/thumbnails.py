@@ -0,0 +1,192 @@
+"""
+Thumbnails and media metadata for uploaded images and videos.
+
+After an image or video is saved to one of MEDIA_FIELDS, generate_variants
+runs from the generate_media_variants Celery task. With MEDIA_VARIANTS_ASYNC
+off, which settings.py only defaults to under DEBUG or
+CELERY_TASK_ALWAYS_EAGER, it runs on commit in the web process instead. It
+records width, height and, for videos, duration, and renders every
+THUMBNAIL_SIZES box as WebP and JPEG into the row's ``variants``:
+
+    {"small": {"width": 160, "height": 90, "webp": "thumbnails/...", "jpeg": "thumbnails/..."}, ...}
+
+Video posters need ffmpeg/ffprobe on the PATH, without them videos are left
+alone. Variants of files in the blob store live next to the content's
+SHA-256, so identical uploads share them and they are deleted with the blob.
+"""
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .storage import is_blob_name
+
+logger = logging.getLogger(__name__)
+
+# Model label -> the file field thumbnails are made from
+MEDIA_FIELDS = {
+    'file_management.UploadedFile': 'file',
+    'messaging.MessageAttachment': 'file',
+    'projects.ProjectImage': 'image',
+}
+
+# Variant format -> (Pillow format, extension)
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+
+def thumbnail_sizes():
+    return getattr(settings, 'THUMBNAIL_SIZES', {'small': 160, 'medium': 480, 'large': 1280})
+
+
+def media_kind(instance):
+    """'image', 'video' or None for rows thumbnails aren't made for"""
+    file_type = getattr(instance, 'file_type', 'image')
+    return file_type if file_type in ('image', 'video') else None
+
+
+def digest_variant_dir(digest):
+    return f'thumbnails/{digest[:2]}/{digest}'
+
+
+def variant_dir(instance, field_name):
+    name = getattr(instance, field_name).name
+    if is_blob_name(name):
+        return digest_variant_dir(os.path.splitext(os.path.basename(name))[0])
+    return f'thumbnails/{instance._meta.model_name}/{instance.pk}'
+
+
+def delete_variants(directory):
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        default_storage.delete(f'{directory}/{name}')
+
+
+def encode(image, pil_format):
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no alpha, flatten onto white
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    image.save(buffer, pil_format, quality=getattr(settings, 'THUMBNAIL_QUALITY', 80))
+    return buffer.getvalue()
+
+
+def render_variants(image, directory):
+    """Save every size of ``image`` into ``directory``, skipping files already there"""
+    variants = {}
+    for size, box in thumbnail_sizes().items():
+        thumb = image.copy()
+        thumb.thumbnail((box, box))
+        variant = {'width': thumb.width, 'height': thumb.height}
+        for key, (pil_format, ext) in FORMATS.items():
+            name = f'{directory}/{size}.{ext}'
+            if not default_storage.exists(name):
+                name = default_storage.save(name, ContentFile(encode(thumb, pil_format)))
+            variant[key] = name
+        variants[size] = variant
+    return variants
+
+
+def probe_video(path):
+    """{'width', 'height', 'duration'} from ffprobe, empty when it isn't installed"""
+    if not shutil.which('ffprobe'):
+        return {}
+    result = subprocess.run(
+        [
+            'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'stream=width,height:format=duration', '-of', 'json', path
+        ],
+        capture_output=True, check=True, timeout=60
+    )
+    data = json.loads(result.stdout)
+    stream = (data.get('streams') or [{}])[0]
+    info = {'width': stream.get('width'), 'height': stream.get('height')}
+    if data.get('format', {}).get('duration'):
+        info['duration'] = round(float(data['format']['duration']))
+    return info
+
+
+def video_poster(path, at):
+    """Frame ``at`` seconds into the video, None without ffmpeg"""
+    if not shutil.which('ffmpeg'):
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        poster = os.path.join(tmp, 'poster.png')
+        subprocess.run(
+            ['ffmpeg', '-v', 'error', '-ss', str(at), '-i', path, '-frames:v', '1', poster],
+            capture_output=True, check=True, timeout=120
+        )
+        if not os.path.exists(poster):
+            return None
+        with Image.open(poster) as image:
+            image.load()
+            return image
+
+
+def generate_variants(model_label, pk):
+    """Fill in the media fields and variants of one row, returns the values written"""
+    model = apps.get_model(model_label)
+    field_name = MEDIA_FIELDS[model_label]
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return None
+    kind = media_kind(instance)
+    field_file = getattr(instance, field_name)
+    if kind is None or not field_file:
+        return None
+
+    values = {}
+    image = None
+    try:
+        if kind == 'image':
+            with field_file.open('rb') as source:
+                image = ImageOps.exif_transpose(Image.open(source))
+                image.load()
+            values['width'], values['height'] = image.size
+        else:
+            values.update(probe_video(field_file.path))
+            image = video_poster(field_file.path, min(1, (values.get('duration') or 0) / 2))
+        if image is not None:
+            values['variants'] = render_variants(image, variant_dir(instance, field_name))
+    except (OSError, ValueError, Image.DecompressionBombError, subprocess.SubprocessError) as exc:
+        logger.warning('Could not generate variants for %s %s: %s', model_label, pk, exc)
+        return None
+
+    field_names = {field.name for field in model._meta.get_fields()}
+    if 'thumbnail' in field_names and values.get('variants'):
+        default_size = getattr(settings, 'THUMBNAIL_DEFAULT_SIZE', 'medium')
+        variant = values['variants'].get(default_size) or next(iter(values['variants'].values()))
+        values['thumbnail'] = variant['jpeg']
+    values = {name: value for name, value in values.items() if name in field_names and value is not None}
+
+    # Skip rows whose file was replaced in the meantime, they get their own run
+    model._default_manager.filter(pk=pk, **{field_name: field_file.name}).update(**values)
+    return values
+
+
+def schedule_variants(model_label, pk):
+    """Generate variants for a row, on a Celery worker unless MEDIA_VARIANTS_ASYNC is off"""
+    if getattr(settings, 'MEDIA_VARIANTS_ASYNC', True):
+        from .tasks import generate_media_variants
+        generate_media_variants.delay(model_label, pk)
+    else:
+        generate_variants(model_label, pk)
@@ -0,0 +1,361 @@
+"""
+Resumable chunked uploads.
+
+A client starts an UploadSession declaring the file's name, type and size,
+then PUTs the bytes in order, each chunk starting at the session's
+received_size, and finally commits it. Chunks are streamed from the request
+straight into a file of their own under CHUNKED_UPLOAD_DIR, so no upload is
+ever held in worker memory, and the SHA-256 is updated as they arrive. Only
+then is the session row locked, just long enough to check the offset and
+advance received_size. A client that lost its connection reads
+received_size back and carries on from there.
+
+Committing joins the chunks into the part file and moves it into the blob
+store (storage.BlobStorage) for the created row, an UploadedFile or a
+MessageAttachment, without hashing it again; content that is already stored
+is not written at all. Sessions that are never committed are removed by the
+clear_expired_uploads command.
+"""
+import glob
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadSession, UploadedFile
+
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Rejected upload request, carries the HTTP status to answer with"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class PartFile(File):
+    """A finished part file, FileSystemStorage moves it instead of copying"""
+
+    def __init__(self, file, name=None, sha256=None):
+        super().__init__(file, name)
+        # Already known, BlobStorage doesn't read the file again to name it
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+class HasherCache:
+    """Running SHA-256 of recent sessions, keyed by upload id with the offset it reached"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, upload_id, offset):
+        """The hasher for a session at ``offset``, a new one at 0, None if it is unknown"""
+        with self.lock:
+            entry = self.entries.pop(upload_id, None)
+        if offset == 0:
+            return hashlib.sha256()
+        if entry is not None and entry[1] == offset:
+            return entry[0]
+        return None
+
+    def put(self, upload_id, hasher, offset):
+        with self.lock:
+            self.entries[upload_id] = (hasher, offset)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def discard(self, upload_id):
+        with self.lock:
+            self.entries.pop(upload_id, None)
+
+
+# Chunks of one session usually reach the same process, when they don't the
+# checksum is computed from the part file on commit instead
+_hashers = HasherCache(1024)
+
+
+def max_upload_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 1024 * 1024 * 1024)
+
+
+def max_chunk_size():
+    return getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 8 * 1024 * 1024)
+
+
+def part_path(session):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{session.upload_id.hex}.part')
+
+
+def chunk_path(session, offset):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{session.upload_id.hex}.{offset}.chunk')
+
+
+def _session_files(session, pattern):
+    """Paths in CHUNKED_UPLOAD_DIR of the session's files matching ``pattern``"""
+    directory = glob.escape(settings.CHUNKED_UPLOAD_DIR)
+    return glob.glob(os.path.join(directory, f'{session.upload_id.hex}.{pattern}'))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class StagedChunk:
+    """Chunk body written to disk, not yet part of its session"""
+
+    def __init__(self, path, offset, size, hasher):
+        self.path = path
+        self.offset = offset
+        self.size = size
+        self.hasher = hasher
+
+    def discard(self):
+        """Remove the file unless append_chunk already moved it"""
+        _remove(self.path)
+
+
+def uploaded_file_type(mime_type):
+    """UploadedFile.file_type for a MIME type"""
+    if mime_type.startswith('image/'):
+        return 'image'
+    elif mime_type.startswith('video/'):
+        return 'video'
+    elif mime_type.startswith('audio/'):
+        return 'audio'
+    elif mime_type in ['application/pdf', 'application/msword', 'text/plain']:
+        return 'document'
+    elif mime_type in ['application/zip', 'application/x-rar']:
+        return 'archive'
+    return 'other'
+
+
+def attachment_file_type(mime_type):
+    """MessageAttachment.file_type for a MIME type"""
+    for prefix in ('image', 'video', 'audio'):
+        if mime_type.startswith(f'{prefix}/'):
+            return prefix
+    return 'document'
+
+
+def start_upload(user, filename, total_size, mime_type, target='file', options=None):
+    """Open a session for a file of ``total_size`` bytes"""
+    from messaging.models import MessageAttachment
+
+    if total_size > max_upload_size():
+        raise UploadError(f"File size cannot exceed {max_upload_size() // (1024 * 1024)}MB")
+    if target == 'message_attachment' and mime_type not in MessageAttachment.ALLOWED_MIME_TYPES:
+        raise UploadError(f"File type {mime_type} not allowed")
+
+    session = UploadSession.objects.create(
+        uploaded_by=user,
+        target=target,
+        filename=os.path.basename(filename),
+        mime_type=mime_type,
+        total_size=total_size,
+        options=options or {},
+        expires_at=timezone.now() + timedelta(hours=getattr(settings, 'CHUNKED_UPLOAD_EXPIRY_HOURS', 24)),
+    )
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(part_path(session), 'wb').close()
+    return session
+
+
+def stage_chunk(session, offset, stream, length):
+    """
+    Write ``length`` bytes read from ``stream`` to a file of their own, for
+    append_chunk to add at ``offset``. Needs no lock, ``session`` is only
+    checked so a chunk that can't be taken is refused before it is read.
+    """
+    if offset != session.received_size:
+        raise UploadError(f"Expected offset {session.received_size}", status_code=409)
+    if length <= 0 or length > max_chunk_size():
+        raise UploadError(f"Chunks must be between 1 and {max_chunk_size()} bytes")
+    if offset + length > session.total_size:
+        raise UploadError("Chunk extends past the declared file size")
+
+    hasher = _hashers.take(session.upload_id, offset)
+    chunk = StagedChunk(
+        os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{session.upload_id.hex}.{uuid.uuid4().hex}.tmp'),
+        offset, 0, hasher
+    )
+    with open(chunk.path, 'wb') as staged:
+        while chunk.size < length:
+            data = stream.read(min(READ_SIZE, length - chunk.size))
+            if not data:
+                break
+            staged.write(data)
+            if hasher is not None:
+                hasher.update(data)
+            chunk.size += len(data)
+    if chunk.size != length:
+        chunk.discard()
+        raise UploadError("Chunk body is shorter than its Content-Length")
+    return chunk
+
+
+def append_chunk(session, chunk):
+    """
+    Add a staged chunk at the session's received_size, which must still be
+    the offset it was staged for. Call with the session row locked.
+    """
+    if chunk.offset != session.received_size:
+        raise UploadError(f"Expected offset {session.received_size}", status_code=409)
+
+    os.replace(chunk.path, chunk_path(session, chunk.offset))
+    session.received_size = chunk.offset + chunk.size
+    session.save(update_fields=['received_size', 'updated_at'])
+    if chunk.hasher is not None:
+        _hashers.put(session.upload_id, chunk.hasher, session.received_size)
+    return session
+
+
+def join_chunks(session):
+    """Append the session's chunks to its part file, in offset order"""
+    paths = sorted(_session_files(session, '*.chunk'), key=lambda path: int(path.rsplit('.', 2)[1]))
+    if not paths:
+        return
+    with open(part_path(session), 'ab') as part:
+        for path in paths:
+            with open(path, 'rb') as chunk:
+                for data in iter(lambda: chunk.read(READ_SIZE), b''):
+                    part.write(data)
+    for path in paths:
+        os.remove(path)
+
+
+def stage_file(user, uploaded, target='file', options=None):
+    """Session holding a whole file received through request.FILES, ready to commit"""
+    session = start_upload(
+        user, uploaded.name, uploaded.size,
+        getattr(uploaded, 'content_type', None) or 'application/octet-stream',
+        target, options
+    )
+    hasher = hashlib.sha256()
+    with open(part_path(session), 'wb') as part:
+        for data in uploaded.chunks():
+            part.write(data)
+            hasher.update(data)
+    session.received_size = uploaded.size
+    session.save(update_fields=['received_size', 'updated_at'])
+    _hashers.put(session.upload_id, hasher, session.received_size)
+    return session
+
+
+def checksum(session):
+    """SHA-256 hex digest of a complete session"""
+    hasher = _hashers.take(session.upload_id, session.received_size)
+    if hasher is None:
+        hasher = hashlib.sha256()
+        with open(part_path(session), 'rb') as part:
+            for data in iter(lambda: part.read(READ_SIZE), b''):
+                hasher.update(data)
+    return hasher.hexdigest()
+
+
+def lock_sessions(sessions):
+    """
+    ``sessions`` read again and locked until the transaction ends. Raises
+    UploadError when one was committed or aborted since it was read, or
+    isn't complete. Call inside transaction.atomic() before committing them.
+    """
+    locked = UploadSession.objects.select_for_update().in_bulk([session.pk for session in sessions])
+    for session in sessions:
+        current = locked.get(session.pk)
+        if current is None:
+            raise UploadError(f"Upload {session.upload_id} was already committed", status_code=409)
+        if not current.is_complete:
+            raise UploadError(f"Upload {session.upload_id} is incomplete", status_code=409)
+    return [locked[session.pk] for session in sessions]
+
+
+def commit_upload(session, message=None, sha256=None):
+    """
+    Create the session's UploadedFile, or its MessageAttachment on ``message``,
+    from the uploaded bytes and delete the session. ``sha256``, when given,
+    must match the uploaded content.
+    """
+    from messaging.models import MessageAttachment
+
+    if not session.is_complete:
+        raise UploadError(
+            f"Upload incomplete, {session.received_size} of {session.total_size} bytes received",
+            status_code=409
+        )
+    if session.target == 'message_attachment' and message is None:
+        raise UploadError("A message is required to commit an attachment")
+
+    join_chunks(session)
+    digest = checksum(session)
+    if sha256 and sha256.lower() != digest:
+        raise UploadError("Checksum mismatch")
+
+    if session.target == 'file':
+        options = session.options
+        instance = UploadedFile(
+            uploaded_by=session.uploaded_by,
+            original_filename=session.filename,
+            file_size=session.total_size,
+            file_type=uploaded_file_type(session.mime_type),
+            mime_type=session.mime_type,
+            upload_purpose=options.get('upload_purpose', 'general'),
+            category_id=options.get('category'),
+            description=options.get('description', ''),
+            tags=options.get('tags', []),
+            is_public=options.get('is_public', False),
+            metadata={'sha256': digest},
+        )
+    else:
+        instance = MessageAttachment(
+            message=message,
+            original_filename=session.filename,
+            file_size=session.total_size,
+            file_type=attachment_file_type(session.mime_type),
+            mime_type=session.mime_type,
+        )
+
+    # Stored content no row ends up referencing is collected with other unused blobs
+    with open(part_path(session), 'rb') as part:
+        instance.file.save(session.filename, PartFile(part, session.filename, digest), save=False)
+    with transaction.atomic():
+        instance.save()
+        session.delete()
+    discard_part(session)
+    return instance
+
+
+def discard_part(session):
+    """Forget a session's part file, chunks and running checksum"""
+    _hashers.discard(session.upload_id)
+    for path in _session_files(session, '*'):
+        _remove(path)
+
+
+def abort_upload(session):
+    session.delete()
+    discard_part(session)
+
+
+def clear_expired(now=None):
+    """Delete sessions past their expiry with their part files, returns how many"""
+    expired = list(UploadSession.objects.filter(expires_at__lt=now or timezone.now()))
+    for session in expired:
+        abort_upload(session)
+    return len(expired)
@@ -13,6 +13,11 @@ urlpatterns = [
     path('files/<uuid:file_id>/', views.UploadedFileDetailView.as_view(), name='file_detail'),
     path('files/<uuid:file_id>/download/', views.FileDownloadView.as_view(), name='file_download'),
     
+    # Resumable chunked uploads
+    path('uploads/', views.UploadSessionCreateView.as_view(), name='upload_start'),
+    path('uploads/<uuid:upload_id>/', views.UploadSessionDetailView.as_view(), name='upload_detail'),
+    path('uploads/<uuid:upload_id>/commit/', views.commit_upload_session, name='upload_commit'),
+    
     # File sharing
     path('shares/', views.FileShareListView.as_view(), name='file_shares'),
     
@@ -2,23 +2,27 @@ from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.db import transaction
 from django.db.models import Q, Sum, Count
-from django.http import Http404, HttpResponse, FileResponse
+from django.http import Http404, HttpResponse
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
+from alist_backend.aggregates import aggregate_totals, buckets, count_by, pivot
 from .models import (
     FileCategory, UploadedFile, FileShare, FileVersion, 
-    FileComment, FileFolder, FileSettings
+    FileComment, FileFolder, FileSettings, UploadSession
 )
 from .serializers import (
     FileCategorySerializer, UploadedFileSerializer, FileUploadSerializer,
     FileShareSerializer, FileShareCreateSerializer, FileVersionSerializer,
     FileCommentSerializer, FileFolderSerializer, FileSettingsSerializer,
-    FileStatsSerializer
+    FileStatsSerializer, UploadSessionSerializer, UploadSessionCreateSerializer
 )
+from .downloads import download_counter, file_etag, serve_file
+from .uploads import UploadError, abort_upload, append_chunk, commit_upload, stage_chunk, start_upload
 
 
 class FileCategoryListView(generics.ListAPIView):
@@ -93,6 +97,166 @@ class FileUploadView(generics.CreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
+class UploadSessionCreateView(APIView):
+    """بدء رفع ملف على دفعات"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @extend_schema(
+        operation_id="start_chunked_upload",
+        summary="Start Chunked Upload",
+        description="Open a resumable upload session, then PUT the file in chunks and commit it",
+        tags=["File Management"],
+        request=UploadSessionCreateSerializer,
+        responses={201: UploadSessionSerializer},
+    )
+    def post(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        try:
+            session = start_upload(
+                request.user,
+                data['filename'],
+                data['total_size'],
+                data['mime_type'],
+                target=data['target'],
+                options=serializer.get_options()
+            )
+        except UploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionDetailView(APIView):
+    """رفع دفعة من الملف"""
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_session(self, request, upload_id, lock=False):
+        sessions = UploadSession.objects.filter(upload_id=upload_id, uploaded_by=request.user)
+        if lock:
+            sessions = sessions.select_for_update()
+        session = sessions.first()
+        if session is None:
+            raise Http404
+        return session
+    
+    @extend_schema(
+        operation_id="get_chunked_upload",
+        summary="Chunked Upload Status",
+        description="Get how many bytes of the upload were received, to resume it",
+        tags=["File Management"],
+        responses={200: UploadSessionSerializer},
+    )
+    def get(self, request, upload_id):
+        return Response(UploadSessionSerializer(self.get_session(request, upload_id)).data)
+    
+    @extend_schema(
+        operation_id="append_chunked_upload",
+        summary="Upload Chunk",
+        description=(
+            "Append the raw request body to the upload. The Upload-Offset header "
+            "must equal the bytes received so far"
+        ),
+        tags=["File Management"],
+        request={'application/octet-stream': OpenApiTypes.BINARY},
+        responses={200: UploadSessionSerializer},
+    )
+    def put(self, request, upload_id):
+        try:
+            offset = int(request.META.get('HTTP_UPLOAD_OFFSET', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({
+                'error': 'Upload-Offset header is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # The body is read straight from the request stream, never request.data,
+        # and written out before the session row is locked
+        session = self.get_session(request, upload_id)
+        try:
+            chunk = stage_chunk(session, offset, request.stream, length)
+        except UploadError as e:
+            return Response({
+                'error': e.message,
+                'received_size': session.received_size
+            }, status=e.status_code)
+        
+        try:
+            with transaction.atomic():
+                session = self.get_session(request, upload_id, lock=True)
+                append_chunk(session, chunk)
+        except UploadError as e:
+            return Response({
+                'error': e.message,
+                'received_size': session.received_size
+            }, status=e.status_code)
+        finally:
+            chunk.discard()
+        
+        return Response(UploadSessionSerializer(session).data)
+    
+    @extend_schema(
+        operation_id="abort_chunked_upload",
+        summary="Abort Chunked Upload",
+        description="Discard the upload and the bytes received",
+        tags=["File Management"],
+    )
+    def delete(self, request, upload_id):
+        abort_upload(self.get_session(request, upload_id))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+@extend_schema(
+    operation_id="commit_chunked_upload",
+    summary="Commit Chunked Upload",
+    description=(
+        "Create the uploaded file, or the attachment of message_id, from a complete "
+        "upload. An optional sha256 is checked against the received bytes"
+    ),
+    tags=["File Management"],
+)
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def commit_upload_session(request, upload_id):
+    """إنهاء الرفع على دفعات"""
+    from messaging.models import Message
+    from messaging.serializers import MessageAttachmentSerializer
+    
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().filter(
+            upload_id=upload_id,
+            uploaded_by=request.user
+        ).first()
+        if session is None:
+            return Response({
+                'error': 'Upload not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        message = None
+        if session.target == 'message_attachment':
+            message = Message.objects.filter(
+                id=request.data.get('message_id'),
+                sender=request.user
+            ).first()
+            if message is None:
+                return Response({
+                    'error': 'Message not found'
+                }, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            instance = commit_upload(session, message=message, sha256=request.data.get('sha256'))
+        except UploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
+    
+    if session.target == 'message_attachment':
+        data = MessageAttachmentSerializer(instance, context={'request': request}).data
+    else:
+        data = UploadedFileSerializer(instance, context={'request': request}).data
+    return Response(data, status=status.HTTP_201_CREATED)
+
+
 class UploadedFileDetailView(generics.RetrieveUpdateDestroyAPIView):
     """تفاصيل الملف المرفوع"""
     serializer_class = UploadedFileSerializer
@@ -102,6 +266,12 @@ class UploadedFileDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         return UploadedFile.objects.filter(uploaded_by=self.request.user)
     
+    def perform_update(self, serializer):
+        # Keep the replaced content as a version, it only adds a blob reference
+        if 'file' in serializer.validated_data:
+            serializer.instance.snapshot(self.request.user, 'Replaced file')
+        serializer.save()
+    
     @extend_schema(
         operation_id="get_file_detail",
         summary="File Details",
@@ -159,16 +329,13 @@ class FileDownloadView(APIView):
                         'error': 'Permission denied'
                     }, status=status.HTTP_403_FORBIDDEN)
             
-            # Increment download count
-            file.increment_download_count()
-            
-            # Return file
-            response = FileResponse(
-                file.file.open('rb'),
-                as_attachment=True,
-                filename=file.original_filename
+            response = serve_file(
+                request, file.file, file.original_filename, file.mime_type, file.file_size,
+                etag=file_etag(file), last_modified=int(file.updated_at.timestamp())
             )
-            response['Content-Type'] = file.mime_type
+            # Revalidations and follow-up ranges of the same download don't count
+            if response.status_code == 200 or response.get('Content-Range', '').startswith('bytes 0-'):
+                download_counter.add(file.pk)
             return response
             
         except UploadedFile.DoesNotExist:
@@ -237,12 +404,19 @@ class FileFolderListView(generics.ListCreateAPIView):
     def get_queryset(self):
         return FileFolder.objects.filter(
             owner=self.request.user
-        ).select_related('owner', 'parent')
+        ).select_related('owner', 'parent').annotate(
+            list_files_count=Count('files', distinct=True),
+            list_subfolders_count=Count('subfolders', distinct=True),
+        )
     
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 
+# File types reported by file_stats
+FILE_STAT_TYPES = ['image', 'document', 'video', 'audio', 'archive', 'other']
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def file_stats(request):
@@ -252,9 +426,17 @@ def file_stats(request):
     # Get user's files
     files = UploadedFile.objects.filter(uploaded_by=user)
     
-    # Calculate stats
-    total_files = files.count()
-    total_size = files.aggregate(total=Sum('file_size'))['total'] or 0
+    # Totals and per-type counts in one query, purposes grouped in a second
+    seven_days_ago = timezone.now() - timezone.timedelta(days=7)
+    totals = aggregate_totals(
+        files,
+        total_files=Count('pk'),
+        total_size=Sum('file_size'),
+        recent_uploads=Count('pk', filter=Q(created_at__gte=seven_days_ago)),
+        **count_by('file_type', FILE_STAT_TYPES, prefix='type_')
+    )
+    total_files = totals['total_files']
+    total_size = totals['total_size']
     
     # Format total size
     size = total_size
@@ -266,24 +448,11 @@ def file_stats(request):
     else:
         total_size_formatted = f"{size:.1f} TB"
     
-    # Files by type
-    files_by_type = {}
-    for file_type in ['image', 'document', 'video', 'audio', 'archive', 'other']:
-        count = files.filter(file_type=file_type).count()
-        if count > 0:
-            files_by_type[file_type] = count
-    
-    # Files by purpose
-    files_by_purpose = {}
-    for choice in UploadedFile.UPLOAD_PURPOSES:
-        purpose = choice[0]
-        count = files.filter(upload_purpose=purpose).count()
-        if count > 0:
-            files_by_purpose[purpose] = count
-    
-    # Recent uploads (last 7 days)
-    seven_days_ago = timezone.now() - timezone.timedelta(days=7)
-    recent_uploads = files.filter(created_at__gte=seven_days_ago).count()
+    files_by_type = buckets(totals, 'type_', skip_empty=True)
+    files_by_purpose = {
+        purpose: row['count'] for purpose, row in pivot(files, 'upload_purpose', count=Count('pk')).items()
+    }
+    recent_uploads = totals['recent_uploads']
     
     # Storage usage percentage (assuming 1GB limit for demo)
     storage_limit = 1024 * 1024 * 1024  # 1GB
@@ -0,0 +1,185 @@
+"""
+Geospatial helpers for location searches.
+
+Addresses store a geohash of their coordinates so radius searches can prune
+candidates in SQL: the search bounding box is covered with a handful of
+geohash cells and only rows whose geohash starts with one of those cell
+prefixes (and whose coordinates fall in the box) are loaded for the exact
+haversine check.
+
+Batch distance helpers use NumPy when it is installed and fall back to the
+pure Python implementation otherwise.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE_LAT = 111.32
+
+# Precision stored on Address.geohash (~4.8m x 4.8m cells)
+GEOHASH_PRECISION = 9
+
+# Upper bound on the number of prefix cells used to cover a search box
+MAX_COVERING_CELLS = 16
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """حساب المسافة بين نقطتين بالكيلومتر"""
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2)
+    c = 2 * math.asin(math.sqrt(a))
+
+    return EARTH_RADIUS_KM * c
+
+
+def haversine_many(latitude, longitude, latitudes, longitudes):
+    """
+    Distances in km from one origin to many points, computed as a single
+    array operation when NumPy is installed. Returns a list of floats in
+    the order of the given points.
+    """
+    if np is None:
+        return [
+            haversine_km(latitude, longitude, lat, lng)
+            for lat, lng in zip(latitudes, longitudes)
+        ]
+
+    lat1 = math.radians(latitude)
+    lon1 = math.radians(longitude)
+    lat2 = np.radians(np.asarray(latitudes, dtype=float))
+    lon2 = np.radians(np.asarray(longitudes, dtype=float))
+
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    c = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    return (EARTH_RADIUS_KM * c).tolist()
+
+
+def distance_matrix(origins, destinations):
+    """
+    N x M matrix of distances in km between (lat, lng) origins and
+    destinations, as a list of rows (one row per origin).
+    """
+    if np is None:
+        return [
+            [haversine_km(o_lat, o_lng, d_lat, d_lng) for d_lat, d_lng in destinations]
+            for o_lat, o_lng in origins
+        ]
+
+    origins = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+    destinations = np.radians(np.asarray(destinations, dtype=float).reshape(-1, 2))
+    lat1 = origins[:, 0][:, np.newaxis]
+    lon1 = origins[:, 1][:, np.newaxis]
+    lat2 = destinations[:, 0][np.newaxis, :]
+    lon2 = destinations[:, 1][np.newaxis, :]
+
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    c = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    return (EARTH_RADIUS_KM * c).tolist()
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode coordinates as a base32 geohash string"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def geohash_cell_size(precision):
+    """Return the (lat, lng) size in degrees of a geohash cell"""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = math.floor(precision * 5 / 2)
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """
+    Return (min_lat, max_lat, min_lng, max_lng) enclosing a search circle.
+    Longitudes may fall outside [-180, 180] when the box crosses the
+    antimeridian; callers wrap them as needed.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    min_lat = max(latitude - lat_delta, -90.0)
+    max_lat = min(latitude + lat_delta, 90.0)
+
+    # Longitude degrees shrink towards the poles, use the widest latitude
+    widest = max(abs(min_lat), abs(max_lat))
+    cos_lat = math.cos(math.radians(widest))
+    if cos_lat < 1e-6:
+        return min_lat, max_lat, -180.0, 180.0
+
+    lng_delta = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180.0)
+    return min_lat, max_lat, longitude - lng_delta, longitude + lng_delta
+
+
+def _wrap_longitude(longitude):
+    return (longitude + 180.0) % 360.0 - 180.0
+
+
+def covering_geohashes(min_lat, max_lat, min_lng, max_lng, max_cells=MAX_COVERING_CELLS):
+    """
+    Return the geohash prefixes covering a bounding box, using the finest
+    precision that needs at most ``max_cells`` cells. Returns an empty list
+    when the box is too large to be worth pruning by cell.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lng = geohash_cell_size(precision)
+        rows = range(math.floor(min_lat / cell_lat), math.floor(max_lat / cell_lat) + 1)
+        cols = range(math.floor(min_lng / cell_lng), math.floor(max_lng / cell_lng) + 1)
+        if len(rows) * len(cols) > max_cells:
+            continue
+
+        # Encode the centre of every grid cell the box touches
+        cells = set()
+        for row in rows:
+            lat = min((row + 0.5) * cell_lat, 90.0 - cell_lat / 2)
+            for col in cols:
+                lng = _wrap_longitude((col + 0.5) * cell_lng)
+                cells.add(encode_geohash(lat, lng, precision))
+        return sorted(cells)
+
+    return []
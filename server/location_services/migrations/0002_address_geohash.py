@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+from location_services.geo import encode_geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    Address = apps.get_model('location_services', 'Address')
+    addresses = Address.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).only('id', 'latitude', 'longitude')
+
+    batch = []
+    for address in addresses.iterator(chunk_size=2000):
+        address.geohash = encode_geohash(float(address.latitude), float(address.longitude))
+        batch.append(address)
+        if len(batch) >= 2000:
+            Address.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Address.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('location_services', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, help_text='Geohash of the coordinates, used for spatial search', max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['geohash'], name='location_se_geohash_938c66_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['latitude', 'longitude'], name='location_se_latitud_038824_idx'),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 import uuid
 
+from .geo import encode_geohash
+
 User = get_user_model()
 
 
@@ -154,6 +156,12 @@ class Address(models.Model):
         ],
         help_text='خط الطول'
     )
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        editable=False,
+        help_text='Geohash of the coordinates, used for spatial search'
+    )
     
     # Additional Info
     landmark = models.CharField(
@@ -184,9 +192,24 @@ class Address(models.Model):
         verbose_name = 'Address'
         verbose_name_plural = 'Addresses'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['geohash']),
+            models.Index(fields=['latitude', 'longitude']),
+        ]
 
     def __str__(self):
         return f"{self.street_address}, {self.city}"
+
+    def save(self, *args, **kwargs):
+        # تحديث الـ geohash مع كل تغيير في الإحداثيات
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(float(self.latitude), float(self.longitude))
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
     
     @property
     def full_address(self):
@@ -1,15 +1,16 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from alist_backend.serializers import SparseFieldsetMixin
 from .models import (
     Country, City, Address, UserLocation, 
     ServiceArea, LocationHistory, LocationPermission
 )
-import math
+from .geo import distance_matrix, haversine_km, haversine_many
 
 User = get_user_model()
 
 
-class CountrySerializer(serializers.ModelSerializer):
+class CountrySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """
     Serializer للدول
     """
@@ -24,6 +25,8 @@ class CountrySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
     
     def get_cities_count(self, obj):
+        if hasattr(obj, 'active_cities_count'):
+            return obj.active_cities_count
         return obj.cities.filter(is_active=True).count()
 
 
@@ -226,37 +229,90 @@ class NearbyProfessionalsSerializer(serializers.Serializer):
         choices=['home_pro', 'specialist', 'crew_member'],
         required=False
     )
+    page = serializers.IntegerField(min_value=1, default=1)
+    page_size = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class CoordinateSerializer(serializers.Serializer):
+    """
+    Serializer لنقطة جغرافية
+    """
+    latitude = serializers.DecimalField(max_digits=10, decimal_places=8, min_value=-90, max_value=90)
+    longitude = serializers.DecimalField(max_digits=11, decimal_places=8, min_value=-180, max_value=180)
 
 
 class DistanceCalculationSerializer(serializers.Serializer):
     """
     Serializer لحساب المسافات
+    
+    Accepts a single pair (from_*/to_*), one origin with many
+    ``destinations``, or many ``origins`` with many ``destinations`` for a
+    full distance matrix.
     """
-    from_latitude = serializers.DecimalField(max_digits=10, decimal_places=8)
-    from_longitude = serializers.DecimalField(max_digits=11, decimal_places=8)
-    to_latitude = serializers.DecimalField(max_digits=10, decimal_places=8)
-    to_longitude = serializers.DecimalField(max_digits=11, decimal_places=8)
+    MAX_POINTS = 1000
+    
+    from_latitude = serializers.DecimalField(max_digits=10, decimal_places=8, required=False)
+    from_longitude = serializers.DecimalField(max_digits=11, decimal_places=8, required=False)
+    to_latitude = serializers.DecimalField(max_digits=10, decimal_places=8, required=False)
+    to_longitude = serializers.DecimalField(max_digits=11, decimal_places=8, required=False)
+    origins = CoordinateSerializer(many=True, required=False)
+    destinations = CoordinateSerializer(many=True, required=False)
+    
+    def validate(self, attrs):
+        has_origin = 'from_latitude' in attrs and 'from_longitude' in attrs
+        has_destination = 'to_latitude' in attrs and 'to_longitude' in attrs
+        origins = attrs.get('origins')
+        destinations = attrs.get('destinations')
+        
+        if origins is not None and not destinations:
+            raise serializers.ValidationError('destinations are required with origins')
+        if not (origins or has_origin):
+            raise serializers.ValidationError('from_latitude/from_longitude or origins are required')
+        if not (destinations or has_destination):
+            raise serializers.ValidationError('to_latitude/to_longitude or destinations are required')
+        if len(origins or []) > self.MAX_POINTS or len(destinations or []) > self.MAX_POINTS:
+            raise serializers.ValidationError(f'At most {self.MAX_POINTS} points are allowed')
+        return attrs
+    
+    @property
+    def is_batch(self):
+        return bool(self.validated_data.get('destinations'))
+    
+    @property
+    def is_matrix(self):
+        return bool(self.validated_data.get('origins'))
     
     def calculate_distance(self):
         """حساب المسافة بالكيلومتر باستخدام معادلة Haversine"""
         data = self.validated_data
+        return haversine_km(
+            float(data['from_latitude']), float(data['from_longitude']),
+            float(data['to_latitude']), float(data['to_longitude'])
+        )
+    
+    def calculate_distances(self):
+        """
+        Distances in km from the origin to every destination, or an
+        origins x destinations matrix when origins are given.
+        """
+        data = self.validated_data
+        destinations = [
+            (float(point['latitude']), float(point['longitude']))
+            for point in data['destinations']
+        ]
         
-        lat1 = math.radians(float(data['from_latitude']))
-        lon1 = math.radians(float(data['from_longitude']))
-        lat2 = math.radians(float(data['to_latitude']))
-        lon2 = math.radians(float(data['to_longitude']))
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = (math.sin(dlat/2)**2 + 
-             math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2)
-        c = 2 * math.asin(math.sqrt(a))
-        
-        # نصف قطر الأرض بالكيلومتر
-        radius = 6371
+        if self.is_matrix:
+            origins = [
+                (float(point['latitude']), float(point['longitude']))
+                for point in data['origins']
+            ]
+            return distance_matrix(origins, destinations)
         
-        return radius * c
+        return haversine_many(
+            float(data['from_latitude']), float(data['from_longitude']),
+            [lat for lat, _ in destinations],
+            [lng for _, lng in destinations]
+        )
 
 
 class LocationSearchSerializer(serializers.Serializer):
@@ -290,7 +346,7 @@ class ProfessionalLocationSerializer(serializers.ModelSerializer):
     """
     user_type = serializers.CharField(source='user.user_type', read_only=True)
     full_name = serializers.SerializerMethodField()
-    avatar = serializers.CharField(source='user.avatar.url', read_only=True)
+    avatar = serializers.SerializerMethodField()
     rating = serializers.SerializerMethodField()
     service_areas = ServiceAreaSerializer(source='user.service_areas', many=True, read_only=True)
     
@@ -305,6 +361,9 @@ class ProfessionalLocationSerializer(serializers.ModelSerializer):
     def get_full_name(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name}".strip()
     
+    def get_avatar(self, obj):
+        return obj.user.avatar.url if obj.user.avatar else None
+    
     def get_rating(self, obj):
         # هنا يمكن إضافة حساب التقييم من نظام المراجعات
         return 4.5  # مؤقت 
\ No newline at end of file
@@ -1,3 +1,143 @@
+import random
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .geo import bounding_box, covering_geohashes, encode_geohash, haversine_km
+from .models import Country, City, Address, UserLocation
+
+User = get_user_model()
+
+
+class GeohashTest(TestCase):
+    def test_encode_geohash(self):
+        """Known geohash values"""
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(encode_geohash(40.7128, -74.0060, 5), 'dr5re')
+
+    def test_covering_cells_contain_every_point_in_radius(self):
+        """Points within the radius always fall in one of the covering cells"""
+        rng = random.Random(1)
+        for lat, lng, radius in [(40.7, -74.0, 25), (0.01, 179.99, 50), (-33.9, 151.2, 100)]:
+            cells = covering_geohashes(*bounding_box(lat, lng, radius))
+            self.assertTrue(cells)
+            for _ in range(200):
+                point_lat = lat + rng.uniform(-1, 1) * radius / 111.32
+                point_lng = lng + rng.uniform(-1, 1) * radius / 80.0
+                point_lng = (point_lng + 180) % 360 - 180
+                if haversine_km(lat, lng, point_lat, point_lng) > radius:
+                    continue
+                geohash = encode_geohash(point_lat, point_lng)
+                self.assertTrue(any(geohash.startswith(cell) for cell in cells))
+
+
+class NearbyProfessionalsTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        country = Country.objects.create(name='United States', code='US', currency='USD')
+        self.city = City.objects.create(name='New York', country=country)
+        self.searcher = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        # Professionals at increasing distance east of Manhattan
+        for i, offset in enumerate([0.01, 0.05, 0.1, 0.2, 2.0]):
+            professional = User.objects.create_user(
+                username=f'pro{i}',
+                email=f'pro{i}@example.com',
+                password='testpass123',
+                user_type='home_pro'
+            )
+            address = Address.objects.create(
+                street_address=f'{i} Main St',
+                city=self.city,
+                latitude=40.7128,
+                longitude=-74.0060 + offset
+            )
+            UserLocation.objects.create(
+                user=professional,
+                address=address,
+                privacy_level='public'
+            )
+
+    def test_address_geohash_is_maintained(self):
+        """Saving an address keeps its geohash in sync with the coordinates"""
+        address = Address.objects.first()
+        self.assertEqual(
+            address.geohash,
+            encode_geohash(float(address.latitude), float(address.longitude))
+        )
+        address.latitude = 51.5
+        address.longitude = -0.12
+        address.save(update_fields=['latitude', 'longitude'])
+        address.refresh_from_db()
+        self.assertEqual(address.geohash, encode_geohash(51.5, -0.12))
+
+    def test_nearby_professionals_paginates_by_distance(self):
+        """Results are sorted by distance and paginated"""
+        api = APIClient()
+        api.force_authenticate(self.searcher)
+        url = '/api/v1/locations/search/nearby_professionals/'
+        payload = {'latitude': 40.7128, 'longitude': -74.0060, 'radius_km': 25, 'page_size': 2}
+
+        response = api.post(url, payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_found'], 4)
+        self.assertTrue(response.data['has_next'])
+        self.assertEqual([p['username'] for p in response.data['professionals']], ['pro0', 'pro1'])
+
+        response = api.post(url, dict(payload, page=2), format='json')
+        self.assertEqual([p['username'] for p in response.data['professionals']], ['pro2', 'pro3'])
+        self.assertFalse(response.data['has_next'])
+
+
+class DistanceCalculationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.url = '/api/v1/locations/search/calculate_distance/'
+
+    def test_batch_distances_match_single_pair(self):
+        """Batch mode returns one distance per destination"""
+        destinations = [
+            {'latitude': 34.0522, 'longitude': -118.2437},
+            {'latitude': 41.8781, 'longitude': -87.6298},
+        ]
+        response = self.api.post(self.url, {
+            'from_latitude': 40.7128, 'from_longitude': -74.0060,
+            'destinations': destinations
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        for destination, result in zip(destinations, response.data['distances']):
+            single = self.api.post(self.url, {
+                'from_latitude': 40.7128, 'from_longitude': -74.0060,
+                'to_latitude': destination['latitude'], 'to_longitude': destination['longitude']
+            }, format='json')
+            self.assertEqual(result['distance_km'], single.data['distance_km'])
+
+    def test_distance_matrix(self):
+        """Origins x destinations returns a full matrix"""
+        points = [
+            {'latitude': 40.7128, 'longitude': -74.0060},
+            {'latitude': 34.0522, 'longitude': -118.2437},
+        ]
+        response = self.api.post(self.url, {'origins': points, 'destinations': points}, format='json')
+        self.assertEqual(response.status_code, 200)
+        matrix = response.data['distances_km']
+        self.assertEqual(matrix[0][0], 0)
+        self.assertEqual(matrix[0][1], matrix[1][0])
+        self.assertAlmostEqual(matrix[0][1], 3936, delta=5)
 
-# Create your tests here.
+    def test_requires_destination(self):
+        response = self.api.post(self.url, {'from_latitude': 40.7, 'from_longitude': -74.0}, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -3,7 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
-from django.db.models import Q, F
+from django.db.models import Count, Q, F
 from django.utils import timezone
 from .models import (
     Country, City, Address, UserLocation,
@@ -16,18 +16,23 @@ from .serializers import (
     NearbyProfessionalsSerializer, DistanceCalculationSerializer,
     LocationSearchSerializer, ProfessionalLocationSerializer
 )
-import math
+from .geo import bounding_box, covering_geohashes, haversine_km, haversine_many
+import heapq
 import requests
 from django.conf import settings
 
 User = get_user_model()
 
+KM_TO_MILES = 0.621371
+
 
 class CountryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet للدول - قراءة فقط
     """
-    queryset = Country.objects.filter(is_active=True)
+    queryset = Country.objects.filter(is_active=True).annotate(
+        active_cities_count=Count('cities', filter=Q(cities__is_active=True))
+    )
     serializer_class = CountrySerializer
     permission_classes = [permissions.AllowAny]
     
@@ -187,11 +192,37 @@ class ServiceAreaViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def coverage_map(self, request):
         """خريطة التغطية للمحترف"""
-        service_areas = self.get_queryset()
+        service_areas = list(self.get_queryset())
         coverage_data = []
         
+        # موقع اختياري للتحقق من تغطية مناطق الخدمة له
+        latitude = request.query_params.get('latitude')
+        longitude = request.query_params.get('longitude')
+        distances = None
+        if latitude is not None and longitude is not None:
+            try:
+                latitude = float(latitude)
+                longitude = float(longitude)
+            except ValueError:
+                return Response(
+                    {'error': 'إحداثيات غير صالحة'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            located = [
+                area for area in service_areas
+                if area.city.latitude is not None and area.city.longitude is not None
+            ]
+            distances = dict(zip(
+                [area.id for area in located],
+                haversine_many(
+                    latitude, longitude,
+                    [float(area.city.latitude) for area in located],
+                    [float(area.city.longitude) for area in located]
+                )
+            ))
+        
         for area in service_areas:
-            coverage_data.append({
+            area_data = {
                 'city': area.city.name,
                 'country': area.city.country.name,
                 'coordinates': {
@@ -201,7 +232,12 @@ class ServiceAreaViewSet(viewsets.ModelViewSet):
                 'max_distance_km': area.max_distance_km,
                 'travel_cost_per_km': float(area.travel_cost_per_km),
                 'minimum_service_fee': float(area.minimum_service_fee)
-            })
+            }
+            if distances is not None:
+                distance = distances.get(area.id)
+                area_data['distance_km'] = round(distance, 2) if distance is not None else None
+                area_data['covers_location'] = distance is not None and distance <= area.max_distance_km
+            coverage_data.append(area_data)
         
         return Response(coverage_data)
 
@@ -331,10 +367,13 @@ class LocationSearchViewSet(viewsets.ViewSet):
         longitude = float(data['longitude'])
         radius_km = data['radius_km']
         professional_type = data.get('professional_type')
+        page = data['page']
+        page_size = data['page_size']
         
         # البحث عن المحترفين في المنطقة
-        professionals = self._find_nearby_professionals(
-            latitude, longitude, radius_km, professional_type
+        professionals, total_found = self._find_nearby_professionals(
+            latitude, longitude, radius_km, professional_type,
+            offset=(page - 1) * page_size, limit=page_size
         )
         
         return Response({
@@ -344,7 +383,10 @@ class LocationSearchViewSet(viewsets.ViewSet):
                 'radius_km': radius_km
             },
             'professionals': professionals,
-            'total_found': len(professionals)
+            'total_found': total_found,
+            'page': page,
+            'page_size': page_size,
+            'has_next': page * page_size < total_found
         })
     
     @action(detail=False, methods=['post'])
@@ -357,11 +399,30 @@ class LocationSearchViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if serializer.is_matrix:
+            matrix = serializer.calculate_distances()
+            return Response({
+                'distances_km': [[round(d, 2) for d in row] for row in matrix],
+                'distances_miles': [[round(d * KM_TO_MILES, 2) for d in row] for row in matrix]
+            })
+        
+        if serializer.is_batch:
+            distances = serializer.calculate_distances()
+            return Response({
+                'distances': [
+                    {
+                        'distance_km': round(d, 2),
+                        'distance_miles': round(d * KM_TO_MILES, 2)
+                    }
+                    for d in distances
+                ]
+            })
+        
         distance_km = serializer.calculate_distance()
         
         return Response({
             'distance_km': round(distance_km, 2),
-            'distance_miles': round(distance_km * 0.621371, 2)
+            'distance_miles': round(distance_km * KM_TO_MILES, 2)
         })
     
     @action(detail=False, methods=['get'])
@@ -396,56 +457,77 @@ class LocationSearchViewSet(viewsets.ViewSet):
             'addresses': AddressSerializer(addresses[:10], many=True).data
         })
     
-    def _find_nearby_professionals(self, lat, lng, radius_km, prof_type=None):
-        """البحث عن المحترفين القريبين"""
-        professionals = []
+    def _find_nearby_professionals(self, lat, lng, radius_km, prof_type=None, offset=0, limit=20):
+        """
+        البحث عن المحترفين القريبين
         
-        # البحث في مواقع المستخدمين
+        The bounding box of the search circle is pruned in SQL through the
+        geohash and latitude/longitude indexes on Address. Exact distances
+        are only computed for rows inside the box, and only the requested
+        page is loaded as full objects. Returns (page, total_found).
+        """
         query = Q(
             user__user_type__in=['home_pro', 'specialist', 'crew_member'],
             is_active=True,
-            privacy_level__in=['public', 'professional']
+            privacy_level__in=['public', 'professional'],
+            address__latitude__isnull=False,
+            address__longitude__isnull=False,
         )
         
         if prof_type:
             query &= Q(user__user_type=prof_type)
         
-        user_locations = UserLocation.objects.filter(query).select_related(
-            'user', 'address', 'address__city'
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        query &= Q(address__latitude__range=(min_lat, max_lat))
+        if min_lng >= -180 and max_lng <= 180:
+            query &= Q(address__longitude__range=(min_lng, max_lng))
+        
+        cells = covering_geohashes(min_lat, max_lat, min_lng, max_lng)
+        if cells:
+            cell_query = Q()
+            for cell in cells:
+                cell_query |= Q(address__geohash__startswith=cell)
+            query &= cell_query
+        
+        candidates = list(UserLocation.objects.filter(query).values_list(
+            'id', 'address__latitude', 'address__longitude'
+        ))
+        
+        # حساب جميع المسافات دفعة واحدة
+        distances = haversine_many(
+            lat, lng,
+            [float(location_lat) for _, location_lat, _ in candidates],
+            [float(location_lng) for _, _, location_lng in candidates]
         )
+        matches = [
+            (distance, location_id)
+            for distance, (location_id, _, _) in zip(distances, candidates)
+            if distance <= radius_km
+        ]
         
-        for location in user_locations:
-            if location.address.latitude and location.address.longitude:
-                distance = self._calculate_distance(
-                    lat, lng,
-                    float(location.address.latitude),
-                    float(location.address.longitude)
-                )
-                
-                if distance <= radius_km:
-                    professionals.append({
-                        'user_id': location.user.id,
-                        'username': location.user.username,
-                        'full_name': f"{location.user.first_name} {location.user.last_name}".strip(),
-                        'user_type': location.user.user_type,
-                        'location': ProfessionalLocationSerializer(location).data,
-                        'distance_km': round(distance, 2)
-                    })
-        
-        # ترتيب حسب المسافة
-        professionals.sort(key=lambda x: x['distance_km'])
-        
-        return professionals
-    
-    def _calculate_distance(self, lat1, lon1, lat2, lon2):
-        """حساب المسافة بين نقطتين بالكيلومتر"""
-        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+        # ترتيب حسب المسافة - نحتاج فقط أقرب offset + limit نتيجة
+        nearest = heapq.nsmallest(offset + limit, matches)[offset:]
         
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
+        locations = UserLocation.objects.filter(
+            id__in=[location_id for _, location_id in nearest]
+        ).select_related('user', 'address', 'address__city').prefetch_related(
+            'user__service_areas__city__country'
+        ).in_bulk()
         
-        a = (math.sin(dlat/2)**2 + 
-             math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2)
-        c = 2 * math.asin(math.sqrt(a))
+        professionals = []
+        for distance, location_id in nearest:
+            location = locations[location_id]
+            professionals.append({
+                'user_id': location.user.id,
+                'username': location.user.username,
+                'full_name': f"{location.user.first_name} {location.user.last_name}".strip(),
+                'user_type': location.user.user_type,
+                'location': ProfessionalLocationSerializer(location).data,
+                'distance_km': round(distance, 2)
+            })
         
-        return 6371 * c  # نصف قطر الأرض بالكيلومتر
+        return professionals, len(matches)
+    
+    def _calculate_distance(self, lat1, lon1, lat2, lon2):
+        """حساب المسافة بين نقطتين بالكيلومتر"""
+        return haversine_km(lat1, lon1, lat2, lon2)
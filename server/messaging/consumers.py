@@ -1,10 +1,17 @@
 import json
 import asyncio
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
+from asgiref.sync import sync_to_async
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from .models import Conversation, Message, TypingIndicator, MessageReadStatus
+from . import presence
+from .models import Conversation, Message
+from .membership import is_participant
+from .pipeline import get_pipeline
+from .read_state import mark_messages_read
 from .serializers import MessageSerializer, MessageResponseSerializer
 
 User = get_user_model()
@@ -13,8 +20,15 @@ User = get_user_model()
 class ChatConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for real-time messaging"""
     
+    last_heartbeat = 0
+    
     async def connect(self):
         """Handle WebSocket connection"""
+        # Conversations this socket has joined, and their pending automatic
+        # typing_stop while the user is typing
+        self.subscriptions = set()
+        self.typing_timers = {}
+        
         # Get user from token or session
         self.user = self.scope.get('user')
         
@@ -23,54 +37,67 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return
         
         # Get conversation ID from URL
-        self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
+        self.conversation_id = int(self.scope['url_route']['kwargs']['conversation_id'])
         
         # Check if user is participant in conversation
         if not await self.is_participant(self.conversation_id, self.user):
             await self.close()
             return
         
-        # Join conversation group
-        self.conversation_group_name = f'chat_{self.conversation_id}'
-        
-        await self.channel_layer.group_add(
-            self.conversation_group_name,
-            self.channel_name
-        )
-        
         await self.accept()
-        
-        # Send user connected notification
-        await self.channel_layer.group_send(
-            self.conversation_group_name,
-            {
-                'type': 'user_connected',
-                'user_id': self.user.id,
-                'username': self.user.username
-            }
-        )
+        await self.join_conversations([self.conversation_id])
     
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
-        if hasattr(self, 'conversation_group_name'):
-            # Remove typing indicator
-            await self.stop_typing()
-            
-            # Send user disconnected notification
+        if getattr(self, 'subscriptions', None):
+            await self.leave_conversations(list(self.subscriptions))
+    
+    async def join_conversations(self, conversation_ids):
+        """Join the conversation groups and announce the user where this is their first socket"""
+        for conversation_id in conversation_ids:
+            self.subscriptions.add(conversation_id)
+            await self.channel_layer.group_add(f'chat_{conversation_id}', self.channel_name)
+        
+        self.last_heartbeat = time.monotonic()
+        for conversation_id in await sync_to_async(self.update_presence)(presence.connect, conversation_ids):
             await self.channel_layer.group_send(
-                self.conversation_group_name,
+                f'chat_{conversation_id}',
                 {
-                    'type': 'user_disconnected',
+                    'type': 'user_connected',
+                    'conversation_id': conversation_id,
                     'user_id': self.user.id,
                     'username': self.user.username
                 }
             )
-            
-            # Leave conversation group
-            await self.channel_layer.group_discard(
-                self.conversation_group_name,
-                self.channel_name
+    
+    async def leave_conversations(self, conversation_ids):
+        """Leave the conversation groups, announcing it where the user's last socket goes"""
+        # Remove typing indicators
+        for conversation_id in conversation_ids:
+            await self.handle_typing_stop(conversation_id)
+        
+        # Send user disconnected notification when the user's last socket closes
+        for conversation_id in await sync_to_async(self.update_presence)(presence.disconnect, conversation_ids):
+            await self.channel_layer.group_send(
+                f'chat_{conversation_id}',
+                {
+                    'type': 'user_disconnected',
+                    'conversation_id': conversation_id,
+                    'user_id': self.user.id,
+                    'username': self.user.username
+                }
             )
+        
+        for conversation_id in conversation_ids:
+            self.subscriptions.discard(conversation_id)
+            await self.channel_layer.group_discard(f'chat_{conversation_id}', self.channel_name)
+    
+    def update_presence(self, update, conversation_ids):
+        """Apply a presence update for this socket, returns the conversations where the user changed state"""
+        return [
+            conversation_id for conversation_id in conversation_ids
+            if update(conversation_id, self.user.id, self.channel_name)
+        ]
     
     async def receive(self, text_data):
         """Handle incoming WebSocket messages"""
@@ -78,25 +105,32 @@ class ChatConsumer(AsyncWebsocketConsumer):
             data = json.loads(text_data)
             message_type = data.get('type')
             
-            if message_type == 'send_message':
-                await self.handle_send_message(data)
-            elif message_type == 'typing_start':
-                await self.handle_typing_start()
-            elif message_type == 'typing_stop':
-                await self.handle_typing_stop()
-            elif message_type == 'mark_read':
-                await self.handle_mark_read(data)
-            elif message_type == 'edit_message':
-                await self.handle_edit_message(data)
-            elif message_type == 'delete_message':
-                await self.handle_delete_message(data)
-            
+            if message_type == 'heartbeat':
+                await self.handle_heartbeat()
+            else:
+                await self.handle_conversation_event(self.conversation_id, message_type, data)
+        
         except json.JSONDecodeError:
             await self.send_error('Invalid JSON format')
         except Exception as e:
             await self.send_error(f'Error processing message: {str(e)}')
     
-    async def handle_send_message(self, data):
+    async def handle_conversation_event(self, conversation_id, message_type, data):
+        """Dispatch a client event for one of the joined conversations"""
+        if message_type == 'send_message':
+            await self.handle_send_message(conversation_id, data)
+        elif message_type == 'typing_start':
+            await self.handle_typing_start(conversation_id)
+        elif message_type == 'typing_stop':
+            await self.handle_typing_stop(conversation_id)
+        elif message_type == 'mark_read':
+            await self.handle_mark_read(conversation_id, data)
+        elif message_type == 'edit_message':
+            await self.handle_edit_message(conversation_id, data)
+        elif message_type == 'delete_message':
+            await self.handle_delete_message(conversation_id, data)
+    
+    async def handle_send_message(self, conversation_id, data):
         """Handle sending a new message"""
         content = data.get('content', '').strip()
         reply_to_id = data.get('reply_to')
@@ -106,83 +140,87 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.send_error('Message content cannot be empty')
             return
         
-        # Create message in database
-        message = await self.create_message(
-            conversation_id=self.conversation_id,
+        # Persisted in a batch with other messages of this conversation,
+        # then broadcast to the group by the pipeline
+        await get_pipeline().submit(
+            conversation_id,
             sender=self.user,
             content=content,
             message_type=message_type,
             reply_to_id=reply_to_id
         )
-        
-        if message:
-            # Serialize message
-            message_data = await self.serialize_message(message)
-            
-            # Send to conversation group
-            await self.channel_layer.group_send(
-                self.conversation_group_name,
-                {
-                    'type': 'new_message',
-                    'message': message_data
-                }
-            )
-            
-            # Update conversation last message
-            await self.update_conversation_last_message(
-                self.conversation_id, 
-                message
-            )
     
-    async def handle_typing_start(self):
-        """Handle typing indicator start"""
-        await self.start_typing()
+    async def handle_typing_start(self, conversation_id):
+        """Handle typing indicator start, repeated starts only push back the timeout"""
+        timer = self.typing_timers.get(conversation_id)
+        if timer is not None:
+            timer.cancel()
+        self.typing_timers[conversation_id] = asyncio.get_running_loop().call_later(
+            getattr(settings, 'MESSAGING_TYPING_TIMEOUT', 5),
+            lambda: asyncio.ensure_future(self.handle_typing_stop(conversation_id))
+        )
+        if timer is not None:
+            return
         
         # Notify others in conversation
         await self.channel_layer.group_send(
-            self.conversation_group_name,
+            f'chat_{conversation_id}',
             {
                 'type': 'typing_indicator',
+                'conversation_id': conversation_id,
                 'user_id': self.user.id,
                 'username': self.user.username,
                 'is_typing': True
             }
         )
     
-    async def handle_typing_stop(self):
+    async def handle_typing_stop(self, conversation_id):
         """Handle typing indicator stop"""
-        await self.stop_typing()
+        timer = self.typing_timers.pop(conversation_id, None)
+        if timer is None:
+            return
+        timer.cancel()
         
         # Notify others in conversation
         await self.channel_layer.group_send(
-            self.conversation_group_name,
+            f'chat_{conversation_id}',
             {
                 'type': 'typing_indicator',
+                'conversation_id': conversation_id,
                 'user_id': self.user.id,
                 'username': self.user.username,
                 'is_typing': False
             }
         )
     
-    async def handle_mark_read(self, data):
+    async def handle_heartbeat(self):
+        """Keep this socket in the presence registry, at most a few writes per TTL"""
+        now = time.monotonic()
+        if now - self.last_heartbeat < presence.presence_ttl() / 3:
+            return
+        self.last_heartbeat = now
+        await sync_to_async(self.update_presence)(presence.heartbeat, list(self.subscriptions))
+    
+    async def handle_mark_read(self, conversation_id, data):
         """Handle marking messages as read"""
         message_ids = data.get('message_ids', [])
         
         if message_ids:
-            await self.mark_messages_read(message_ids)
+            await self.mark_messages_read(conversation_id, message_ids)
             
             # Notify sender about read status
             await self.channel_layer.group_send(
-                self.conversation_group_name,
+                f'chat_{conversation_id}',
                 {
                     'type': 'messages_read',
+                    'conversation_id': conversation_id,
                     'message_ids': message_ids,
                     'reader_id': self.user.id,
                     'reader_username': self.user.username
                 }
             )
     
-    async def handle_edit_message(self, data):
+    async def handle_edit_message(self, conversation_id, data):
         """Handle message editing"""
         message_id = data.get('message_id')
         new_content = data.get('content', '').strip()
@@ -191,38 +229,41 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.send_error('Message content cannot be empty')
             return
         
-        message = await self.edit_message(message_id, new_content)
+        message = await self.edit_message(conversation_id, message_id, new_content)
         
         if message:
             message_data = await self.serialize_message(message)
             
             await self.channel_layer.group_send(
-                self.conversation_group_name,
+                f'chat_{conversation_id}',
                 {
                     'type': 'message_edited',
+                    'conversation_id': conversation_id,
                     'message': message_data
                 }
             )
     
-    async def handle_delete_message(self, data):
+    async def handle_delete_message(self, conversation_id, data):
         """Handle message deletion"""
         message_id = data.get('message_id')
         
-        if await self.delete_message(message_id):
+        if await self.delete_message(conversation_id, message_id):
             await self.channel_layer.group_send(
-                self.conversation_group_name,
+                f'chat_{conversation_id}',
                 {
                     'type': 'message_deleted',
+                    'conversation_id': conversation_id,
                     'message_id': message_id,
                     'deleted_by': self.user.id
                 }
             )
     
-    # Event handlers for group messages
+    # Event handlers for group messages, every frame names its conversation
     async def new_message(self, event):
         """Send new message to WebSocket"""
         await self.send(text_data=json.dumps({
             'type': 'new_message',
+            'conversation_id': event['conversation_id'],
             'message': event['message']
         }))
     
@@ -232,6 +273,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if event['user_id'] != self.user.id:
             await self.send(text_data=json.dumps({
                 'type': 'typing_indicator',
+                'conversation_id': event['conversation_id'],
                 'user_id': event['user_id'],
                 'username': event['username'],
                 'is_typing': event['is_typing']
@@ -241,6 +283,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """Send read status to WebSocket"""
         await self.send(text_data=json.dumps({
             'type': 'messages_read',
+            'conversation_id': event['conversation_id'],
             'message_ids': event['message_ids'],
             'reader_id': event['reader_id'],
             'reader_username': event['reader_username']
@@ -250,6 +293,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """Send edited message to WebSocket"""
         await self.send(text_data=json.dumps({
             'type': 'message_edited',
+            'conversation_id': event['conversation_id'],
             'message': event['message']
         }))
     
@@ -257,6 +301,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         """Send deleted message to WebSocket"""
         await self.send(text_data=json.dumps({
             'type': 'message_deleted',
+            'conversation_id': event['conversation_id'],
             'message_id': event['message_id'],
             'deleted_by': event['deleted_by']
         }))
@@ -266,6 +311,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if event['user_id'] != self.user.id:
             await self.send(text_data=json.dumps({
                 'type': 'user_connected',
+                'conversation_id': event['conversation_id'],
                 'user_id': event['user_id'],
                 'username': event['username']
             }))
@@ -275,6 +321,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if event['user_id'] != self.user.id:
             await self.send(text_data=json.dumps({
                 'type': 'user_disconnected',
+                'conversation_id': event['conversation_id'],
                 'user_id': event['user_id'],
                 'username': event['username']
             }))
@@ -290,37 +337,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
     @database_sync_to_async
     def is_participant(self, conversation_id, user):
         """Check if user is participant in conversation"""
-        try:
-            conversation = Conversation.objects.get(id=conversation_id)
-            return conversation.participants.filter(id=user.id).exists()
-        except Conversation.DoesNotExist:
-            return False
-    
-    @database_sync_to_async
-    def create_message(self, conversation_id, sender, content, message_type='text', reply_to_id=None):
-        """Create a new message"""
-        try:
-            conversation = Conversation.objects.get(id=conversation_id)
-            
-            reply_to = None
-            if reply_to_id:
-                try:
-                    reply_to = Message.objects.get(id=reply_to_id, conversation=conversation)
-                except Message.DoesNotExist:
-                    pass
-            
-            message = Message.objects.create(
-                conversation=conversation,
-                sender=sender,
-                content=content,
-                message_type=message_type,
-                reply_to=reply_to
-            )
-            
-            return message
-            
-        except Conversation.DoesNotExist:
-            return None
+        return is_participant(conversation_id, user.id)
     
     @database_sync_to_async
     def serialize_message(self, message):
@@ -329,69 +346,22 @@ class ChatConsumer(AsyncWebsocketConsumer):
         return serializer.data
     
     @database_sync_to_async
-    def update_conversation_last_message(self, conversation_id, message):
-        """Update conversation's last message"""
-        try:
-            conversation = Conversation.objects.get(id=conversation_id)
-            conversation.last_message = message.content
-            conversation.last_message_sender = message.sender
-            conversation.last_message_at = message.created_at
-            conversation.save()
-        except Conversation.DoesNotExist:
-            pass
-    
-    @database_sync_to_async
-    def start_typing(self):
-        """Start typing indicator"""
-        try:
-            conversation = Conversation.objects.get(id=self.conversation_id)
-            TypingIndicator.objects.update_or_create(
-                conversation=conversation,
-                user=self.user,
-                defaults={'last_activity': timezone.now()}
-            )
-        except Conversation.DoesNotExist:
-            pass
-    
-    @database_sync_to_async
-    def stop_typing(self):
-        """Stop typing indicator"""
-        try:
-            conversation = Conversation.objects.get(id=self.conversation_id)
-            TypingIndicator.objects.filter(
-                conversation=conversation,
-                user=self.user
-            ).delete()
-        except Conversation.DoesNotExist:
-            pass
-    
-    @database_sync_to_async
-    def mark_messages_read(self, message_ids):
+    def mark_messages_read(self, conversation_id, message_ids):
         """Mark messages as read"""
-        try:
-            conversation = Conversation.objects.get(id=self.conversation_id)
-            messages = Message.objects.filter(
-                id__in=message_ids,
-                conversation=conversation
-            ).exclude(sender=self.user)
-            
-            for message in messages:
-                MessageReadStatus.objects.get_or_create(
-                    user=self.user,
-                    message=message
-                )
-            
-        except Conversation.DoesNotExist:
-            pass
+        messages = Message.objects.filter(
+            id__in=message_ids,
+            conversation_id=conversation_id
+        )
+        mark_messages_read(self.user, messages)
     
     @database_sync_to_async
-    def edit_message(self, message_id, new_content):
+    def edit_message(self, conversation_id, message_id, new_content):
         """Edit a message"""
         try:
             message = Message.objects.get(
                 id=message_id,
                 sender=self.user,
-                conversation_id=self.conversation_id
+                conversation_id=conversation_id
             )
             
             message.content = new_content
@@ -400,18 +370,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
             message.save()
             
             return message
-            
+        
         except Message.DoesNotExist:
             return None
     
     @database_sync_to_async
-    def delete_message(self, message_id):
+    def delete_message(self, conversation_id, message_id):
         """Delete a message"""
         try:
             message = Message.objects.get(
                 id=message_id,
                 sender=self.user,
-                conversation_id=self.conversation_id
+                conversation_id=conversation_id
             )
             
             message.is_deleted = True
@@ -419,7 +389,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
             message.save()
             
             return True
-            
+        
         except Message.DoesNotExist:
             return False
 
@@ -461,7 +431,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             
             if message_type == 'mark_read':
                 await self.handle_mark_notification_read(data)
-            
+        
         except json.JSONDecodeError:
             await self.send_error('Invalid JSON format')
     
@@ -500,4 +470,109 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             notification.read_at = timezone.now()
             notification.save()
         except Notification.DoesNotExist:
-            pass
\ No newline at end of file
+            pass
+
+
+class MultiplexConsumer(ChatConsumer, NotificationConsumer):
+    """
+    One WebSocket per user for all of their conversations and notifications.
+    
+    The user is authenticated once at connect and joins their notification
+    group; conversations are joined and left with subscribe/unsubscribe
+    frames carrying ``conversation_ids``. Conversation events carry the
+    ``conversation_id`` they are for, in both directions, and otherwise
+    match ChatConsumer's. Notifications are marked read with
+    ``mark_notification_read``.
+    """
+    
+    async def connect(self):
+        """Handle WebSocket connection"""
+        self.subscriptions = set()
+        self.typing_timers = {}
+        await NotificationConsumer.connect(self)
+    
+    async def disconnect(self, close_code):
+        """Handle WebSocket disconnection"""
+        await ChatConsumer.disconnect(self, close_code)
+        await NotificationConsumer.disconnect(self, close_code)
+    
+    async def receive(self, text_data):
+        """Handle incoming WebSocket messages"""
+        try:
+            data = json.loads(text_data)
+            message_type = data.get('type')
+            
+            if message_type == 'subscribe':
+                await self.handle_subscribe(data)
+            elif message_type == 'unsubscribe':
+                await self.handle_unsubscribe(data)
+            elif message_type == 'heartbeat':
+                await self.handle_heartbeat()
+            elif message_type == 'mark_notification_read':
+                await self.handle_mark_notification_read(data)
+            else:
+                conversation_id = self.frame_conversation_id(data)
+                if conversation_id not in self.subscriptions:
+                    await self.send_error('Not subscribed to this conversation')
+                    return
+                await self.handle_conversation_event(conversation_id, message_type, data)
+        
+        except json.JSONDecodeError:
+            await self.send_error('Invalid JSON format')
+        except Exception as e:
+            await self.send_error(f'Error processing message: {str(e)}')
+    
+    def frame_conversation_id(self, data):
+        """Conversation id of an event frame, None if it isn't a valid id"""
+        try:
+            return int(data.get('conversation_id'))
+        except (TypeError, ValueError):
+            return None
+    
+    def frame_conversation_ids(self, data):
+        """Conversation ids of a frame, from ``conversation_ids`` or ``conversation_id``"""
+        ids = data.get('conversation_ids')
+        if ids is None:
+            ids = [data.get('conversation_id')]
+        try:
+            return [int(conversation_id) for conversation_id in ids]
+        except (TypeError, ValueError):
+            return []
+    
+    async def handle_subscribe(self, data):
+        """Join the requested conversations the user takes part in"""
+        requested = [
+            conversation_id for conversation_id in dict.fromkeys(self.frame_conversation_ids(data))
+            if conversation_id not in self.subscriptions
+        ]
+        room = getattr(settings, 'MESSAGING_MAX_SUBSCRIPTIONS', 500) - len(self.subscriptions)
+        allowed = await self.participant_conversations(requested[:max(room, 0)])
+        
+        await self.join_conversations(allowed)
+        
+        await self.send(text_data=json.dumps({
+            'type': 'subscribed',
+            'conversation_ids': allowed,
+            'rejected': [conversation_id for conversation_id in requested if conversation_id not in allowed]
+        }))
+    
+    async def handle_unsubscribe(self, data):
+        """Leave the given conversations"""
+        left = [
+            conversation_id for conversation_id in self.frame_conversation_ids(data)
+            if conversation_id in self.subscriptions
+        ]
+        await self.leave_conversations(left)
+        
+        await self.send(text_data=json.dumps({
+            'type': 'unsubscribed',
+            'conversation_ids': left
+        }))
+    
+    @database_sync_to_async
+    def participant_conversations(self, conversation_ids):
+        """The given conversations the user takes part in, one thread hop for all"""
+        return [
+            conversation_id for conversation_id in conversation_ids
+            if is_participant(conversation_id, self.user.id)
+        ]
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from messaging.read_state import rebuild_read_states, watermarks_from_read_statuses
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-participant unread counters from the read watermarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--conversation',
+            type=int,
+            action='append',
+            dest='conversation_ids',
+            help='Limit to the given conversation id (may be repeated)',
+        )
+        parser.add_argument(
+            '--fold-read-statuses',
+            action='store_true',
+            help='First raise watermarks to the newest legacy per-message read status',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='With --fold-read-statuses, delete the legacy read status rows afterwards',
+        )
+
+    def handle(self, *args, **options):
+        if options['fold_read_statuses']:
+            raised, deleted = watermarks_from_read_statuses(prune=options['prune'])
+            self.stdout.write(f'Raised {raised} watermarks, deleted {deleted} read status rows')
+
+        self.stdout.write('Rebuilding unread counters...')
+        count = rebuild_read_states(options['conversation_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} read state rows'))
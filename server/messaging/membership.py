@@ -0,0 +1,100 @@
+"""
+Cached conversation membership.
+
+Participant ids are looked up in a small per-process LRU, then in the
+default cache (Redis when REDIS_URL is set, so processes share it), and only
+then in the database. Entries are dropped from both tiers by the
+participants m2m_changed and Conversation post_delete signals (see
+signals.py). Other processes only see an invalidation once their local
+entry expires, so MESSAGING_MEMBERSHIP_LOCAL_TTL bounds how long a removed
+participant can keep passing checks there.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Conversation
+
+CACHE_KEY = 'messaging:participants:{}'
+
+
+class LRUCache:
+    """Thread-safe bounded mapping whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local = LRUCache(
+    getattr(settings, 'MESSAGING_MEMBERSHIP_CACHE_SIZE', 1024),
+    getattr(settings, 'MESSAGING_MEMBERSHIP_LOCAL_TTL', 5),
+)
+
+
+def get_participant_ids(conversation_id):
+    """Frozen set of the conversation's participant ids, empty if it doesn't exist"""
+    conversation_id = int(conversation_id)
+    participant_ids = _local.get(conversation_id)
+    if participant_ids is not None:
+        return participant_ids
+
+    key = CACHE_KEY.format(conversation_id)
+    participant_ids = cache.get(key)
+    if participant_ids is None:
+        participant_ids = frozenset(
+            Conversation.participants.through.objects.filter(
+                conversation_id=conversation_id
+            ).values_list('user_id', flat=True)
+        )
+        cache.set(key, participant_ids, getattr(settings, 'MESSAGING_MEMBERSHIP_CACHE_TIMEOUT', 300))
+
+    _local.set(conversation_id, participant_ids)
+    return participant_ids
+
+
+def is_participant(conversation_id, user_id):
+    return user_id in get_participant_ids(conversation_id)
+
+
+def invalidate(conversation_id):
+    """Drop a conversation now and again after commit, so readers can't re-cache the old list"""
+    def drop():
+        _local.delete(int(conversation_id))
+        cache.delete(CACHE_KEY.format(conversation_id))
+
+    drop()
+    transaction.on_commit(drop)
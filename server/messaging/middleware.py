@@ -2,6 +2,8 @@ from channels.middleware import BaseMiddleware
 from channels.db import database_sync_to_async
 from urllib.parse import parse_qs
 
+from authentication.token_cache import token_users
+
 
 class JWTAuthMiddleware(BaseMiddleware):
     """JWT Authentication middleware for WebSocket connections"""
@@ -26,8 +28,9 @@ class JWTAuthMiddleware(BaseMiddleware):
             if auth_header.startswith('Bearer '):
                 token = auth_header.split(' ')[1]
         
-        # Authenticate user
-        scope['user'] = await self.get_user_from_token(token)
+        # Authenticate user, reconnects with a known token skip the thread hop
+        cached = token_users.get(token) if token else None
+        scope['user'] = cached[0] if cached else await self.get_user_from_token(token)
         
         return await super().__call__(scope, receive, send)
     
@@ -55,6 +58,7 @@ class JWTAuthMiddleware(BaseMiddleware):
             
             # Get user from database
             user = User.objects.get(id=user_id)
+            token_users.set(token, user, access_token)
             return user
             
         except (InvalidToken, TokenError, User.DoesNotExist):
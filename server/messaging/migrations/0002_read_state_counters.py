@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+def backfill_read_states(apps, schema_editor):
+    Conversation = apps.get_model('messaging', 'Conversation')
+    ConversationReadTime = apps.get_model('messaging', 'ConversationReadTime')
+    Message = apps.get_model('messaging', 'Message')
+
+    through = Conversation.participants.through
+    for conversation_id, user_id in through.objects.values_list('conversation_id', 'user_id').iterator():
+        unread_count = Message.objects.filter(
+            conversation_id=conversation_id
+        ).exclude(sender_id=user_id).exclude(read_statuses__user_id=user_id).count()
+        last_read_message_id = Message.objects.filter(
+            conversation_id=conversation_id, read_statuses__user_id=user_id
+        ).order_by('-id').values_list('id', flat=True).first() or 0
+        ConversationReadTime.objects.update_or_create(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            defaults={'unread_count': unread_count, 'last_read_message_id': last_read_message_id},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationreadtime',
+            name='last_read_message_id',
+            field=models.PositiveBigIntegerField(default=0, help_text='Highest message id marked as read'),
+        ),
+        migrations.AddField(
+            model_name='conversationreadtime',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0, help_text='Unread messages from other participants'),
+        ),
+        migrations.RunPython(backfill_read_states, migrations.RunPython.noop),
+    ]
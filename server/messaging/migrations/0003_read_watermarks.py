@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:40
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def fold_read_statuses(apps, schema_editor):
+    """
+    Turn legacy per-message read rows into watermarks: a participant has read
+    everything up to the newest message they have a read status for. Counters
+    are recomputed against the watermark, with the filter of
+    read_state._unread_after. Two UPDATEs, whatever the number of rows.
+    """
+    ConversationReadTime = apps.get_model('messaging', 'ConversationReadTime')
+    Message = apps.get_model('messaging', 'Message')
+    MessageReadStatus = apps.get_model('messaging', 'MessageReadStatus')
+
+    latest_read = MessageReadStatus.objects.filter(
+        user_id=OuterRef('user_id'), message__conversation_id=OuterRef('conversation_id')
+    ).order_by().values('user_id').annotate(latest=Max('message_id')).values('latest')
+    ConversationReadTime.objects.update(last_read_message_id=Greatest(
+        F('last_read_message_id'), Coalesce(Subquery(latest_read, output_field=IntegerField()), Value(0))
+    ))
+
+    unread = Message.objects.filter(
+        conversation_id=OuterRef('conversation_id'),
+        id__gt=OuterRef('last_read_message_id'),
+        is_deleted=False
+    ).exclude(
+        sender_id=OuterRef('user_id')
+    ).order_by().values('conversation_id').annotate(total=Count('id')).values('total')
+    ConversationReadTime.objects.update(
+        unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0002_read_state_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conversationreadtime',
+            name='last_read_message_id',
+            field=models.PositiveBigIntegerField(default=0, help_text='Messages up to this id are read'),
+        ),
+        migrations.RunPython(fold_read_statuses, migrations.RunPython.noop),
+    ]
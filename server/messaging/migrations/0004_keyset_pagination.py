@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:07
+
+from django.db import migrations, models
+
+
+def backfill_last_message(apps, schema_editor):
+    """Conversations used to be ordered by MAX(messages.created_at)"""
+    Conversation = apps.get_model('messaging', 'Conversation')
+    Message = apps.get_model('messaging', 'Message')
+
+    for conversation_id in Message.objects.values_list('conversation_id', flat=True).distinct().iterator():
+        latest = Message.objects.filter(conversation_id=conversation_id).order_by('-created_at', '-id').first()
+        Conversation.objects.filter(pk=conversation_id).update(
+            last_message_at=latest.created_at,
+            last_message=latest.content,
+            last_message_sender_id=latest.sender_id,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_read_watermarks'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='message',
+            name='messages_convers_3ebb41_idx',
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['last_message_at', 'id'], name='conversatio_last_me_bc78e7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'created_at', 'id'], name='messages_convers_5267e1_idx'),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
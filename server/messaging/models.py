@@ -3,6 +3,8 @@ from django.conf import settings
 from django.utils import timezone
 import uuid
 
+from file_management.storage import get_blob_storage
+
 
 class Conversation(models.Model):
     """المحادثات"""
@@ -34,7 +36,7 @@ class Conversation(models.Model):
     is_group = models.BooleanField(default=False)
     is_archived = models.BooleanField(default=False)
     
-    # Last activity
+    # Last activity, updated by touch() when a message is created
     last_message_at = models.DateTimeField(auto_now_add=True)
     last_message = models.TextField(blank=True)
     last_message_sender = models.ForeignKey(
@@ -53,6 +55,20 @@ class Conversation(models.Model):
         verbose_name = 'Conversation'
         verbose_name_plural = 'Conversations'
         ordering = ['-last_message_at']
+        indexes = [
+            models.Index(fields=['last_message_at', 'id']),
+        ]
+    
+    @classmethod
+    def touch(cls, conversation_id, message):
+        """Store ``message`` as the latest one, unless a newer message is already stored"""
+        cls.objects.filter(
+            pk=conversation_id, last_message_at__lte=message.created_at
+        ).update(
+            last_message_at=message.created_at,
+            last_message=message.content,
+            last_message_sender_id=message.sender_id,
+        )
     
     def __str__(self):
         if self.title:
@@ -73,12 +89,8 @@ class Conversation(models.Model):
     
     def get_unread_count(self, user):
         """Get unread message count for a user"""
-        return self.messages.filter(
-            created_at__gt=user.last_read_times.get(
-                conversation=self, 
-                defaults={'last_read_at': timezone.now()}
-            ).last_read_at
-        ).exclude(sender=user).count()
+        from .read_state import get_unread_count
+        return get_unread_count(self.id, user.id)
 
 
 class Message(models.Model):
@@ -128,11 +140,21 @@ class Message(models.Model):
         verbose_name_plural = 'Messages'
         ordering = ['created_at']
         indexes = [
-            models.Index(fields=['conversation', 'created_at']),
+            models.Index(fields=['conversation', 'created_at', 'id']),
             models.Index(fields=['sender']),
             models.Index(fields=['message_type']),
         ]
     
+    # is_deleted as loaded, None for rows not read from the database
+    _loaded_is_deleted = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # So a soft delete is seen on save without reading the row again
+        instance._loaded_is_deleted = instance.__dict__.get('is_deleted')
+        return instance
+    
     def __str__(self):
         return f"{self.sender.get_full_name()}: {self.content[:50]}..."
 
@@ -147,10 +169,18 @@ class MessageAttachment(models.Model):
         ('other', 'Other'),
     ]
     
+    ALLOWED_MIME_TYPES = [
+        'image/jpeg', 'image/png', 'image/gif', 'image/webp',
+        'application/pdf', 'application/msword',
+        'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+        'text/plain', 'video/mp4', 'video/avi', 'video/mov',
+        'audio/mpeg', 'audio/wav', 'audio/mp3'
+    ]
+    
     message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='attachments')
     
     # File details
-    file = models.FileField(upload_to='message_attachments/%Y/%m/%d/')
+    file = models.FileField(upload_to='message_attachments/%Y/%m/%d/', storage=get_blob_storage)
     original_filename = models.CharField(max_length=255)
     file_size = models.PositiveIntegerField()  # in bytes
     file_type = models.CharField(max_length=20, choices=ATTACHMENT_TYPES)
@@ -163,6 +193,8 @@ class MessageAttachment(models.Model):
     
     # Thumbnail for videos/images
     thumbnail = models.ImageField(upload_to='message_thumbnails/%Y/%m/%d/', null=True, blank=True)
+    # Resized WebP/JPEG renditions per size, see file_management.thumbnails
+    variants = models.JSONField(default=dict, blank=True)
     
     # Security
     is_scanned = models.BooleanField(default=False)
@@ -191,6 +223,8 @@ class MessageAttachment(models.Model):
 
 class MessageReadStatus(models.Model):
     """حالة قراءة الرسائل"""
+    # Legacy per-message read state, no longer written: reads move
+    # ConversationReadTime.last_read_message_id instead (see read_state.py)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='read_statuses')
     message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='read_statuses')
     read_at = models.DateTimeField(auto_now_add=True)
@@ -211,6 +245,10 @@ class ConversationReadTime(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='read_times')
     last_read_at = models.DateTimeField(default=timezone.now)
     
+    # Denormalized read state, maintained by messaging/read_state.py
+    unread_count = models.PositiveIntegerField(default=0, help_text='Unread messages from other participants')
+    last_read_message_id = models.PositiveBigIntegerField(default=0, help_text='Messages up to this id are read')
+    
     class Meta:
         db_table = 'conversation_read_times'
         verbose_name = 'Conversation Read Time'
@@ -301,6 +339,8 @@ class ConversationSettings(models.Model):
 
 class TypingIndicator(models.Model):
     """مؤشر الكتابة"""
+    # No longer written: ChatConsumer debounces typing events in memory and
+    # presence lives in the cache (see presence.py)
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='typing_indicators')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='typing_indicators')
     
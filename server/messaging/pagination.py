@@ -0,0 +1,165 @@
+"""
+Keyset pagination for chat history, conversation and proposal lists.
+
+Pages are anchored on an object id instead of an offset: ``?before=<id>``
+returns the rows that come after that object in the list order (older
+messages), ``?after=<id>`` the rows that come before it (newer messages),
+always in list order. The anchor's ordering values are looked up once and
+the page is a range scan on an index matching ``ordering``, with no OFFSET
+and no COUNT; one extra row is fetched to know whether more pages exist.
+"""
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    # The last field unique, get_ordering() may pick another per request
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    before_query_param = 'before'
+    after_query_param = 'after'
+    anchor_schema = {'type': 'integer'}
+
+    def get_ordering(self, request):
+        return self.ordering
+
+    def get_fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_anchor_id(self, request, param, queryset):
+        value = request.query_params.get(param)
+        if value in (None, ''):
+            return None
+        try:
+            return queryset.model._meta.pk.to_python(value)
+        except DjangoValidationError:
+            raise ValidationError({param: 'A valid id is required.'})
+
+    def keyset_filter(self, values, forward=True):
+        """Rows strictly after ``values`` in list order, or strictly before them when not ``forward``"""
+        fields = self.get_fields()
+        condition = Q()
+        for index, field in enumerate(fields):
+            lookup = 'lt' if self.ordering[index].startswith('-') == forward else 'gt'
+            step = Q(**{f'{field}__{lookup}': values[index]})
+            for previous, value in zip(fields[:index], values[:index]):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(request)
+        self.page_size = self.get_page_size(request)
+        before = self.get_anchor_id(request, self.before_query_param, queryset)
+        after = self.get_anchor_id(request, self.after_query_param, queryset)
+        if before is not None and after is not None:
+            raise ValidationError(f'Use either {self.before_query_param} or {self.after_query_param}, not both.')
+
+        anchor_id = before if before is not None else after
+        if anchor_id is not None:
+            values = queryset.order_by().filter(pk=anchor_id).values_list(*self.get_fields()).first()
+            if values is None:
+                raise NotFound('Invalid cursor')
+
+        if after is not None:
+            # Walk towards the start of the list, then restore list order
+            reversed_ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering]
+            rows = list(
+                queryset.filter(self.keyset_filter(values, forward=False)).order_by(*reversed_ordering)[:self.page_size + 1]
+            )
+            self.has_previous = len(rows) > self.page_size
+            self.has_next = True
+            self.page = rows[:self.page_size][::-1]
+        else:
+            if before is not None:
+                queryset = queryset.filter(self.keyset_filter(values))
+            rows = list(queryset.order_by(*self.ordering)[:self.page_size + 1])
+            self.has_next = len(rows) > self.page_size
+            self.has_previous = before is not None
+            self.page = rows[:self.page_size]
+        return self.page
+
+    def get_link(self, param, instance):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.before_query_param)
+        url = remove_query_param(url, self.after_query_param)
+        return replace_query_param(url, param, instance.pk)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_link(self.before_query_param, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.get_link(self.after_query_param, self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.before_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Return the items listed after this id (older)',
+                'schema': self.anchor_schema,
+            },
+            {
+                'name': self.after_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Return the items listed before this id (newer)',
+                'schema': self.anchor_schema,
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results per page (max {self.max_page_size})',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class MessagePagination(KeysetPagination):
+    """Newest messages first"""
+    ordering = ('-created_at', '-id')
+
+
+class ConversationPagination(KeysetPagination):
+    """Most recently active conversations first"""
+    ordering = ('-last_message_at', '-id')
+    page_size = 20
@@ -0,0 +1,196 @@
+"""
+Write-coalescing persistence for chat messages sent over WebSockets.
+
+ChatConsumer hands new messages to the pipeline of its event loop instead of
+creating them one at a time. Messages are buffered per conversation for
+MESSAGING_WRITE_DELAY seconds (or until MESSAGING_WRITE_BATCH_SIZE are
+waiting) and a single sync call persists every buffered conversation in one
+transaction:
+
+- one bulk INSERT for the messages
+- per conversation, one UPDATE per distinct sender for the unread counters
+  and one UPDATE of the last message fields
+- one bulk INSERT for their search documents
+
+bulk_create does not send post_save, so these stand in for the per-message
+signal handlers, through the same read_state.messages_created and
+Conversation.touch they call. Senders are answered as soon as the
+transaction commits, then the messages are broadcast to the conversation
+group in the order they were received; a failed broadcast is only logged,
+the messages are already saved.
+"""
+import asyncio
+import logging
+import weakref
+from dataclasses import dataclass
+from typing import Optional
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import prefetch_related_objects
+
+from search.index import SEARCH_SPECS, index_new_instances
+from .models import Conversation, Message
+from .read_state import messages_created
+from .serializers import MessageResponseSerializer
+
+logger = logging.getLogger(__name__)
+
+_pipelines = weakref.WeakKeyDictionary()
+
+
+@dataclass
+class PendingMessage:
+    sender: object
+    content: str
+    message_type: str = 'text'
+    reply_to_id: Optional[int] = None
+    future: Optional[asyncio.Future] = None
+
+
+def _as_id(value):
+    try:
+        return int(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+def persist_messages(batches):
+    """
+    Save queued messages, ``{conversation_id: [PendingMessage, ...]}``, in one
+    transaction. Returns ``{conversation_id: [data, ...]}`` with the serialized
+    messages in order, or None for each message of a conversation that is gone.
+    """
+    existing = set(Conversation.objects.filter(id__in=batches).values_list('id', flat=True))
+    results = {conversation_id: [None] * len(pending) for conversation_id, pending in batches.items()}
+    batches = {conversation_id: pending for conversation_id, pending in batches.items() if conversation_id in existing}
+    if not batches:
+        return results
+
+    reply_ids = {item.reply_to_id for pending in batches.values() for item in pending if item.reply_to_id}
+    valid_replies = set(
+        Message.objects.filter(id__in=reply_ids).values_list('id', 'conversation_id')
+    ) if reply_ids else set()
+
+    messages = {
+        conversation_id: [
+            Message(
+                conversation_id=conversation_id,
+                sender=item.sender,
+                content=item.content,
+                message_type=item.message_type,
+                reply_to_id=item.reply_to_id if (item.reply_to_id, conversation_id) in valid_replies else None,
+            )
+            for item in pending
+        ]
+        for conversation_id, pending in batches.items()
+    }
+    all_messages = [message for group in messages.values() for message in group]
+
+    with transaction.atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            Message.objects.bulk_create(all_messages)
+            for conversation_id, group in messages.items():
+                messages_created(conversation_id, group)
+                Conversation.touch(conversation_id, group[-1])
+            index_new_instances(SEARCH_SPECS['message'], all_messages)
+        else:
+            # Without RETURNING the ids are unknown, save one by one and let the signals run
+            for message in all_messages:
+                message.save()
+
+    prefetch_related_objects(all_messages, 'attachments', 'reply_to__sender')
+    # One serializer for the whole batch, its fields are built once
+    serialized = iter(MessageResponseSerializer(all_messages, many=True).data)
+    for conversation_id, group in messages.items():
+        results[conversation_id] = [next(serialized) for _ in group]
+    return results
+
+
+class MessageWritePipeline:
+    """Per event loop buffers of messages waiting to be persisted"""
+
+    def __init__(self, delay=None, batch_size=None):
+        self.delay = getattr(settings, 'MESSAGING_WRITE_DELAY', 0.005) if delay is None else delay
+        self.batch_size = getattr(settings, 'MESSAGING_WRITE_BATCH_SIZE', 100) if batch_size is None else batch_size
+        self.buffers = {}
+        self.buffered = 0
+        self.timer = None
+        # The flush in progress, so batches are committed and broadcast in order
+        self.last_flush = None
+
+    async def submit(self, conversation_id, sender, content, message_type='text', reply_to_id=None):
+        """
+        Queue a message and wait until it is persisted. Returns its
+        serialized data, or None if the conversation is gone.
+        """
+        # URL route kwargs are strings
+        conversation_id = int(conversation_id)
+        loop = asyncio.get_running_loop()
+        pending = PendingMessage(sender, content, message_type, _as_id(reply_to_id), loop.create_future())
+        self.buffers.setdefault(conversation_id, []).append(pending)
+        self.buffered += 1
+
+        if self.buffered >= self.batch_size:
+            self.start_flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.delay, self.start_flush)
+        return await pending.future
+
+    def start_flush(self):
+        """Hand every buffered conversation to one flush"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batches, self.buffers, self.buffered = self.buffers, {}, 0
+        if batches:
+            self.last_flush = asyncio.ensure_future(self.flush(batches, self.last_flush))
+
+    async def flush(self, batches, previous=None):
+        if previous is not None:
+            await previous
+
+        try:
+            results = await database_sync_to_async(persist_messages)(batches)
+        except Exception as exc:
+            for pending in batches.values():
+                for item in pending:
+                    if not item.future.done():
+                        item.future.set_exception(exc)
+            return
+
+        # Saved, a failing broadcast below must not make the senders retry
+        for conversation_id, pending in batches.items():
+            for item, data in zip(pending, results[conversation_id]):
+                if not item.future.done():
+                    item.future.set_result(data)
+
+        channel_layer = get_channel_layer()
+        for conversation_id, group in results.items():
+            for data in group:
+                if data is None:
+                    continue
+                try:
+                    await channel_layer.group_send(
+                        f'chat_{conversation_id}',
+                        {'type': 'new_message', 'conversation_id': conversation_id, 'message': data}
+                    )
+                except Exception:
+                    logger.exception('Could not broadcast message %s of conversation %s', data.get('id'), conversation_id)
+
+    async def drain(self):
+        """Flush everything buffered and wait for the flushes to finish"""
+        self.start_flush()
+        if self.last_flush is not None:
+            await self.last_flush
+
+
+def get_pipeline():
+    """The pipeline of the running event loop"""
+    loop = asyncio.get_running_loop()
+    pipeline = _pipelines.get(loop)
+    if pipeline is None:
+        pipeline = _pipelines[loop] = MessageWritePipeline()
+    return pipeline
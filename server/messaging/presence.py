@@ -0,0 +1,81 @@
+"""
+Conversation presence registry.
+
+Each (conversation, user) pair has MESSAGING_PRESENCE_SLOTS socket slots in
+the default cache (Redis when REDIS_URL is set), one key per slot holding the
+name of the WebSocket channel that claimed it. Slots are claimed with
+cache.add and released with cache.delete, so concurrent sockets of a user
+never overwrite each other's entry. Sockets refresh their slot with
+heartbeats and lose it once MESSAGING_PRESENCE_TTL seconds pass without one,
+so crashed workers don't leave users online. Nothing here touches the
+database apart from the cached participant lists in membership.py.
+
+connect() and disconnect() report whether the user came online or went
+offline, so ChatConsumer only broadcasts real transitions instead of every
+socket opening and closing. Sockets racing each other may both report the
+same transition, but a transition is never missed.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .membership import get_participant_ids
+
+PRESENCE_KEY = 'messaging:presence:{}:{}:{}'
+
+
+def presence_ttl():
+    return getattr(settings, 'MESSAGING_PRESENCE_TTL', 60)
+
+
+def _slot_keys(conversation_id, user_id):
+    slots = getattr(settings, 'MESSAGING_PRESENCE_SLOTS', 8)
+    return [PRESENCE_KEY.format(conversation_id, user_id, slot) for slot in range(slots)]
+
+
+def _claim(keys, channel_name):
+    """Take the first free slot, returns its key or None when all are taken"""
+    for key in keys:
+        if cache.add(key, channel_name, presence_ttl()):
+            return key
+    return None
+
+
+def connect(conversation_id, user_id, channel_name):
+    """Register a socket, returns True if the user just came online"""
+    keys = _slot_keys(conversation_id, user_id)
+    came_online = not cache.get_many(keys)
+    _claim(keys, channel_name)
+    return came_online
+
+
+def heartbeat(conversation_id, user_id, channel_name):
+    """Extend a socket's presence by another TTL"""
+    keys = _slot_keys(conversation_id, user_id)
+    for key, channel in cache.get_many(keys).items():
+        if channel == channel_name and cache.touch(key, presence_ttl()):
+            return
+    _claim(keys, channel_name)
+
+
+def disconnect(conversation_id, user_id, channel_name):
+    """Remove a socket, returns True if the user has no live sockets left"""
+    keys = _slot_keys(conversation_id, user_id)
+    for key, channel in cache.get_many(keys).items():
+        if channel == channel_name:
+            cache.delete(key)
+    return not cache.get_many(keys)
+
+
+def online_users(conversation_ids):
+    """{conversation_id: set of online participant ids}, one cache round trip for all"""
+    keys = {}
+    for conversation_id in conversation_ids:
+        for user_id in get_participant_ids(conversation_id):
+            for key in _slot_keys(conversation_id, user_id):
+                keys[key] = (int(conversation_id), user_id)
+
+    online = {int(conversation_id): set() for conversation_id in conversation_ids}
+    for key in cache.get_many(list(keys)):
+        conversation_id, user_id = keys[key]
+        online[conversation_id].add(user_id)
+    return online
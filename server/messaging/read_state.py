@@ -0,0 +1,245 @@
+"""
+Per-participant read state for conversations.
+
+Every (conversation, participant) pair has a ConversationReadTime row holding
+a read watermark (the highest message id the participant has read) and the
+number of unread messages from other participants. A message is read when
+its id is at or below the watermark, so marking a conversation read is a
+single UPDATE and is-read checks are integer comparisons instead of one
+MessageReadStatus row per message per reader.
+
+Counters are adjusted with single UPDATE statements when messages are
+created, read or deleted, so badges, stats and conversation lists read
+stored values instead of scanning message history.
+"""
+from collections import Counter
+
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Conversation, ConversationReadTime, Message, MessageReadStatus
+
+
+def _unread_after(watermark):
+    """
+    Correlated COUNT of messages above ``watermark`` from other participants,
+    soft-deleted ones excluded, for use in ConversationReadTime updates.
+    ``watermark`` is an int or an expression over the row being updated.
+    """
+    return Coalesce(
+        Subquery(
+            Message.objects.filter(
+                conversation_id=OuterRef('conversation_id'),
+                id__gt=watermark,
+                is_deleted=False
+            ).exclude(
+                sender_id=OuterRef('user_id')
+            ).order_by().values('conversation_id').annotate(total=Count('id')).values('total'),
+            output_field=IntegerField()
+        ),
+        Value(0)
+    )
+
+
+def ensure_read_states(conversation_id, user_ids):
+    """Create missing read state rows; new participants start with nothing read"""
+    existing = set(
+        ConversationReadTime.objects.filter(
+            conversation_id=conversation_id, user_id__in=user_ids
+        ).values_list('user_id', flat=True)
+    )
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if not missing:
+        return
+
+    ConversationReadTime.objects.bulk_create([
+        ConversationReadTime(conversation_id=conversation_id, user_id=user_id)
+        for user_id in missing
+    ], ignore_conflicts=True)
+    recount_unread(conversation_id, missing)
+
+
+def recount_unread(conversation_id, user_ids=None):
+    """Recompute counters from the watermarks in a single UPDATE"""
+    states = ConversationReadTime.objects.filter(conversation_id=conversation_id)
+    if user_ids is not None:
+        states = states.filter(user_id__in=user_ids)
+    return states.update(unread_count=_unread_after(OuterRef('last_read_message_id')))
+
+
+def message_created(message):
+    """A new message is unread for every participant except its sender"""
+    messages_created(message.conversation_id, [message])
+
+
+def messages_created(conversation_id, messages):
+    """Counters for new messages of one conversation, one UPDATE per sender"""
+    for sender_id, count in Counter(message.sender_id for message in messages).items():
+        ConversationReadTime.objects.filter(
+            conversation_id=conversation_id
+        ).exclude(user_id=sender_id).update(unread_count=F('unread_count') + count)
+
+
+def message_deleted(message):
+    """Remove a deleted or soft-deleted message from the counters of users who had not read it"""
+    ConversationReadTime.objects.filter(
+        conversation_id=message.conversation_id,
+        last_read_message_id__lt=message.id,
+        unread_count__gt=0
+    ).exclude(user_id=message.sender_id).update(unread_count=F('unread_count') - 1)
+
+
+def _read_state(conversation_id, user):
+    ensure_read_states(conversation_id, [user.id])
+    return ConversationReadTime.objects.filter(conversation_id=conversation_id, user=user)
+
+
+def mark_conversation_read(conversation, user):
+    """
+    Move the watermark to the latest message and reset the counter in one
+    UPDATE. Returns the number of messages that became read.
+    """
+    state = _read_state(conversation.id, user)
+    previously_unread = state.values_list('unread_count', flat=True).first() or 0
+    latest_id = Subquery(
+        Message.objects.filter(conversation_id=OuterRef('conversation_id')).order_by().values(
+            'conversation_id'
+        ).annotate(latest=Max('id')).values('latest')
+    )
+    state.update(
+        last_read_message_id=Coalesce(latest_id, F('last_read_message_id')),
+        unread_count=0,
+        last_read_at=timezone.now(),
+    )
+    return previously_unread
+
+
+def _group_by_conversation(messages):
+    """{conversation_id: (lowest id, highest id, [(id, sender_id), ...])}"""
+    grouped = {}
+    for message_id, conversation_id, sender_id in messages.values_list('id', 'conversation_id', 'sender_id'):
+        grouped.setdefault(conversation_id, []).append((message_id, sender_id))
+    return {
+        conversation_id: (min(rows)[0], max(rows)[0], rows)
+        for conversation_id, rows in grouped.items()
+    }
+
+
+def mark_messages_read(user, messages):
+    """
+    Read everything up to the newest of ``messages`` in each of their
+    conversations. Returns the number of given messages that became read.
+    """
+    marked = 0
+    for conversation_id, (_, highest, rows) in _group_by_conversation(messages).items():
+        state = _read_state(conversation_id, user)
+        watermark = state.values_list('last_read_message_id', flat=True).first() or 0
+        if highest <= watermark:
+            continue
+        marked += sum(1 for message_id, sender_id in rows if message_id > watermark and sender_id != user.id)
+        state.filter(last_read_message_id__lt=highest).update(
+            last_read_message_id=highest,
+            unread_count=_unread_after(highest),
+            last_read_at=timezone.now(),
+        )
+    return marked
+
+
+def mark_messages_unread(user, messages):
+    """
+    Move the watermark back to just before the oldest of ``messages`` in each
+    of their conversations. Returns the number of given messages that became
+    unread.
+    """
+    unmarked = 0
+    for conversation_id, (lowest, _, rows) in _group_by_conversation(messages).items():
+        state = _read_state(conversation_id, user)
+        watermark = state.values_list('last_read_message_id', flat=True).first() or 0
+        if lowest > watermark:
+            continue
+        unmarked += sum(1 for message_id, sender_id in rows if message_id <= watermark and sender_id != user.id)
+        state.update(
+            last_read_message_id=lowest - 1,
+            unread_count=_unread_after(lowest - 1),
+        )
+    return unmarked
+
+
+def is_read(message, user, watermark):
+    """Whether ``user`` has read a message of someone else, given their watermark"""
+    return message.sender_id != user.id and message.id <= (watermark or 0)
+
+
+def get_read_watermark(conversation_id, user_id):
+    return ConversationReadTime.objects.filter(
+        conversation_id=conversation_id, user_id=user_id
+    ).values_list('last_read_message_id', flat=True).first() or 0
+
+
+def get_unread_count(conversation_id, user_id):
+    ensure_read_states(conversation_id, [user_id])
+    return ConversationReadTime.objects.filter(
+        conversation_id=conversation_id, user_id=user_id
+    ).values_list('unread_count', flat=True).first() or 0
+
+
+def with_read_state(queryset, user):
+    """Annotate conversations with ``user_unread_count`` and ``user_last_read_message_id``"""
+    states = ConversationReadTime.objects.filter(conversation_id=OuterRef('pk'), user=user)
+    return queryset.annotate(
+        user_unread_count=Coalesce(Subquery(states.values('unread_count')[:1]), Value(0)),
+        user_last_read_message_id=Coalesce(Subquery(states.values('last_read_message_id')[:1]), Value(0)),
+    )
+
+
+def unread_filter(user, has_unread=True):
+    """Q object for conversations with (or without) unread messages for ``user``"""
+    unread_ids = ConversationReadTime.objects.filter(
+        user=user, unread_count__gt=0
+    ).values('conversation_id')
+    return Q(pk__in=unread_ids) if has_unread else ~Q(pk__in=unread_ids)
+
+
+def unread_totals(user):
+    """(conversations with unread messages, total unread messages) for ``user``"""
+    totals = ConversationReadTime.objects.filter(user=user, unread_count__gt=0).aggregate(
+        conversations=Count('id'),
+        messages=Sum('unread_count'),
+    )
+    return totals['conversations'], totals['messages'] or 0
+
+
+def watermarks_from_read_statuses(prune=False):
+    """
+    Raise every watermark to the newest message its user has a legacy
+    MessageReadStatus row for, then optionally delete those rows.
+    Returns (watermarks raised, read status rows deleted).
+    """
+    latest_read = Subquery(
+        MessageReadStatus.objects.filter(
+            user_id=OuterRef('user_id'),
+            message__conversation_id=OuterRef('conversation_id')
+        ).order_by().values('user_id').annotate(latest=Max('message_id')).values('latest')
+    )
+    raised = ConversationReadTime.objects.filter(
+        last_read_message_id__lt=Coalesce(latest_read, Value(0))
+    ).update(last_read_message_id=latest_read)
+
+    deleted = MessageReadStatus.objects.all().delete()[0] if prune else 0
+    return raised, deleted
+
+
+def rebuild_read_states(conversation_ids=None):
+    """Create missing rows and recompute every counter, returns rows touched"""
+    conversations = Conversation.objects.all()
+    if conversation_ids:
+        conversations = conversations.filter(id__in=conversation_ids)
+
+    through = Conversation.participants.through
+    total = 0
+    for conversation_id in conversations.values_list('id', flat=True).iterator():
+        user_ids = list(through.objects.filter(conversation_id=conversation_id).values_list('user_id', flat=True))
+        ensure_read_states(conversation_id, user_ids)
+        total += recount_unread(conversation_id)
+    return total
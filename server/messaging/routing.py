@@ -2,6 +2,9 @@ from django.urls import re_path
 from . import consumers
 
 websocket_urlpatterns = [
+    # One socket per user for every conversation and notification
+    re_path(r'^ws/$', consumers.MultiplexConsumer.as_asgi()),
+    # Single conversation and notification-only sockets
     re_path(r'^ws/chat/(?P<conversation_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
     re_path(r'^ws/notifications/$', consumers.NotificationConsumer.as_asgi()),
 ] 
\ No newline at end of file
@@ -1,7 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.db.models import Q
-from .models import Conversation, Message, MessageReadStatus, MessageAttachment, MessageReaction
+from file_management.models import UploadSession
+from file_management.serializers import MediaVariantsField
+from file_management.uploads import UploadError, commit_upload, lock_sessions
+from .models import Conversation, Message, MessageAttachment, MessageReaction
+from .read_state import get_read_watermark, is_read as message_is_read
 import os
 
 User = get_user_model()
@@ -22,13 +27,14 @@ class MessageAttachmentSerializer(serializers.ModelSerializer):
     """Serializer لمرفقات الرسائل"""
     file_url = serializers.SerializerMethodField()
     file_size_formatted = serializers.CharField(read_only=True)
+    variants = MediaVariantsField()
     
     class Meta:
         model = MessageAttachment
         fields = [
             'id', 'file', 'file_url', 'original_filename', 'file_size', 
             'file_size_formatted', 'file_type', 'mime_type', 'width', 
-            'height', 'duration', 'thumbnail', 'created_at'
+            'height', 'duration', 'thumbnail', 'variants', 'created_at'
         ]
         read_only_fields = ['id', 'file_size', 'file_size_formatted', 'created_at']
     
@@ -72,10 +78,11 @@ class MessageSerializer(serializers.ModelSerializer):
         """Check if message is read by current user"""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return MessageReadStatus.objects.filter(
-                user=request.user,
-                message=obj
-            ).exists()
+            # One watermark lookup per conversation, shared across the list
+            watermarks = self.context.setdefault('read_watermarks', {})
+            if obj.conversation_id not in watermarks:
+                watermarks[obj.conversation_id] = get_read_watermark(obj.conversation_id, request.user.id)
+            return message_is_read(obj, request.user, watermarks[obj.conversation_id])
         return False
     
     def get_attachments(self, obj):
@@ -166,11 +173,17 @@ class MessageCreateSerializer(serializers.ModelSerializer):
         required=False,
         max_length=5  # Maximum 5 attachments per message
     )
+    # Complete chunked uploads (file_management.uploads) to attach
+    upload_ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        max_length=5
+    )
     reply_to_id = serializers.IntegerField(required=False)
     
     class Meta:
         model = Message
-        fields = ['content', 'message_type', 'attachments', 'reply_to_id']
+        fields = ['content', 'message_type', 'attachments', 'upload_ids', 'reply_to_id']
     
     def validate_content(self, value):
         """Validate message content"""
@@ -189,20 +202,30 @@ class MessageCreateSerializer(serializers.ModelSerializer):
             if total_size > 50 * 1024 * 1024:  # 50MB total limit
                 raise serializers.ValidationError("Total file size cannot exceed 50MB")
             
-            allowed_types = [
-                'image/jpeg', 'image/png', 'image/gif', 'image/webp',
-                'application/pdf', 'application/msword',
-                'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                'text/plain', 'video/mp4', 'video/avi', 'video/mov',
-                'audio/mpeg', 'audio/wav', 'audio/mp3'
-            ]
-            
             for file in value:
-                if file.content_type not in allowed_types:
+                if file.content_type not in MessageAttachment.ALLOWED_MIME_TYPES:
                     raise serializers.ValidationError(f"File type {file.content_type} not allowed")
         
         return value
     
+    def validate_upload_ids(self, value):
+        """Resolve upload ids to the user's complete attachment uploads"""
+        sessions = {
+            session.upload_id: session
+            for session in UploadSession.objects.filter(
+                upload_id__in=value,
+                uploaded_by=self.context['request'].user,
+                target='message_attachment'
+            )
+        }
+        for upload_id in value:
+            session = sessions.get(upload_id)
+            if session is None:
+                raise serializers.ValidationError(f"Upload {upload_id} not found")
+            if not session.is_complete:
+                raise serializers.ValidationError(f"Upload {upload_id} is incomplete")
+        return [sessions[upload_id] for upload_id in dict.fromkeys(value)]
+    
     def validate_reply_to_id(self, value):
         """Validate reply message exists and belongs to same conversation"""
         if value:
@@ -220,7 +243,7 @@ class MessageCreateSerializer(serializers.ModelSerializer):
     def validate(self, data):
         """Validate that either content or attachments are provided"""
         content = data.get('content', '').strip()
-        attachments = data.get('attachments', [])
+        attachments = data.get('attachments', []) or data.get('upload_ids', [])
         
         if not content and not attachments:
             raise serializers.ValidationError("Either message content or attachments must be provided")
@@ -229,6 +252,7 @@ class MessageCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         attachments = validated_data.pop('attachments', [])
+        uploads = validated_data.pop('upload_ids', [])
         reply_to_id = validated_data.pop('reply_to_id', None)
         
         # Set conversation and sender from context
@@ -239,19 +263,27 @@ class MessageCreateSerializer(serializers.ModelSerializer):
         if reply_to_id:
             validated_data['reply_to_id'] = reply_to_id
         
-        # Create message
-        message = super().create(validated_data)
-        
-        # Create attachments
-        for file in attachments:
-            MessageAttachment.objects.create(
-                message=message,
-                file=file,
-                original_filename=file.name,
-                file_size=file.size,
-                file_type=self._get_file_type(file.content_type),
-                mime_type=file.content_type
-            )
+        # The message only exists with all of its attachments
+        try:
+            with transaction.atomic():
+                uploads = lock_sessions(uploads)
+                message = super().create(validated_data)
+                
+                # Create attachments
+                for file in attachments:
+                    MessageAttachment.objects.create(
+                        message=message,
+                        file=file,
+                        original_filename=file.name,
+                        file_size=file.size,
+                        file_type=self._get_file_type(file.content_type),
+                        mime_type=file.content_type
+                    )
+                
+                for session in uploads:
+                    commit_upload(session, message=message)
+        except UploadError as e:
+            raise serializers.ValidationError({'upload_ids': e.message})
         
         return message
     
@@ -304,10 +336,11 @@ class ConversationSerializer(serializers.ModelSerializer):
             request = self.context.get('request')
             is_read = False
             if request and request.user.is_authenticated:
-                is_read = MessageReadStatus.objects.filter(
-                    user=request.user,
-                    message=last_message
-                ).exists()
+                # Watermark annotated by the list views
+                watermark = getattr(obj, 'user_last_read_message_id', None)
+                if watermark is None:
+                    watermark = get_read_watermark(obj.id, request.user.id)
+                is_read = message_is_read(last_message, request.user, watermark)
             
             return {
                 'id': last_message.id,
@@ -325,15 +358,10 @@ class ConversationSerializer(serializers.ModelSerializer):
         """Get unread messages count for current user"""
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            # Get messages that are not read by current user and not sent by current user
-            read_message_ids = MessageReadStatus.objects.filter(
-                user=request.user,
-                message__conversation=obj
-            ).values_list('message_id', flat=True)
-            
-            return obj.messages.exclude(
-                id__in=read_message_ids
-            ).exclude(sender=request.user).count()
+            # Stored per-participant counter, annotated by the list views
+            if hasattr(obj, 'user_unread_count'):
+                return obj.user_unread_count
+            return obj.get_unread_count(request.user)
         return 0
     
     def get_other_participant(self, obj):
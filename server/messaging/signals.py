@@ -0,0 +1,72 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import membership
+from .models import Conversation, ConversationReadTime, Message
+from .read_state import ensure_read_states, message_created, message_deleted
+
+
+@receiver(post_save, sender=Message)
+def count_new_message(sender, instance, created, raw=False, **kwargs):
+    """Increment the unread counters of the other participants"""
+    if created and not raw:
+        message_created(instance)
+
+
+@receiver(post_save, sender=Message)
+def touch_conversation(sender, instance, created, raw=False, **kwargs):
+    """Keep the stored last message fields that order the conversation list"""
+    if created and not raw:
+        Conversation.touch(instance.conversation_id, instance)
+
+
+@receiver(post_save, sender=Message)
+def uncount_soft_deleted_message(sender, instance, created, raw=False, **kwargs):
+    """Soft deletes (is_deleted set on save) leave the counters like a delete"""
+    if raw:
+        return
+    if not created and instance.is_deleted and instance._loaded_is_deleted is False:
+        message_deleted(instance)
+    instance._loaded_is_deleted = instance.is_deleted
+
+
+@receiver(pre_delete, sender=Message)
+def uncount_deleted_message(sender, instance, **kwargs):
+    """Drop the message from the counters of participants who had not read it"""
+    # Soft-deleted messages were already dropped
+    if not instance.is_deleted:
+        message_deleted(instance)
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def sync_participant_read_states(sender, instance, action, reverse, pk_set, **kwargs):
+    """Create read state rows for new participants and drop them for removed ones"""
+    if reverse or action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_add':
+        ensure_read_states(instance.pk, list(pk_set))
+    elif action == 'post_remove':
+        ConversationReadTime.objects.filter(conversation_id=instance.pk, user_id__in=pk_set).delete()
+    else:
+        ConversationReadTime.objects.filter(conversation_id=instance.pk).delete()
+
+
+@receiver(m2m_changed, sender=Conversation.participants.through)
+def invalidate_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop cached participant lists when membership changes from either side"""
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if not reverse:
+        membership.invalidate(instance.pk)
+    elif action == 'pre_clear':
+        # pk_set is not provided for clear, collect the user's conversations first
+        for conversation_id in instance.conversations.values_list('id', flat=True):
+            membership.invalidate(conversation_id)
+    else:
+        for conversation_id in pk_set or ():
+            membership.invalidate(conversation_id)
+
+
+@receiver(post_delete, sender=Conversation)
+def invalidate_deleted_conversation(sender, instance, **kwargs):
+    membership.invalidate(instance.pk)
@@ -1,3 +1,417 @@
-from django.test import TestCase
+import asyncio
+import json
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from search.models import SearchDocument
+from . import presence
+from .membership import is_participant
+from .models import Conversation, ConversationReadTime, Message, MessageReadStatus
+from .consumers import ChatConsumer, MultiplexConsumer
+from .pipeline import MessageWritePipeline
+from .read_state import rebuild_read_states, watermarks_from_read_statuses
+
+User = get_user_model()
+
+
+class UnreadCounterTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.professional_user = User.objects.create_user(
+            username='professional1',
+            email='professional1@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.client_user, self.professional_user)
+
+    def send(self, sender, content='Hello'):
+        return Message.objects.create(conversation=self.conversation, sender=sender, content=content)
+
+    def unread(self, user):
+        return ConversationReadTime.objects.get(conversation=self.conversation, user=user).unread_count
+
+    def test_counters_follow_messages_reads_and_deletes(self):
+        """Counters change on create, read, unread and delete"""
+        first = self.send(self.client_user)
+        self.send(self.client_user)
+        self.send(self.professional_user)
+        self.assertEqual(self.unread(self.professional_user), 2)
+        self.assertEqual(self.unread(self.client_user), 1)
+
+        first.delete()
+        self.assertEqual(self.unread(self.professional_user), 1)
+
+        # Soft delete, as the chat consumer does, on a freshly loaded row
+        soft = Message.objects.get(pk=self.send(self.client_user).pk)
+        self.assertEqual(self.unread(self.professional_user), 2)
+        soft.is_deleted = True
+        soft.save()
+        soft.save()
+        self.assertEqual(self.unread(self.professional_user), 1)
+        soft.delete()
+        self.assertEqual(self.unread(self.professional_user), 1)
+        rebuild_read_states()
+        self.assertEqual(self.unread(self.professional_user), 1)
+
+        self.client.force_login(self.professional_user)
+        response = self.client.post(f'/api/messages/conversations/{self.conversation.id}/mark-read/')
+        self.assertEqual(response.json()['updated_count'], 1)
+        self.assertEqual(self.unread(self.professional_user), 0)
+
+        message = self.send(self.client_user)
+        self.client.post('/api/messages/messages/bulk-action/', {
+            'message_ids': [message.id], 'action': 'mark_read'
+        }, content_type='application/json')
+        self.assertEqual(self.unread(self.professional_user), 0)
+        self.client.post('/api/messages/messages/bulk-action/', {
+            'message_ids': [message.id], 'action': 'mark_unread'
+        }, content_type='application/json')
+        self.assertEqual(self.unread(self.professional_user), 1)
+
+        state = ConversationReadTime.objects.get(conversation=self.conversation, user=self.professional_user)
+        state.unread_count = 99
+        state.save()
+        rebuild_read_states()
+        self.assertEqual(self.unread(self.professional_user), 1)
+
+    def test_stats_and_lists_read_stored_counters(self):
+        """Stats, search and list endpoints return the stored values"""
+        for _ in range(3):
+            self.send(self.client_user)
+        other = Conversation.objects.create()
+        other.participants.add(self.client_user, self.professional_user)
+        self.client.force_login(self.professional_user)
+
+        with self.assertNumQueries(7):
+            response = self.client.get('/api/messages/conversations/stats/')
+        self.assertEqual(response.json()['unread_conversations'], 1)
+        self.assertEqual(response.json()['unread_messages'], 3)
+
+        response = self.client.get('/api/messages/conversations/search/', {'has_unread': 'true'})
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.conversation.id])
+        self.assertEqual(response.json()['results'][0]['unread_count'], 3)
+
+        response = self.client.get('/api/messages/conversations/')
+        counts = {item['id']: item['unread_count'] for item in response.json()['results']}
+        self.assertEqual(counts, {self.conversation.id: 3, other.id: 0})
+
+        response = self.client.get(f'/api/messages/conversations/{self.conversation.id}/messages/')
+        self.assertEqual([item['is_read'] for item in response.json()['results']], [False] * 3)
+
+    def test_reads_move_a_watermark(self):
+        """Marking read is one UPDATE on the watermark, no per-message rows"""
+        messages = [self.send(self.client_user) for _ in range(4)]
+        self.client.force_login(self.professional_user)
+
+        with self.assertNumQueries(6):
+            response = self.client.post(f'/api/messages/conversations/{self.conversation.id}/mark-read/')
+        self.assertEqual(response.json()['updated_count'], 4)
+        self.assertFalse(MessageReadStatus.objects.exists())
+        state = ConversationReadTime.objects.get(conversation=self.conversation, user=self.professional_user)
+        self.assertEqual(state.last_read_message_id, messages[-1].id)
+
+        self.client.post('/api/messages/messages/bulk-action/', {
+            'message_ids': [messages[2].id], 'action': 'mark_unread'
+        }, content_type='application/json')
+        self.assertEqual(self.unread(self.professional_user), 2)
+        response = self.client.get(f'/api/messages/conversations/{self.conversation.id}/messages/')
+        read = {item['id']: item['is_read'] for item in response.json()['results']}
+        self.assertEqual(read, {messages[0].id: True, messages[1].id: True, messages[2].id: False, messages[3].id: False})
+
+    def test_legacy_read_statuses_fold_into_watermarks(self):
+        """Existing per-message rows raise the watermark and can be pruned"""
+        messages = [self.send(self.client_user) for _ in range(3)]
+        MessageReadStatus.objects.create(user=self.professional_user, message=messages[1])
+
+        self.assertEqual(watermarks_from_read_statuses(prune=True), (1, 1))
+        rebuild_read_states()
+        self.assertEqual(self.unread(self.professional_user), 1)
+        self.assertFalse(MessageReadStatus.objects.exists())
+
+    def test_read_status_migration_counts_like_the_runtime(self):
+        """The 0003 backfill raises watermarks and leaves soft-deleted messages uncounted"""
+        from django.apps import apps
+        migration = import_module('messaging.migrations.0003_read_watermarks')
+
+        messages = [self.send(self.client_user) for _ in range(4)]
+        MessageReadStatus.objects.create(user=self.professional_user, message=messages[0])
+        Message.objects.filter(pk=messages[3].pk).update(is_deleted=True)
+        ConversationReadTime.objects.update(unread_count=99)
+
+        with self.assertNumQueries(2):
+            migration.fold_read_statuses(apps, None)
+        state = ConversationReadTime.objects.get(conversation=self.conversation, user=self.professional_user)
+        self.assertEqual((state.last_read_message_id, state.unread_count), (messages[0].id, 2))
+        self.assertEqual(self.unread(self.client_user), 0)
+
+    def test_keyset_pagination(self):
+        """Message history and conversation lists page by id without COUNT or OFFSET"""
+        messages = [self.send(self.client_user, f'Message {i}') for i in range(5)]
+        self.client.force_login(self.professional_user)
+        url = f'/api/messages/conversations/{self.conversation.id}/messages/'
+
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual([item['id'] for item in response.json()['results']], [messages[4].id, messages[3].id])
+        self.assertIsNone(response.json()['previous'])
+
+        response = self.client.get(url, {'page_size': 2, 'before': messages[3].id})
+        self.assertEqual([item['id'] for item in response.json()['results']], [messages[2].id, messages[1].id])
+        self.assertIn(f'before={messages[1].id}', response.json()['next'])
+        self.assertIn(f'after={messages[2].id}', response.json()['previous'])
+
+        response = self.client.get(url, {'page_size': 2, 'after': messages[1].id})
+        self.assertEqual([item['id'] for item in response.json()['results']], [messages[3].id, messages[2].id])
+
+        response = self.client.get(url, {'before': messages[0].id})
+        self.assertEqual(response.json()['results'], [])
+        self.assertIsNone(response.json()['next'])
+
+        other = Conversation.objects.create()
+        other.participants.add(self.client_user, self.professional_user)
+        response = self.client.get('/api/messages/conversations/')
+        self.assertEqual([item['id'] for item in response.json()['results']], [other.id, self.conversation.id])
+        Message.objects.create(conversation=self.conversation, sender=self.client_user, content='Newest')
+        response = self.client.get('/api/messages/conversations/', {'page_size': 1})
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.conversation.id])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual([item['id'] for item in response.json()['results']], [other.id])
+
+    def test_sent_message_moves_the_conversation_to_the_top(self):
+        """send_message keeps the last message fields Conversation.touch sets"""
+        other = Conversation.objects.create()
+        other.participants.add(self.client_user, self.professional_user)
+        self.client.force_login(self.client_user)
+
+        response = self.client.post('/api/messages/send/', {
+            'conversation_id': self.conversation.id,
+            'message': 'Are you free on Monday?'
+        })
+        self.assertEqual(response.status_code, 201)
+
+        message = Message.objects.get(conversation=self.conversation)
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message, 'Are you free on Monday?')
+        self.assertEqual(self.conversation.last_message_at, message.created_at)
+        self.assertEqual(self.conversation.last_message_sender, self.client_user)
+        response = self.client.get('/api/messages/conversations/')
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.conversation.id, other.id])
+
+    def test_membership_checks_are_cached_and_invalidated(self):
+        """Participant checks hit the cache until membership changes"""
+        outsider = User.objects.create_user(
+            username='outsider',
+            email='outsider@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.assertTrue(is_participant(self.conversation.id, self.client_user.id))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_participant(self.conversation.id, self.professional_user.id))
+            self.assertFalse(is_participant(self.conversation.id, outsider.id))
+
+        self.conversation.participants.add(outsider)
+        self.assertTrue(is_participant(self.conversation.id, outsider.id))
+        outsider.conversations.clear()
+        self.assertFalse(is_participant(self.conversation.id, outsider.id))
+
+        self.client.force_login(outsider)
+        response = self.client.post(f'/api/messages/conversations/{self.conversation.id}/read/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_presence_registry(self):
+        """Only the first and last socket of a user change presence"""
+        conversation_id = self.conversation.id
+        self.assertTrue(presence.connect(conversation_id, self.client_user.id, 'socket-a'))
+        self.assertFalse(presence.connect(conversation_id, self.client_user.id, 'socket-b'))
+        self.assertEqual(presence.online_users([conversation_id]), {conversation_id: {self.client_user.id}})
+
+        self.assertFalse(presence.disconnect(conversation_id, self.client_user.id, 'socket-a'))
+        self.assertTrue(presence.disconnect(conversation_id, self.client_user.id, 'socket-b'))
+        self.assertEqual(presence.online_users([conversation_id]), {conversation_id: set()})
+
+        with self.settings(MESSAGING_PRESENCE_TTL=-1):
+            presence.connect(conversation_id, self.professional_user.id, 'socket-c')
+        self.assertEqual(presence.online_users([conversation_id]), {conversation_id: set()})
+
+        presence.connect(conversation_id, self.professional_user.id, 'socket-d')
+        other = Conversation.objects.create()
+        self.client.force_login(self.client_user)
+        response = self.client.get('/api/messages/conversations/presence/', {
+            'conversations': f'{conversation_id},{other.id}'
+        })
+        self.assertEqual(response.json()['online'], {str(conversation_id): [self.professional_user.id]})
+        presence.disconnect(conversation_id, self.professional_user.id, 'socket-d')
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatConsumerTest(TransactionTestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.professional_user = User.objects.create_user(
+            username='professional1',
+            email='professional1@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.client_user, self.professional_user)
+
+    def test_burst_is_persisted_as_one_batch_and_broadcast_in_order(self):
+        """Concurrent sends share one flush, counters and last message are updated once"""
+        pipeline = MessageWritePipeline(delay=0.01)
+        group = f'chat_{self.conversation.id}'
+
+        async def send_burst():
+            channel_layer = get_channel_layer()
+            channel = await channel_layer.new_channel()
+            await channel_layer.group_add(group, channel)
+            results = await asyncio.gather(*[
+                pipeline.submit(str(self.conversation.id), sender, f'Message {i}')
+                for i, sender in enumerate([self.client_user, self.client_user, self.professional_user])
+            ])
+            received = [(await channel_layer.receive(channel))['message']['content'] for _ in results]
+            return results, received
+
+        results, received = async_to_sync(send_burst)()
+
+        self.assertEqual([data['content'] for data in results], ['Message 0', 'Message 1', 'Message 2'])
+        self.assertEqual(received, ['Message 0', 'Message 1', 'Message 2'])
+        self.assertEqual(Message.objects.filter(conversation=self.conversation).count(), 3)
+
+        unread = dict(ConversationReadTime.objects.filter(
+            conversation=self.conversation
+        ).values_list('user_id', 'unread_count'))
+        self.assertEqual(unread, {self.client_user.id: 1, self.professional_user.id: 2})
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.last_message, 'Message 2')
+        self.assertEqual(self.conversation.last_message_sender, self.professional_user)
+        self.assertEqual(SearchDocument.objects.filter(doc_type='message').count(), 3)
+
+    def test_failed_broadcast_still_answers_the_sender(self):
+        """A message is saved once group_send fails, the sender gets its data back"""
+        pipeline = MessageWritePipeline(delay=0.01)
+        channel_layer = get_channel_layer()
+
+        with mock.patch.object(channel_layer, 'group_send', side_effect=RuntimeError('layer down')), \
+                self.assertLogs('messaging.pipeline', 'ERROR'):
+            data = async_to_sync(pipeline.submit)(str(self.conversation.id), self.client_user, 'Hello')
+
+        self.assertEqual(data['content'], 'Hello')
+        self.assertEqual(Message.objects.filter(conversation=self.conversation).count(), 1)
+
+    def test_presence_and_typing_are_debounced(self):
+        """A second socket of a user and repeated typing_start events are not broadcast"""
+        async def session():
+            def socket(user):
+                return ApplicationCommunicator(ChatConsumer.as_asgi(), {
+                    'type': 'websocket',
+                    'path': f'/ws/chat/{self.conversation.id}/',
+                    'user': user,
+                    'url_route': {'kwargs': {'conversation_id': str(self.conversation.id)}},
+                })
+
+            async def receive(communicator):
+                return json.loads((await communicator.receive_output(1))['text'])
+
+            async def send(communicator, event_type):
+                await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps({'type': event_type})})
+
+            watcher = socket(self.professional_user)
+            first, second = socket(self.client_user), socket(self.client_user)
+            for communicator in (watcher, first, second):
+                await communicator.send_input({'type': 'websocket.connect'})
+                self.assertEqual((await communicator.receive_output(1))['type'], 'websocket.accept')
+
+            events = [await receive(watcher)]
+            await send(first, 'typing_start')
+            await send(first, 'typing_start')
+            await send(first, 'typing_stop')
+            events += [await receive(watcher), await receive(watcher)]
+            for communicator in (second, first):
+                await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+                await communicator.wait(1)
+            events.append(await receive(watcher))
+            self.assertTrue(await watcher.receive_nothing())
+            await watcher.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await watcher.wait(1)
+            return events
+
+        events = async_to_sync(session)()
+        self.assertEqual([(event['type'], event.get('is_typing')) for event in events], [
+            ('user_connected', None),
+            ('typing_indicator', True),
+            ('typing_indicator', False),
+            ('user_disconnected', None),
+        ])
+
+    def test_multiplexed_socket_subscribes_to_many_conversations(self):
+        """One socket receives framed events for each subscribed conversation and its notifications"""
+        second = Conversation.objects.create()
+        second.participants.add(self.client_user, self.professional_user)
+        foreign = Conversation.objects.create()
+
+        async def session():
+            multiplexed = ApplicationCommunicator(MultiplexConsumer.as_asgi(), {
+                'type': 'websocket', 'path': '/ws/', 'user': self.client_user,
+            })
+
+            async def send(frame):
+                await multiplexed.send_input({'type': 'websocket.receive', 'text': json.dumps(frame)})
+
+            async def receive():
+                return json.loads((await multiplexed.receive_output(1))['text'])
+
+            await multiplexed.send_input({'type': 'websocket.connect'})
+            self.assertEqual((await multiplexed.receive_output(1))['type'], 'websocket.accept')
+
+            frames = []
+            await send({'type': 'subscribe', 'conversation_ids': [self.conversation.id, second.id, foreign.id]})
+            frames.append(await receive())
+            await send({'type': 'send_message', 'conversation_id': str(second.id), 'content': 'Hello'})
+            frames.append(await receive())
+            await send({'type': 'unsubscribe', 'conversation_ids': [second.id]})
+            frames.append(await receive())
+            await send({'type': 'typing_start', 'conversation_id': second.id})
+            frames.append(await receive())
+            await get_channel_layer().group_send(
+                f'notifications_{self.client_user.id}',
+                {'type': 'send_notification', 'notification': {'id': 1}}
+            )
+            frames.append(await receive())
+
+            await multiplexed.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await multiplexed.wait(1)
+            return frames
+
+        subscribed, message, unsubscribed, error, notification = async_to_sync(session)()
+        self.assertEqual(subscribed['conversation_ids'], [self.conversation.id, second.id])
+        self.assertEqual(subscribed['rejected'], [foreign.id])
+        self.assertEqual((message['type'], message['conversation_id']), ('new_message', second.id))
+        self.assertEqual(message['message']['content'], 'Hello')
+        self.assertEqual(unsubscribed['conversation_ids'], [second.id])
+        self.assertEqual(error['type'], 'error')
+        self.assertEqual(notification, {'type': 'notification', 'notification': {'id': 1}})
+        self.assertEqual(presence.online_users([self.conversation.id, second.id]), {
+            self.conversation.id: set(), second.id: set()
+        })
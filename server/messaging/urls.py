@@ -11,6 +11,7 @@ urlpatterns = [
     path('conversations/<int:conversation_id>/delete/', views.delete_conversation, name='delete_conversation'),
     path('conversations/search/', views.conversation_search, name='conversation_search'),
     path('conversations/stats/', views.conversation_stats, name='conversation_stats'),
+    path('conversations/presence/', views.conversation_presence, name='conversation_presence'),
     
     # Messages
     path('conversations/<int:conversation_id>/messages/', views.MessageListView.as_view(), name='message_list'),
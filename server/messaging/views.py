@@ -1,17 +1,32 @@
+import logging
+
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q, Count, Max, Prefetch
+from django.db import transaction
+from django.db.models import Q, Count, Prefetch
+from django.db.models.functions import TruncDate
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import SearchFilter
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from .models import Conversation, Message, MessageReadStatus, ConversationReadTime, MessageReaction, MessageAttachment
+from file_management.models import UploadSession
+from file_management.serializers import UploadSessionSerializer
+from file_management.uploads import UploadError, commit_upload, lock_sessions, stage_file
+from search.index import matching
+from .read_state import (
+    mark_conversation_read, mark_messages_read, mark_messages_unread,
+    unread_filter, unread_totals, with_read_state
+)
+from .membership import is_participant
+from .models import Conversation, Message, MessageReaction, MessageAttachment
+from .pagination import ConversationPagination, MessagePagination
+from .presence import online_users
 from .serializers import (
     ConversationSerializer, ConversationDetailSerializer, ConversationCreateSerializer,
     MessageSerializer, MessageCreateSerializer, MessageResponseSerializer, ConversationStatsSerializer,
@@ -19,30 +34,34 @@ from .serializers import (
 )
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# Attachments sent as one multipart file, anything larger goes through
+# the chunked upload API (file_management.uploads)
+WHOLE_FILE_ATTACHMENT_MAX_SIZE = 10 * 1024 * 1024
 
 
 class ConversationListView(generics.ListAPIView):
     """قائمة المحادثات"""
     serializer_class = ConversationSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchFilter]
     search_fields = ['participants__first_name', 'participants__last_name', 'project__title']
-    ordering = ['-updated_at']
+    # Ordered by the stored last_message_at, see ConversationPagination
+    pagination_class = ConversationPagination
     
     def get_queryset(self):
         """Get user's conversations with optimized queries"""
-        return Conversation.objects.filter(
+        return with_read_state(Conversation.objects.filter(
             participants=self.request.user
-        ).select_related('project').prefetch_related(
+        ), self.request.user).select_related('project').prefetch_related(
             'participants',
             Prefetch(
                 'messages',
                 queryset=Message.objects.select_related('sender').order_by('-created_at')[:1],
                 to_attr='latest_message'
             )
-        ).annotate(
-            last_message_time=Max('messages__created_at')
-        ).order_by('-last_message_time')
+        )
     
     @extend_schema(
         operation_id="list_conversations",
@@ -83,20 +102,7 @@ class ConversationDetailView(generics.RetrieveAPIView):
         instance = self.get_object()
         
         # Mark messages as read for current user
-        unread_messages = Message.objects.filter(
-            conversation=instance
-        ).exclude(sender=request.user).exclude(
-            read_statuses__user=request.user
-        )
-        
-        # Create read status for unread messages
-        read_statuses_to_create = [
-            MessageReadStatus(user=request.user, message=message)
-            for message in unread_messages
-        ]
-        
-        if read_statuses_to_create:
-            MessageReadStatus.objects.bulk_create(read_statuses_to_create, ignore_conflicts=True)
+        mark_conversation_read(instance, request.user)
         
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
@@ -130,8 +136,8 @@ class MessageListView(generics.ListAPIView):
     """قائمة رسائل المحادثة"""
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [OrderingFilter]
-    ordering = ['-created_at']
+    # Newest first, ?before=/?after=<message id> for infinite scroll
+    pagination_class = MessagePagination
     
     def get_queryset(self):
         conversation_id = self.kwargs['conversation_id']
@@ -181,10 +187,10 @@ class MessageCreateView(generics.CreateAPIView):
         # Refetch message with related objects to avoid RelatedManager issues
         message = Message.objects.select_related('sender').prefetch_related('attachments', 'reactions').get(id=message.id)
         
-        # Update conversation timestamp
+        # Update conversation timestamp, the last message fields are set by Conversation.touch
         conversation = message.conversation
         conversation.updated_at = timezone.now()
-        conversation.save()
+        conversation.save(update_fields=['updated_at'])
         
         # Send real-time notification via WebSocket
         channel_layer = get_channel_layer()
@@ -220,6 +226,7 @@ class MessageCreateView(generics.CreateAPIView):
                 conversation_group_name,
                 {
                     'type': 'new_message',
+                    'conversation_id': conversation.id,
                     'message': message_data
                 }
             )
@@ -325,23 +332,8 @@ class MarkMessagesReadView(APIView):
                 participants=request.user
             )
             
-            # Get unread messages (not sent by user and not already read)
-            unread_messages = Message.objects.filter(
-                conversation=conversation
-            ).exclude(sender=request.user).exclude(
-                read_statuses__user=request.user
-            )
-            
-            # Create read status for unread messages
-            read_statuses_to_create = [
-                MessageReadStatus(user=request.user, message=message)
-                for message in unread_messages
-            ]
-            
-            created_count = 0
-            if read_statuses_to_create:
-                MessageReadStatus.objects.bulk_create(read_statuses_to_create, ignore_conflicts=True)
-                created_count = len(read_statuses_to_create)
+            # Mark unread messages (not sent by user and not already read)
+            created_count = mark_conversation_read(conversation, request.user)
             
             return Response({
                 'message': f'{created_count} messages marked as read',
@@ -383,25 +375,14 @@ class MessageBulkActionView(APIView):
             )
             
             if action == 'mark_read':
-                # Create read statuses for messages not already read by user
-                unread_messages = messages.exclude(read_statuses__user=request.user)
-                read_statuses_to_create = [
-                    MessageReadStatus(user=request.user, message=message)
-                    for message in unread_messages
-                ]
-                created_count = 0
-                if read_statuses_to_create:
-                    MessageReadStatus.objects.bulk_create(read_statuses_to_create, ignore_conflicts=True)
-                    created_count = len(read_statuses_to_create)
+                # Move the read watermark up to the newest selected message
+                created_count = mark_messages_read(request.user, messages)
                 message = f'{created_count} messages marked as read'
                 updated_count = created_count
                 
             elif action == 'mark_unread':
-                # Remove read statuses for messages
-                deleted_count = MessageReadStatus.objects.filter(
-                    user=request.user,
-                    message__in=messages
-                ).delete()[0]
+                # Move the read watermark back before the oldest selected message
+                deleted_count = mark_messages_unread(request.user, messages)
                 message = f'{deleted_count} messages marked as unread'
                 updated_count = deleted_count
                 
@@ -422,6 +403,45 @@ class MessageBulkActionView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@extend_schema(
+    operation_id="conversation_presence",
+    summary="Online Participants",
+    description="Online participants of several conversations in one call, from the presence registry",
+    tags=["Conversations"],
+    parameters=[
+        OpenApiParameter(
+            name="conversations",
+            description="Comma separated conversation ids (defaults to all of the user's conversations)",
+            required=False,
+            type=OpenApiTypes.STR
+        ),
+    ],
+    responses={200: {'type': 'object', 'properties': {'online': {'type': 'object'}}}}
+)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def conversation_presence(request):
+    """المستخدمون المتصلون في المحادثات"""
+    ids = request.query_params.get('conversations')
+    if ids:
+        try:
+            conversation_ids = {int(value) for value in ids.split(',') if value.strip()}
+        except ValueError:
+            return Response({'error': 'conversations must be a comma separated list of ids'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        conversation_ids = [
+            conversation_id for conversation_id in conversation_ids
+            if is_participant(conversation_id, request.user.id)
+        ]
+    else:
+        conversation_ids = list(request.user.conversations.values_list('id', flat=True))
+    
+    online = online_users(conversation_ids)
+    return Response({
+        'online': {conversation_id: sorted(user_ids) for conversation_id, user_ids in online.items()}
+    })
+
+
 @extend_schema(
     operation_id="conversation_stats",
     summary="إحصائيات المحادثات",
@@ -441,25 +461,14 @@ def conversation_stats(request):
     # Calculate stats
     total_conversations = conversations.count()
     
-    # Conversations with unread messages
-    unread_conversations = conversations.filter(
-        messages__isnull=False
-    ).exclude(
-        messages__read_statuses__user=user
-    ).exclude(messages__sender=user).distinct().count()
+    # Conversations with unread messages and unread message total (stored counters)
+    unread_conversations, unread_messages = unread_totals(user)
     
     # Total messages
     total_messages = Message.objects.filter(
         conversation__participants=user
     ).count()
     
-    # Unread messages
-    unread_messages = Message.objects.filter(
-        conversation__participants=user
-    ).exclude(
-        read_statuses__user=user
-    ).exclude(sender=user).count()
-    
     # Active conversations (with messages in last 30 days)
     thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
     active_conversations = conversations.filter(
@@ -471,11 +480,11 @@ def conversation_stats(request):
     recent_messages = Message.objects.filter(
         conversation__participants=user,
         created_at__gte=seven_days_ago
-    ).extra(
-        select={'day': 'date(created_at)'}
+    ).annotate(
+        day=TruncDate('created_at')
     ).values('day').annotate(count=Count('id')).order_by('day')
     
-    recent_activity = {item['day']: item['count'] for item in recent_messages}
+    recent_activity = {item['day'].isoformat(): item['count'] for item in recent_messages}
     
     stats = {
         'total_conversations': total_conversations,
@@ -515,18 +524,23 @@ def conversation_search(request):
         data = serializer.validated_data
         
         # Start with user's conversations
-        queryset = Conversation.objects.filter(
+        queryset = with_read_state(Conversation.objects.filter(
             participants=request.user
-        ).select_related('project').prefetch_related('participants')
+        ), request.user).select_related('project').prefetch_related('participants')
         
-        # Apply search filters
+        # Apply search filters (full-text index subqueries, no joins or DISTINCT)
         if data.get('query'):
+            matching_messages = Message.objects.filter(
+                matching('message', data['query'])
+            ).values('conversation_id')
+            matching_participants = Conversation.participants.through.objects.filter(
+                matching('user', data['query'], field='user_id')
+            ).values('conversation_id')
             queryset = queryset.filter(
-                Q(messages__content__icontains=data['query']) |
-                Q(participants__first_name__icontains=data['query']) |
-                Q(participants__last_name__icontains=data['query']) |
-                Q(project__title__icontains=data['query'])
-            ).distinct()
+                Q(pk__in=matching_messages) |
+                Q(pk__in=matching_participants) |
+                matching('project', data['query'], field='project_id')
+            )
         
         if data.get('participant'):
             queryset = queryset.filter(
@@ -537,33 +551,19 @@ def conversation_search(request):
             queryset = queryset.filter(project_id=data['project_id'])
         
         if data.get('has_unread'):
-            if data['has_unread']:
-                queryset = queryset.filter(
-                    messages__isnull=False
-                ).exclude(
-                    messages__read_statuses__user=request.user
-                ).exclude(messages__sender=request.user).distinct()
-            else:
-                # Conversations with no unread messages
-                queryset = queryset.exclude(
-                    messages__isnull=False,
-                    messages__read_statuses__user__isnull=True
-                ).exclude(messages__sender=request.user).distinct()
-        
-        if data.get('date_from'):
-            queryset = queryset.filter(
-                messages__created_at__date__gte=data['date_from']
-            )
+            queryset = queryset.filter(unread_filter(request.user, data['has_unread']))
         
-        if data.get('date_to'):
-            queryset = queryset.filter(
-                messages__created_at__date__lte=data['date_to']
-            )
+        # Conversations with messages in the date range (subquery, no join duplicates)
+        if data.get('date_from') or data.get('date_to'):
+            dated_messages = Message.objects.all()
+            if data.get('date_from'):
+                dated_messages = dated_messages.filter(created_at__date__gte=data['date_from'])
+            if data.get('date_to'):
+                dated_messages = dated_messages.filter(created_at__date__lte=data['date_to'])
+            queryset = queryset.filter(pk__in=dated_messages.values('conversation_id'))
         
-        # Order by last message
-        queryset = queryset.annotate(
-            last_message_time=Max('messages__created_at')
-        ).order_by('-last_message_time')
+        # Order by the stored last message time
+        queryset = queryset.order_by('-last_message_at', '-id')
         
         # Paginate results
         from rest_framework.pagination import PageNumberPagination
@@ -731,11 +731,7 @@ def message_stats(request):
         
         # Get basic stats
         total_messages = Message.objects.filter(sender=user).count()
-        unread_messages = Message.objects.filter(
-            conversation__participants=user
-        ).exclude(sender=user).exclude(
-            read_statuses__user=user
-        ).count()
+        _, unread_messages = unread_totals(user)
         
         total_conversations = Conversation.objects.filter(participants=user).count()
         active_conversations = Conversation.objects.filter(
@@ -839,7 +835,8 @@ def message_stats(request):
             'conversation_id': {'type': 'integer', 'description': 'Conversation ID'},
             'message': {'type': 'string', 'description': 'Message content'},
             'project_id': {'type': 'integer', 'description': 'Project ID (optional)'},
-            'attachments': {'type': 'array', 'items': {'type': 'file'}, 'description': 'Message attachments'}
+            'attachments': {'type': 'array', 'items': {'type': 'file'}, 'description': 'Message attachments'},
+            'upload_ids': {'type': 'array', 'items': {'type': 'string'}, 'description': 'Complete chunked uploads to attach'}
         },
         'required': ['message']
     },
@@ -850,41 +847,54 @@ def message_stats(request):
 def send_message(request):
     """إرسال رسالة لمستخدم محدد مع دعم المرفقات"""
     try:
-        print(f"DEBUG: Request data: {request.data}")
-        print(f"DEBUG: Request files: {request.FILES}")
-        print(f"DEBUG: Request user: {request.user}")
-        
         recipient_id = request.data.get('recipient')
         conversation_id = request.data.get('conversation_id')
         message_text = request.data.get('message', '')
         project_id = request.data.get('project_id')
         attachments = request.FILES.getlist('attachments')
-        
-        print(f"DEBUG: recipient_id: {recipient_id}")
-        print(f"DEBUG: conversation_id: {conversation_id}")
-        print(f"DEBUG: message_text: {message_text}")
-        print(f"DEBUG: project_id: {project_id}")
-        print(f"DEBUG: attachments count: {len(attachments)}")
+        if hasattr(request.data, 'getlist'):
+            upload_ids = request.data.getlist('upload_ids')
+        else:
+            upload_ids = request.data.get('upload_ids') or []
         
         # Check if we have either recipient or conversation_id
         if not recipient_id and not conversation_id:
-            print(f"DEBUG: Missing required fields - recipient_id: {recipient_id}, conversation_id: {conversation_id}")
             return Response({
                 'error': 'Either recipient or conversation_id is required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        if not message_text and not attachments:
-            print(f"DEBUG: Missing message text and attachments")
+        if not message_text and not attachments and not upload_ids:
             return Response({
                 'error': 'Message content or attachments are required'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # Reject bad attachments up front instead of dropping them after the message exists
+        for attachment_file in attachments:
+            if attachment_file.size > WHOLE_FILE_ATTACHMENT_MAX_SIZE:
+                return Response({
+                    'error': f'{attachment_file.name} exceeds 10MB, send it as a chunked upload'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if attachment_file.content_type not in MessageAttachment.ALLOWED_MIME_TYPES:
+                return Response({
+                    'error': f'File type {attachment_file.content_type} not allowed'
+                }, status=status.HTTP_400_BAD_REQUEST)
+        
+        uploads = list(UploadSession.objects.filter(
+            upload_id__in=upload_ids,
+            uploaded_by=request.user,
+            target='message_attachment'
+        ))
+        if len(uploads) != len(set(upload_ids)) or not all(upload.is_complete for upload in uploads):
+            return Response({
+                'error': 'Uploads must be complete message attachment uploads of yours'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         # If conversation_id is provided, use existing conversation
         if conversation_id:
             try:
                 conversation = Conversation.objects.get(id=conversation_id)
                 # Check if user is participant
-                if request.user not in conversation.participants.all():
+                if not is_participant(conversation.id, request.user.id):
                     return Response({
                         'error': 'You are not a participant in this conversation'
                     }, status=status.HTTP_403_FORBIDDEN)
@@ -924,48 +934,39 @@ def send_message(request):
                 from projects.models import Project
                 project = Project.objects.get(id=project_id)
                 conversation.project = project
-                conversation.save()
+                conversation.save(update_fields=['project'])
             except Project.DoesNotExist:
                 pass  # Continue without project if not found
         
-        # Create message
-        message = Message.objects.create(
-            conversation=conversation,
-            sender=request.user,
-            content=message_text or ''
-        )
-        
-        # Create attachments if any
-        for attachment_file in attachments:
-            # Validate file size
-            if attachment_file.size > 10 * 1024 * 1024:  # 10MB limit
-                continue  # Skip oversized files
-            
-            # Validate file type
-            allowed_types = [
-                'image/jpeg', 'image/png', 'image/gif', 'image/webp',
-                'application/pdf', 'application/msword',
-                'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                'text/plain', 'video/mp4', 'video/avi', 'video/mov',
-                'audio/mpeg', 'audio/wav', 'audio/mp3'
-            ]
-            
-            if attachment_file.content_type not in allowed_types:
-                continue  # Skip unsupported file types
-            
-            # Create attachment
-            MessageAttachment.objects.create(
-                message=message,
-                file=attachment_file,
-                original_filename=attachment_file.name,
-                file_size=attachment_file.size,
-                file_type='image' if attachment_file.content_type.startswith('image/') else 'document',
-                mime_type=attachment_file.content_type
-            )
-        
-        # Update conversation timestamp
-        conversation.updated_at = timezone.now()
-        conversation.save()
+        # The message only exists with all of its attachments
+        try:
+            with transaction.atomic():
+                uploads = lock_sessions(uploads)
+                message = Message.objects.create(
+                    conversation=conversation,
+                    sender=request.user,
+                    content=message_text or ''
+                )
+                
+                # Create attachments if any
+                for attachment_file in attachments:
+                    MessageAttachment.objects.create(
+                        message=message,
+                        file=attachment_file,
+                        original_filename=attachment_file.name,
+                        file_size=attachment_file.size,
+                        file_type='image' if attachment_file.content_type.startswith('image/') else 'document',
+                        mime_type=attachment_file.content_type
+                    )
+                
+                for upload in uploads:
+                    commit_upload(upload, message=message)
+                
+                # Update conversation timestamp, the last message fields are set by Conversation.touch
+                conversation.updated_at = timezone.now()
+                conversation.save(update_fields=['updated_at'])
+        except UploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
         
         # Return message with attachments
         serializer = MessageSerializer(message)
@@ -975,7 +976,7 @@ def send_message(request):
         }, status=status.HTTP_201_CREATED)
         
     except Exception as e:
-        print(f"DEBUG: Exception in send_message: {str(e)}")
+        logger.exception('Could not send message')
         return Response({
             'error': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -989,7 +990,7 @@ def add_message_reaction(request, message_id):
         message = Message.objects.get(id=message_id)
         
         # Check if user is participant in conversation
-        if request.user not in message.conversation.participants.all():
+        if not is_participant(message.conversation_id, request.user.id):
             return Response(
                 {'error': 'You are not a participant in this conversation'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -1074,7 +1075,7 @@ def upload_message_attachment(request, conversation_id):
         conversation = Conversation.objects.get(id=conversation_id)
         
         # Check if user is participant
-        if request.user not in conversation.participants.all():
+        if not is_participant(conversation.id, request.user.id):
             return Response(
                 {'error': 'You are not a participant in this conversation'}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -1088,37 +1089,19 @@ def upload_message_attachment(request, conversation_id):
             )
         
         # Validate file
-        if file.size > 10 * 1024 * 1024:  # 10MB limit
+        if file.size > WHOLE_FILE_ATTACHMENT_MAX_SIZE:
             return Response(
-                {'error': 'File size cannot exceed 10MB'}, 
+                {'error': 'File size cannot exceed 10MB, send larger files as a chunked upload'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        allowed_types = [
-            'image/jpeg', 'image/png', 'image/gif', 'image/webp',
-            'application/pdf', 'application/msword',
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            'text/plain', 'video/mp4', 'video/avi', 'video/mov',
-            'audio/mpeg', 'audio/wav', 'audio/mp3'
-        ]
-        
-        if file.content_type not in allowed_types:
-            return Response(
-                {'error': 'File type not allowed'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        # Create attachment
-        attachment = MessageAttachment.objects.create(
-            message=None,  # Will be set when message is created
-            file=file,
-            original_filename=file.name,
-            file_size=file.size,
-            file_type='image' if file.content_type.startswith('image/') else 'document',
-            mime_type=file.content_type
-        )
+        # Staged as a complete upload, attached when the message is sent with its upload_id
+        try:
+            upload = stage_file(request.user, file, target='message_attachment')
+        except UploadError as e:
+            return Response({'error': e.message}, status=e.status_code)
         
-        serializer = MessageAttachmentSerializer(attachment)
+        serializer = UploadSessionSerializer(upload)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
         
     except Conversation.DoesNotExist:
@@ -1141,39 +1124,14 @@ def mark_conversation_as_read(request, conversation_id):
         conversation = Conversation.objects.get(id=conversation_id)
         
         # Check if user is a participant
-        if request.user not in conversation.participants.all():
+        if not is_participant(conversation.id, request.user.id):
             return Response(
                 {'error': 'You are not a participant in this conversation'}, 
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Mark all unread messages as read
-        unread_messages = Message.objects.filter(
-            conversation=conversation,
-            created_at__gt=ConversationReadTime.objects.get_or_create(
-                user=request.user,
-                conversation=conversation,
-                defaults={'last_read_at': timezone.now()}
-            )[0].last_read_at
-        ).exclude(sender=request.user)
-        
-        # Create read status for all unread messages
-        read_statuses = []
-        for message in unread_messages:
-            read_statuses.append(MessageReadStatus(
-                user=request.user,
-                message=message
-            ))
-        
-        if read_statuses:
-            MessageReadStatus.objects.bulk_create(read_statuses, ignore_conflicts=True)
-        
-        # Update last read time
-        ConversationReadTime.objects.update_or_create(
-            user=request.user,
-            conversation=conversation,
-            defaults={'last_read_at': timezone.now()}
-        )
+        # Move the read watermark to the latest message
+        mark_conversation_read(conversation, request.user)
         
         return Response({'message': 'Conversation marked as read'}, status=status.HTTP_200_OK)
         
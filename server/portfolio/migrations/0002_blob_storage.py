@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:53
+
+from django.db import migrations, models
+import file_management.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='portfolioimage',
+            name='image',
+            field=models.ImageField(storage=file_management.storage.get_blob_storage, upload_to='portfolio/'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from file_management.storage import get_blob_storage
+
 User = get_user_model()
 
 
@@ -34,7 +36,7 @@ class PortfolioItem(models.Model):
 class PortfolioImage(models.Model):
     """صور المعرض"""
     portfolio_item = models.ForeignKey(PortfolioItem, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='portfolio/')
+    image = models.ImageField(upload_to='portfolio/', storage=get_blob_storage)
     caption = models.CharField(max_length=255, blank=True)
     is_primary = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
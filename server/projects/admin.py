@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-from .models import Category, Project, ProjectImage, ProjectFile, ProjectFavorite, ProjectView, ProjectUpdate
+from .models import Category, Project, ProjectImage, ProjectFile, ProjectFavorite, ProjectView, ProjectUpdate, SearchSuggestion
 
 
 @admin.register(Category)
@@ -155,6 +155,14 @@ class ProjectUpdateAdmin(admin.ModelAdmin):
     ]
 
 
+@admin.register(SearchSuggestion)
+class SearchSuggestionAdmin(admin.ModelAdmin):
+    list_display = ['text', 'suggestion_type', 'count', 'updated_at']
+    list_filter = ['suggestion_type']
+    search_fields = ['term', 'text']
+    readonly_fields = ['term', 'count', 'updated_at']
+
+
 # تخصيص موقع الإدارة
 admin.site.site_header = 'A-List Projects Admin'
 admin.site.site_title = 'Projects Management'
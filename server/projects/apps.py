@@ -5,3 +5,7 @@ class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'projects'
     verbose_name = 'Projects'
+
+    def ready(self):
+        """Register the signal handlers that maintain the search suggestion index"""
+        import projects.signals  # noqa: F401
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from projects.suggestions import rebuild_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the project search suggestion index from scratch'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding project search suggestions...')
+        count = rebuild_suggestions()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} search suggestions'))
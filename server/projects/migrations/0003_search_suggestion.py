@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from projects.suggestions import build_suggestion_rows
+
+
+def backfill_suggestions(apps, schema_editor):
+    SearchSuggestion = apps.get_model('projects', 'SearchSuggestion')
+    rows = build_suggestion_rows(
+        apps.get_model('projects', 'Project'),
+        apps.get_model('projects', 'Category'),
+        SearchSuggestion,
+    )
+    SearchSuggestion.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0002_project_additional_requirements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchSuggestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('suggestion_type', models.CharField(choices=[('skill', 'Skill'), ('location', 'Location'), ('category', 'Category')], max_length=20)),
+                ('term', models.CharField(help_text='Normalized lookup term', max_length=255)),
+                ('text', models.CharField(help_text='Display text', max_length=255)),
+                ('count', models.IntegerField(default=0, help_text='Number of open projects using this term')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_suggestions', to='projects.category')),
+            ],
+            options={
+                'verbose_name': 'Search Suggestion',
+                'verbose_name_plural': 'Search Suggestions',
+                'db_table': 'project_search_suggestions',
+                'ordering': ['-count', 'term'],
+                'unique_together': {('suggestion_type', 'term')},
+            },
+        ),
+        migrations.RunPython(backfill_suggestions, migrations.RunPython.noop),
+    ]
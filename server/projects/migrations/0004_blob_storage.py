@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:53
+
+from django.db import migrations, models
+import file_management.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_search_suggestion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='projectfile',
+            name='file',
+            field=models.FileField(storage=file_management.storage.get_blob_storage, upload_to='projects/files/'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_media_variants'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='searchsuggestion',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='searchsuggestion',
+            constraint=models.UniqueConstraint(condition=models.Q(('suggestion_type', 'category'), _negated=True), fields=('suggestion_type', 'term'), name='unique_suggestion_term'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchsuggestion',
+            constraint=models.UniqueConstraint(condition=models.Q(('suggestion_type', 'category')), fields=('category',), name='unique_category_suggestion'),
+        ),
+    ]
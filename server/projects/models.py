@@ -6,6 +6,8 @@ from django.urls import reverse
 from django.utils.text import slugify
 import uuid
 
+from file_management.storage import get_blob_storage
+
 User = get_user_model()
 
 
@@ -235,17 +237,17 @@ class Project(models.Model):
     
     def can_receive_proposals(self):
         """Check if project can receive proposals"""
-        return self.status == 'published' and not self.assigned_professional
+        return self.status == 'published' and not self.assigned_professional_id
     
-    def increment_views(self):
-        """Increment views count"""
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+    def increment_views(self, count=1):
+        """Increment views count atomically, detail views go through view_counter.record_view"""
+        Project.objects.filter(pk=self.pk).update(views_count=models.F('views_count') + count)
+        self.views_count += count
     
-    def increment_proposals(self):
-        """Increment proposals count"""
-        self.proposals_count += 1
-        self.save(update_fields=['proposals_count'])
+    def increment_proposals(self, count=1):
+        """Increment proposals count atomically"""
+        Project.objects.filter(pk=self.pk).update(proposals_count=models.F('proposals_count') + count)
+        self.proposals_count += count
     
     def update_completion(self, percentage):
         """Update completion percentage"""
@@ -266,6 +268,10 @@ class ProjectImage(models.Model):
     )
     image = models.ImageField(upload_to='projects/')
     caption = models.CharField(max_length=255, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # Resized WebP/JPEG renditions per size, see file_management.thumbnails
+    variants = models.JSONField(default=dict, blank=True)
     is_primary = models.BooleanField(default=False)
     order = models.PositiveIntegerField(default=0)
     
@@ -299,7 +305,7 @@ class ProjectFile(models.Model):
         on_delete=models.CASCADE,
         related_name='files'
     )
-    file = models.FileField(upload_to='projects/files/')
+    file = models.FileField(upload_to='projects/files/', storage=get_blob_storage)
     filename = models.CharField(max_length=255)
     file_type = models.CharField(max_length=20, choices=FILE_TYPE_CHOICES)
     file_size = models.PositiveIntegerField()  # in bytes
@@ -440,3 +446,51 @@ class ProjectUpdate(models.Model):
     
     def __str__(self):
         return f"{self.project.title} - {self.title}"
+
+
+class SearchSuggestion(models.Model):
+    """
+    فهرس اقتراحات البحث (المهارات والمواقع والتصنيفات)
+    Maintained incrementally from Project signals, see projects/suggestions.py
+    """
+    TYPE_CHOICES = [
+        ('skill', 'Skill'),
+        ('location', 'Location'),
+        ('category', 'Category'),
+    ]
+
+    suggestion_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    term = models.CharField(max_length=255, help_text='Normalized lookup term')
+    text = models.CharField(max_length=255, help_text='Display text')
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='search_suggestions'
+    )
+    count = models.IntegerField(default=0, help_text='Number of open projects using this term')
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'project_search_suggestions'
+        verbose_name = 'Search Suggestion'
+        verbose_name_plural = 'Search Suggestions'
+        constraints = [
+            # Category rows are keyed by category, two names may normalize alike
+            models.UniqueConstraint(
+                fields=['suggestion_type', 'term'],
+                condition=~models.Q(suggestion_type='category'),
+                name='unique_suggestion_term',
+            ),
+            models.UniqueConstraint(
+                fields=['category'],
+                condition=models.Q(suggestion_type='category'),
+                name='unique_category_suggestion',
+            ),
+        ]
+        ordering = ['-count', 'term']
+
+    def __str__(self):
+        return f"{self.get_suggestion_type_display()}: {self.text} ({self.count})"
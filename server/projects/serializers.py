@@ -1,11 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from alist_backend.serializers import SparseFieldsetMixin
+from file_management.serializers import MediaVariantsField
 from .models import Project, Category, ProjectImage, ProjectFile, ProjectFavorite, ProjectView, ProjectUpdate
 
 User = get_user_model()
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer لتصنيفات المشاريع"""
     projects_count = serializers.SerializerMethodField()
     
@@ -19,19 +21,30 @@ class CategorySerializer(serializers.ModelSerializer):
     
     def get_projects_count(self, obj):
         """Get count of active projects in this category"""
+        if hasattr(obj, 'active_projects_count'):
+            return obj.active_projects_count
         return obj.projects.filter(status__in=['published', 'in_progress']).count()
 
 
+class CategoryBriefSerializer(serializers.ModelSerializer):
+    """Category nested in project lists, without the per-row projects count"""
+    
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'slug', 'icon']
+
+
 class ProjectImageSerializer(serializers.ModelSerializer):
     """Serializer لصور المشاريع"""
+    variants = MediaVariantsField()
     
     class Meta:
         model = ProjectImage
         fields = [
-            'id', 'project', 'image', 'caption', 
-            'is_primary', 'order', 'created_at'
+            'id', 'project', 'image', 'caption', 'width', 'height',
+            'variants', 'is_primary', 'order', 'created_at'
         ]
-        read_only_fields = ['id', 'created_at']
+        read_only_fields = ['id', 'width', 'height', 'created_at']
 
 
 class ProjectFileSerializer(serializers.ModelSerializer):
@@ -82,10 +95,10 @@ class UserBasicSerializer(serializers.ModelSerializer):
         ]
 
 
-class ProjectListSerializer(serializers.ModelSerializer):
-    """Serializer لقائمة المشاريع"""
+class ProjectListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Serializer لقائمة المشاريع، بلا استعلامات لكل صف"""
     client = UserBasicSerializer(read_only=True)
-    category = CategorySerializer(read_only=True)
+    category = CategoryBriefSerializer(read_only=True)
     budget_display = serializers.SerializerMethodField()
     
     class Meta:
@@ -98,6 +111,11 @@ class ProjectListSerializer(serializers.ModelSerializer):
             'favorites_count', 'proposals_count', 'assigned_professional',
             'completion_percentage', 'published_at', 'created_at'
         ]
+        # Related rows the views load only when ?expand= asks for them
+        expandable_fields = {
+            'assigned_professional': (UserBasicSerializer, {'read_only': True}),
+            'images': (ProjectImageSerializer, {'many': True, 'read_only': True}),
+        }
     
     def get_budget_display(self, obj):
         return obj.get_budget_display()
@@ -0,0 +1,65 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .catalog import invalidate_catalog
+from .models import Category, Project
+from .suggestions import apply_delta, project_terms, refresh_category
+
+# Project fields that feed the search suggestion index
+SUGGESTION_FIELDS = ('status', 'required_skills', 'location', 'category_id')
+
+
+def _terms(values):
+    return project_terms(*(values[field] for field in SUGGESTION_FIELDS))
+
+
+def _category_term(terms):
+    """The project's open category term, None while it isn't open"""
+    return next((key for key in terms if key[0] == 'category'), None)
+
+
+@receiver(pre_save, sender=Project)
+def remember_suggestion_terms(sender, instance, update_fields=None, **kwargs):
+    """Snapshot the stored suggestion terms before a project is updated"""
+    instance._suggestion_terms = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not {'status', 'required_skills', 'location', 'category'} & set(update_fields):
+        return
+    stored = Project.objects.filter(pk=instance.pk).values(*SUGGESTION_FIELDS).first()
+    instance._suggestion_terms = _terms(stored) if stored else {}
+
+
+@receiver(post_save, sender=Project)
+def update_suggestions_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Apply the change in skills, location, category or status to the index"""
+    if raw:
+        return
+    old_terms = {} if created else getattr(instance, '_suggestion_terms', None)
+    if old_terms is None:
+        return
+    new_terms = _terms({field: getattr(instance, field) for field in SUGGESTION_FIELDS})
+    apply_delta(old_terms, new_terms)
+    # Open project counts of the category catalog
+    if _category_term(old_terms) != _category_term(new_terms):
+        invalidate_catalog()
+
+
+@receiver(post_delete, sender=Project)
+def update_suggestions_on_delete(sender, instance, **kwargs):
+    terms = _terms({field: getattr(instance, field) for field in SUGGESTION_FIELDS})
+    apply_delta(terms, {})
+    if _category_term(terms):
+        invalidate_catalog()
+
+
+@receiver(post_save, sender=Category)
+def update_category_suggestion(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        refresh_category(instance)
+    invalidate_catalog()
+
+
+@receiver(post_delete, sender=Category)
+def drop_deleted_category(sender, instance, **kwargs):
+    invalidate_catalog()
@@ -0,0 +1,237 @@
+"""
+Search suggestion index for project_search.
+
+SearchSuggestion rows hold the number of open projects using each skill,
+location and category. They are adjusted incrementally from Project signals
+(only the terms that changed are touched), and the whole index is served
+from the cache as a sorted list of lookup keys so suggestions are a binary
+search plus a short scan, independent of the number of projects.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import Category, SearchSuggestion
+
+OPEN_STATUSES = ['published', 'in_progress']
+
+INDEX_CACHE_KEY = 'projects:search_suggestions'
+INDEX_CACHE_TIMEOUT = 60 * 60
+
+# Number of suggestions returned per type
+SUGGESTION_LIMITS = {
+    'skill': 5,
+    'location': 3,
+    'category': 3,
+}
+
+_WHITESPACE = re.compile(r'\s+')
+_WORD_START = re.compile(r'[\s,/\-]+')
+
+
+def normalize_term(value):
+    """Lowercase and collapse whitespace so 'React  JS' and 'react js' match"""
+    return _WHITESPACE.sub(' ', str(value)).strip().lower()
+
+
+def project_terms(status, required_skills, location, category_id):
+    """
+    Suggestion keys contributed by one project, as a dict of
+    (type, term) -> display text (category terms use the category id).
+    """
+    if status not in OPEN_STATUSES:
+        return {}
+
+    terms = {}
+    for skill in required_skills or []:
+        if isinstance(skill, str) and normalize_term(skill):
+            terms.setdefault(('skill', normalize_term(skill)), skill.strip())
+    if location and normalize_term(location):
+        terms[('location', normalize_term(location))] = location.strip()
+    if category_id:
+        terms[('category', category_id)] = None
+    return terms
+
+
+def count_terms(projects):
+    """Count suggestion keys over (status, required_skills, location, category_id) rows"""
+    counts = Counter()
+    texts = {}
+    for row in projects:
+        for key, text in project_terms(*row).items():
+            counts[key] += 1
+            texts.setdefault(key, text)
+    return counts, texts
+
+
+def build_suggestion_rows(project_model, category_model, suggestion_model):
+    """
+    Unsaved SearchSuggestion rows counted from scratch. Models are passed in
+    so the initial migration can use its historical versions.
+    """
+    counts, texts = count_terms(
+        project_model.objects.filter(status__in=OPEN_STATUSES).values_list(
+            'status', 'required_skills', 'location', 'category_id'
+        ).iterator()
+    )
+    categories = category_model.objects.in_bulk(
+        [term for suggestion_type, term in counts if suggestion_type == 'category']
+    )
+
+    rows = []
+    for (suggestion_type, term), count in counts.items():
+        if suggestion_type == 'category':
+            category = categories[term]
+            rows.append(suggestion_model(
+                suggestion_type='category', term=normalize_term(category.name),
+                text=category.name, category=category, count=count
+            ))
+        else:
+            rows.append(suggestion_model(
+                suggestion_type=suggestion_type, term=term,
+                text=texts[(suggestion_type, term)], count=count
+            ))
+    return rows
+
+
+def rebuild_suggestions():
+    """Recompute every SearchSuggestion row from the projects table"""
+    from .models import Project
+
+    rows = build_suggestion_rows(Project, Category, SearchSuggestion)
+    with transaction.atomic():
+        SearchSuggestion.objects.all().delete()
+        SearchSuggestion.objects.bulk_create(rows, batch_size=1000)
+    invalidate_index()
+    return len(rows)
+
+
+def apply_delta(old_terms, new_terms):
+    """Adjust suggestion counts for the keys that differ between two term sets"""
+    removed = set(old_terms) - set(new_terms)
+    added = set(new_terms) - set(old_terms)
+    if not removed and not added:
+        return
+
+    for key in removed:
+        _suggestion_filter(key).update(count=F('count') - 1)
+
+    for key in added:
+        updated = _suggestion_filter(key).update(count=F('count') + 1)
+        if not updated:
+            _create_suggestion(key, new_terms[key])
+
+    invalidate_index()
+
+
+def _suggestion_filter(key):
+    suggestion_type, term = key
+    if suggestion_type == 'category':
+        return SearchSuggestion.objects.filter(suggestion_type='category', category_id=term)
+    return SearchSuggestion.objects.filter(suggestion_type=suggestion_type, term=term)
+
+
+def _create_suggestion(key, text):
+    suggestion_type, term = key
+    if suggestion_type == 'category':
+        category = Category.objects.get(pk=term)
+        # Keyed by the category, not its normalized name which may be shared
+        suggestion, created = SearchSuggestion.objects.get_or_create(
+            suggestion_type='category', category=category,
+            defaults={'term': normalize_term(category.name), 'text': category.name, 'count': 1}
+        )
+    else:
+        suggestion, created = SearchSuggestion.objects.get_or_create(
+            suggestion_type=suggestion_type, term=term, defaults={'text': text, 'count': 1}
+        )
+    if not created:
+        SearchSuggestion.objects.filter(pk=suggestion.pk).update(count=F('count') + 1)
+
+
+def refresh_category(category):
+    """Keep the category suggestion in sync with the category name and state"""
+    SearchSuggestion.objects.filter(
+        suggestion_type='category', category=category
+    ).exclude(text=category.name).update(
+        text=category.name, term=normalize_term(category.name)
+    )
+    invalidate_index()
+
+
+def invalidate_index():
+    """Drop the cached index once the surrounding transaction commits"""
+    transaction.on_commit(lambda: cache.delete(INDEX_CACHE_KEY))
+
+
+def _lookup_keys(term):
+    """The full term plus every word start, so 'native' finds 'react native'"""
+    keys = {term}
+    for match in _WORD_START.finditer(term):
+        if match.end() < len(term):
+            keys.add(term[match.end():])
+    return keys
+
+
+def build_index():
+    """Sorted (lookup key, type, text, ref, count) tuples for prefix search"""
+    entries = []
+    suggestions = SearchSuggestion.objects.filter(count__gt=0).select_related('category')
+    for suggestion in suggestions:
+        if suggestion.suggestion_type == 'category':
+            if not suggestion.category.is_active:
+                continue
+            ref = suggestion.category.slug
+        else:
+            ref = suggestion.text
+        for key in _lookup_keys(suggestion.term):
+            entries.append((key, suggestion.suggestion_type, suggestion.text, ref, suggestion.count))
+    entries.sort()
+    return {
+        'keys': [entry[0] for entry in entries],
+        'entries': entries,
+    }
+
+
+def get_index():
+    index = cache.get(INDEX_CACHE_KEY)
+    if index is None:
+        index = build_index()
+        cache.set(INDEX_CACHE_KEY, index, INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def get_suggestions(query):
+    """Suggestions whose terms (or one of their words) start with ``query``"""
+    prefix = normalize_term(query)
+    if not prefix:
+        return []
+
+    index = get_index()
+    keys = index['keys']
+    entries = index['entries']
+
+    matches = {suggestion_type: {} for suggestion_type in SUGGESTION_LIMITS}
+    position = bisect_left(keys, prefix)
+    while position < len(keys) and keys[position].startswith(prefix):
+        _, suggestion_type, text, ref, count = entries[position]
+        matches[suggestion_type][ref] = (count, text)
+        position += 1
+
+    suggestions = []
+    for suggestion_type, limit in SUGGESTION_LIMITS.items():
+        best = heapq.nsmallest(
+            limit, matches[suggestion_type].items(), key=lambda item: (-item[1][0], item[1][1])
+        )
+        for ref, (count, text) in best:
+            suggestions.append({
+                'id': f'{suggestion_type}-{ref}',
+                'type': suggestion_type,
+                'text': text,
+                'count': count,
+            })
+    return suggestions
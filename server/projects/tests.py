@@ -1,3 +1,300 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .catalog import CATALOG_CACHE_KEY
+from .models import Category, Project, ProjectImage, ProjectView, SearchSuggestion
+from .suggestions import get_suggestions, rebuild_suggestions
+from .view_counter import view_buffer
+
+User = get_user_model()
+
+
+class SearchSuggestionIndexTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.category = Category.objects.create(name='Kitchen Remodeling', slug='kitchen-remodeling')
+
+    def create_project(self, skills, location='New York', status='published', category=None, **kwargs):
+        return Project.objects.create(
+            title='Kitchen Renovation',
+            description='Complete kitchen renovation project',
+            client=self.client_user,
+            category=category or self.category,
+            location=location,
+            required_skills=skills,
+            status=status,
+            **kwargs
+        )
+
+    def counts(self, suggestion_type):
+        return dict(
+            SearchSuggestion.objects.filter(
+                suggestion_type=suggestion_type, count__gt=0
+            ).values_list('term', 'count')
+        )
+
+    def test_counts_follow_project_changes(self):
+        """Saving and deleting projects adjusts only the affected terms"""
+        first = self.create_project(['Plumbing', 'Tiling'])
+        self.create_project(['plumbing '], location='Newark')
+        self.create_project(['Electrical'], status='draft')
+
+        self.assertEqual(self.counts('skill'), {'plumbing': 2, 'tiling': 1})
+        self.assertEqual(self.counts('location'), {'new york': 1, 'newark': 1})
+        self.assertEqual(self.counts('category'), {'kitchen remodeling': 2})
+
+        first.required_skills = ['Tiling', 'Carpentry']
+        first.save()
+        self.assertEqual(self.counts('skill'), {'plumbing': 1, 'tiling': 1, 'carpentry': 1})
+
+        first.status = 'cancelled'
+        first.save()
+        self.assertEqual(self.counts('skill'), {'plumbing': 1})
+
+        first.delete()
+        expected = {
+            suggestion_type: self.counts(suggestion_type)
+            for suggestion_type in ('skill', 'location', 'category')
+        }
+        rebuild_suggestions()
+        for suggestion_type, counts in expected.items():
+            self.assertEqual(self.counts(suggestion_type), counts)
+
+    def test_categories_with_alike_names_keep_their_own_rows(self):
+        """Categories whose names normalize alike are counted separately"""
+        other = Category.objects.create(name='kitchen  remodeling', slug='kitchen-remodeling-2')
+        self.create_project(['Plumbing'])
+        self.create_project(['Tiling'], category=other)
+        self.create_project(['Carpentry'], category=other)
+
+        def by_category():
+            return dict(
+                SearchSuggestion.objects.filter(suggestion_type='category').values_list('category_id', 'count')
+            )
+
+        self.assertEqual(by_category(), {self.category.id: 1, other.id: 2})
+        rebuild_suggestions()
+        self.assertEqual(by_category(), {self.category.id: 1, other.id: 2})
+
+    def test_prefix_lookup_is_served_from_cache(self):
+        """Suggestions match term and word prefixes without touching the database"""
+        self.create_project(['React Native', 'Plumbing'])
+        self.create_project(['Plumbing'], location='New York')
+        get_suggestions('warm up')
+
+        with self.assertNumQueries(0):
+            suggestions = get_suggestions('NATIVE')
+            plumbing = get_suggestions('plu')
+            kitchen = get_suggestions('kitch')
+
+        self.assertEqual([s['text'] for s in suggestions], ['React Native'])
+        self.assertEqual(plumbing, [{'id': 'skill-Plumbing', 'type': 'skill', 'text': 'Plumbing', 'count': 2}])
+        self.assertEqual(kitchen[0]['id'], 'category-kitchen-remodeling')
+        self.assertEqual(kitchen[0]['count'], 2)
+
+    def test_project_search_endpoint(self):
+        """project_search returns matching projects and index suggestions"""
+        self.create_project(['Plumbing'])
+        self.client.force_login(self.client_user)
+
+        response = self.client.post('/api/projects/search/', {'q': 'new'}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(data['suggestions'], [
+            {'id': 'location-New York', 'type': 'location', 'text': 'New York', 'count': 1}
+        ])
+
+
+# A long interval keeps views buffered until the test flushes them
+@override_settings(PROJECT_VIEW_FLUSH_INTERVAL=3600)
+class ProjectViewCounterTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.addCleanup(view_buffer.flush)
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        category = Category.objects.create(name='Plumbing', slug='plumbing')
+        self.quiet, self.popular = [
+            Project.objects.create(
+                title=title,
+                description='Leaking kitchen sink',
+                client=self.client_user,
+                category=category,
+                location='New York',
+                status='published'
+            )
+            for title in ('Quiet project', 'Popular project')
+        ]
+
+    def view(self, project, ip='10.0.0.1'):
+        return self.client.get(f'/api/projects/{project.slug}/', REMOTE_ADDR=ip)
+
+    def test_views_are_deduped_buffered_and_flushed(self):
+        """Repeat views are dropped, the rest are written in one flush and rank trending projects"""
+        self.view(self.quiet)
+        self.view(self.popular)
+        self.view(self.popular)
+        self.view(self.popular, ip='10.0.0.2')
+        self.client.force_login(self.client_user)
+        self.view(self.popular)
+        self.view(self.popular, ip='10.0.0.3')
+        # A forged X-Forwarded-For isn't a new visitor without trusted proxies
+        self.client.logout()
+        self.client.get(f'/api/projects/{self.popular.slug}/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='10.9.9.9')
+
+        self.assertFalse(ProjectView.objects.exists())
+        # Written by the timer if nothing flushes them sooner
+        self.assertEqual(view_buffer.timer.interval, 3600)
+        response = self.client.get('/api/projects/trending/')
+        self.assertEqual([project['id'] for project in response.json()], [self.popular.id, self.quiet.id])
+
+        # Existing ids, one UPDATE per project and one INSERT, in a savepoint
+        with self.assertNumQueries(6):
+            self.assertEqual(view_buffer.flush(), 4)
+        self.popular.refresh_from_db()
+        self.assertEqual(self.popular.views_count, 3)
+        self.assertEqual(ProjectView.objects.filter(project=self.popular, user=self.client_user).count(), 1)
+
+        # Flushed counts still rank from the cache
+        response = self.client.get('/api/projects/trending/?limit=1')
+        self.assertEqual([project['id'] for project in response.json()], [self.popular.id])
+
+
+class ProjectListFieldsTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.professional = User.objects.create_user(
+            username='pro1',
+            email='pro1@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.categories = [
+            Category.objects.create(name='Plumbing', slug='plumbing'),
+            Category.objects.create(name='Roofing', slug='roofing'),
+        ]
+        for index in range(4):
+            project = Project.objects.create(
+                title=f'Project {index}',
+                description='Leaking kitchen sink',
+                client=self.client_user,
+                category=self.categories[index % 2],
+                location='New York',
+                status='in_progress' if index == 3 else 'published',
+                assigned_professional=self.professional if index == 3 else None
+            )
+            ProjectImage.objects.create(project=project, image=f'projects/{index}.jpg')
+        self.api = APIClient()
+
+    def test_list_has_no_per_row_queries(self):
+        """Listing projects costs the same queries for any number of rows"""
+        with self.assertNumQueries(2):
+            response = self.api.get('/api/projects/')
+        row = response.json()['results'][0]
+        self.assertEqual(set(row['category']), {'id', 'name', 'slug', 'icon'})
+
+    def test_fields_and_expand(self):
+        """?fields= trims rows, ?expand= nests related rows loaded by the view"""
+        response = self.api.get('/api/projects/', {'fields': 'id,title'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title'})
+
+        self.api.force_authenticate(self.client_user)
+        with self.assertNumQueries(3):
+            response = self.api.get('/api/projects/my/', {'expand': 'assigned_professional,images', 'status': 'in_progress'})
+        row = response.json()['results'][0]
+        self.assertEqual(row['assigned_professional']['username'], 'pro1')
+        self.assertEqual(len(row['images']), 1)
+
+        response = self.api.get('/api/projects/my/', {'status': 'in_progress'})
+        self.assertEqual(response.json()['results'][0]['assigned_professional'], self.professional.id)
+        self.assertNotIn('images', response.json()['results'][0])
+
+
+class CategoryCatalogTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.plumbing = Category.objects.create(name='Plumbing', slug='plumbing', order=1)
+        Category.objects.create(name='Roofing', slug='roofing', order=2)
+        Category.objects.create(name='Retired', slug='retired', is_active=False)
+        self.projects = [
+            Project.objects.create(
+                title=f'Project {index}',
+                description='Leaking kitchen sink',
+                client=self.client_user,
+                category=self.plumbing,
+                location='New York',
+                status=status
+            )
+            for index, status in enumerate(['published', 'in_progress', 'draft'])
+        ]
+        self.url = '/api/projects/categories/'
+
+    def counts(self, response):
+        return {category['slug']: category['projects_count'] for category in response.json()['results']}
+
+    def test_catalog_is_cached_and_revalidated(self):
+        """One grouped query fills the cache, later requests and revalidations run none"""
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(self.counts(response), {'plumbing': 2, 'roofing': 0})
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+        etag = response['ETag']
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).json(), response.json())
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_catalog_follows_status_and_category_changes(self):
+        """Open project and category changes drop the catalog, other edits keep it"""
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.projects[0].title = 'Renamed'
+            self.projects[0].save()
+        self.assertIsNotNone(cache.get(CATALOG_CACHE_KEY))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.projects[0].status = 'completed'
+            self.projects[0].save()
+        self.assertIsNone(cache.get(CATALOG_CACHE_KEY))
+        response = self.client.get(self.url)
+        self.assertEqual(self.counts(response), {'plumbing': 1, 'roofing': 0})
+        self.assertNotEqual(response['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plumbing.is_active = False
+            self.plumbing.save()
+        self.assertEqual(self.counts(self.client.get(self.url)), {'roofing': 0})
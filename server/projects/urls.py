@@ -10,6 +10,7 @@ urlpatterns = [
     path('my/', views.MyProjectsView.as_view(), name='my_projects'),
     path('search/', views.project_search, name='project_search'),
     path('stats/', views.project_stats, name='project_stats'),
+    path('trending/', views.trending_projects, name='trending_projects'),
     
     # Categories (يجب أن يكون قبل slug pattern)
     path('categories/', views.CategoryListView.as_view(), name='category_list'),
@@ -0,0 +1,166 @@
+"""
+Buffered project view counting.
+
+record_view() runs on every project detail request. A repeat view of the
+same project by the same user, or IP address for anonymous visitors, within
+PROJECT_VIEW_DEDUPE_SECONDS is dropped with a single cache.add, which is
+shared between workers when the cache is Redis. The remaining views are
+buffered in process (alist_backend.buffers) and flushed on a background
+thread PROJECT_VIEW_FLUSH_INTERVAL seconds after the first one or every
+PROJECT_VIEW_FLUSH_BATCH views, as one F() UPDATE of views_count per project
+and one bulk_create of their ProjectView rows, instead of a row lock and an
+INSERT per view.
+
+Each flush also adds its counts to hourly per-project counters in the cache,
+with cache.add and cache.incr so workers flushing at once don't lose each
+other's views. The projects seen in an hour are listed in numbered slots,
+claimed with cache.incr on the hour's slot count. Trending projects are
+ranked from those counters plus the views still buffered, with no query
+over ProjectView.
+"""
+import atexit
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, When
+from rest_framework.settings import api_settings
+
+from alist_backend.buffers import WriteBuffer
+
+DEDUPE_KEY = 'projects:viewed:{}:{}'
+# Views of a project in an hour, the hour's number of projects, and its slots
+TRENDING_KEY = 'projects:trending:{}:{}'
+TRENDING_SLOTS_KEY = 'projects:trending:{}:slots'
+TRENDING_SLOT_KEY = 'projects:trending:{}:slot:{}'
+
+
+def dedupe_seconds():
+    return getattr(settings, 'PROJECT_VIEW_DEDUPE_SECONDS', 30 * 60)
+
+
+def trending_hours():
+    return getattr(settings, 'PROJECT_TRENDING_HOURS', 24)
+
+
+def client_ip(request):
+    """
+    The visitor's address, REMOTE_ADDR unless REST_FRAMEWORK's NUM_PROXIES
+    trusted proxies forward it, then the entry the outermost one added to
+    X-Forwarded-For. Entries before it are sent by the client and ignored.
+    """
+    num_proxies = api_settings.NUM_PROXIES
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and forwarded:
+        addresses = [address.strip() for address in forwarded.split(',')]
+        return addresses[-min(num_proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR') or '0.0.0.0'
+
+
+class ViewBuffer(WriteBuffer):
+    """Project views waiting to be written, as (project_id, user_id, ip_address, user_agent)"""
+    batch_setting = 'PROJECT_VIEW_FLUSH_BATCH'
+    default_batch = 500
+    interval_setting = 'PROJECT_VIEW_FLUSH_INTERVAL'
+
+    def empty(self):
+        return []
+
+    def store(self, views, project_id, user_id, ip_address, user_agent):
+        views.append((project_id, user_id, ip_address, user_agent))
+
+    def restore(self, views):
+        self.items[:0] = views
+
+    def pending_counts(self):
+        with self.lock:
+            return Counter(view[0] for view in self.items)
+
+    def write(self, views):
+        from .models import Project, ProjectView
+
+        counts = Counter(view[0] for view in views)
+        # Projects deleted since they were viewed
+        existing = set(Project.objects.filter(pk__in=counts).order_by().values_list('pk', flat=True))
+        views = [view for view in views if view[0] in existing]
+        with transaction.atomic():
+            for project_id in existing:
+                Project.objects.filter(pk=project_id).update(views_count=F('views_count') + counts[project_id])
+            ProjectView.objects.bulk_create([
+                ProjectView(project_id=project_id, user_id=user_id, ip_address=ip_address, user_agent=user_agent)
+                for project_id, user_id, ip_address, user_agent in views
+            ])
+        return views
+
+    def written(self, views):
+        add_trending(Counter(view[0] for view in views))
+
+
+view_buffer = ViewBuffer()
+# Views still buffered when the worker stops
+atexit.register(view_buffer.flush)
+
+
+def record_view(project, request):
+    """Count a view of ``project``, returns False for a repeat view by the same visitor"""
+    user_id = request.user.pk if request.user.is_authenticated else None
+    ip_address = client_ip(request)
+    viewer = f'user:{user_id}' if user_id else f'ip:{ip_address}'
+    if not cache.add(DEDUPE_KEY.format(project.pk, viewer), 1, dedupe_seconds()):
+        return False
+    view_buffer.add(project.pk, user_id, ip_address, request.META.get('HTTP_USER_AGENT', ''))
+    return True
+
+
+def add_trending(counts):
+    """Add flushed view counts to the current hour's counters"""
+    hour = int(time.time() // 3600)
+    timeout = (trending_hours() + 1) * 3600
+    for project_id, count in counts.items():
+        key = TRENDING_KEY.format(hour, project_id)
+        try:
+            cache.incr(key, count)
+            continue
+        except ValueError:
+            # The project's first views this hour
+            pass
+        if not cache.add(key, count, timeout):
+            # Another worker added it in between
+            cache.incr(key, count)
+            continue
+        slots_key = TRENDING_SLOTS_KEY.format(hour)
+        cache.add(slots_key, 0, timeout)
+        cache.set(TRENDING_SLOT_KEY.format(hour, cache.incr(slots_key)), project_id, timeout)
+
+
+def trending_project_ids(hours=None, limit=10):
+    """Ids of the most viewed projects over the last ``hours``, most viewed first"""
+    current = int(time.time() // 3600)
+    hours = [current - offset for offset in range(hours or trending_hours())]
+    slot_counts = cache.get_many([TRENDING_SLOTS_KEY.format(hour) for hour in hours])
+    slot_hours = {
+        TRENDING_SLOT_KEY.format(hour, slot): hour
+        for hour in hours
+        for slot in range(1, slot_counts.get(TRENDING_SLOTS_KEY.format(hour), 0) + 1)
+    }
+    count_keys = {
+        TRENDING_KEY.format(slot_hours[key], project_id): project_id
+        for key, project_id in cache.get_many(list(slot_hours)).items()
+    }
+    totals = Counter()
+    for key, count in cache.get_many(list(count_keys)).items():
+        totals[count_keys[key]] += count
+    totals.update(view_buffer.pending_counts())
+    return [project_id for project_id, _ in totals.most_common(limit)]
+
+
+def trending_projects(queryset, hours=None, limit=10):
+    """Rows of ``queryset`` among the trending projects, in trending order"""
+    # Rank more than needed, some may be filtered out by the queryset
+    ids = trending_project_ids(hours, limit * 2)
+    if not ids:
+        return queryset.none()
+    order = Case(*[When(pk=project_id, then=position) for position, project_id in enumerate(ids)])
+    return queryset.filter(pk__in=ids).order_by(order)[:limit]
@@ -4,11 +4,18 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from django.db.models import Q, Count, Avg, Sum
 from django.db import models
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_spectacular.utils import extend_schema
 
+from alist_backend.serializers import expand_requested
+from search.filters import FullTextSearchFilter
+
+from . import catalog, view_counter
 from .models import Project, Category, ProjectImage, ProjectFile
+from .suggestions import get_suggestions
 from .serializers import (
     ProjectListSerializer, 
     ProjectDetailSerializer, 
@@ -21,12 +28,22 @@ from .serializers import (
 User = get_user_model()
 
 
+def with_expansions(queryset, request):
+    """Load the related rows asked for with ProjectListSerializer's ?expand="""
+    if expand_requested(request, 'assigned_professional'):
+        queryset = queryset.select_related('assigned_professional')
+    if expand_requested(request, 'images'):
+        queryset = queryset.prefetch_related('images')
+    return queryset
+
+
 class ProjectListView(generics.ListAPIView):
     """قائمة المشاريع مع فلترة وبحث"""
     serializer_class = ProjectListSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['title', 'description', 'location']
+    # Full-text search runs last so it can order by rank when no ordering is given
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
+    search_doc_type = 'project'
     ordering_fields = ['created_at', 'published_at', 'budget_min', 'budget_max']
     ordering = ['-published_at']
     
@@ -65,7 +82,7 @@ class ProjectListView(generics.ListAPIView):
         if requires_license is not None:
             queryset = queryset.filter(requires_license=requires_license.lower() == 'true')
         
-        return queryset
+        return with_expansions(queryset, self.request)
 
 
 class ProjectDetailView(generics.RetrieveAPIView):
@@ -77,15 +94,63 @@ class ProjectDetailView(generics.RetrieveAPIView):
     def get_queryset(self):
         # Allow access to all projects including drafts
         return Project.objects.all().select_related('client', 'category')
+    
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        view_counter.record_view(instance, request)
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
 
 
 class CategoryListView(generics.ListAPIView):
-    """قائمة تصنيفات المشاريع"""
+    """قائمة تصنيفات المشاريع، من الكاش مع ETag"""
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    # The catalog is public, no need to look up a user for it
+    authentication_classes = []
     
     def get_queryset(self):
-        return Category.objects.filter(is_active=True).order_by('order', 'name')
+        return catalog.catalog_queryset()
+    
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('fields'):
+            # Sparse fieldsets are served uncached
+            return super().list(request, *args, **kwargs)
+        entry = catalog.get_catalog()
+        response = get_conditional_response(request, etag=entry['etag'])
+        if response is None:
+            # One page holding every category, the shape paginated clients expect
+            response = Response({
+                'count': len(entry['categories']),
+                'next': None,
+                'previous': None,
+                'results': entry['categories'],
+            })
+        response['ETag'] = entry['etag']
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'CATEGORY_CATALOG_MAX_AGE', 5 * 60))
+        return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@extend_schema(
+    operation_id="get_trending_projects",
+    summary="Trending Projects",
+    description="Open projects with the most views in the last hours",
+    tags=["Projects"],
+)
+def trending_projects(request):
+    """Most viewed open projects, ranked from the buffered view counts"""
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+    except ValueError:
+        return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+    projects = view_counter.trending_projects(
+        with_expansions(Project.objects.filter(status='published').select_related('client', 'category'), request),
+        limit=limit
+    )
+    serializer = ProjectListSerializer(projects, many=True, context={'request': request})
+    return Response(serializer.data)
 
 
 @api_view(['GET'])
@@ -179,53 +244,13 @@ def project_search(request):
     projects = Project.objects.filter(
         Q(title__icontains=query) | 
         Q(description__icontains=query) |
-        Q(required_skills__overlap=[query]) |
+        Q(required_skills__icontains=query) |
         Q(location__icontains=query),
         status__in=['published', 'in_progress']
     ).select_related('client', 'category')[:10]
     
-    # Generate suggestions
-    suggestions = []
-    
-    # Skill suggestions
-    all_projects = Project.objects.filter(status__in=['published', 'in_progress'])
-    matching_skills = set()
-    for project in all_projects:
-        for skill in project.required_skills:
-            if query.lower() in skill.lower():
-                matching_skills.add(skill)
-    
-    for skill in list(matching_skills)[:5]:
-        suggestions.append({
-            'id': f'skill-{skill}',
-            'type': 'skill',
-            'text': skill,
-            'count': len([p for p in all_projects if skill in p.required_skills])
-        })
-    
-    # Location suggestions
-    locations = Project.objects.filter(
-        location__icontains=query,
-        status__in=['published', 'in_progress']
-    ).values_list('location', flat=True).distinct()[:3]
-    
-    for location in locations:
-        suggestions.append({
-            'id': f'location-{location}',
-            'type': 'location', 
-            'text': location,
-            'count': Project.objects.filter(location=location).count()
-        })
-    
-    # Category suggestions
-    categories = Category.objects.filter(name__icontains=query)[:3]
-    for category in categories:
-        suggestions.append({
-            'id': f'category-{category.slug}',
-            'type': 'category',
-            'text': category.name,
-            'count': category.projects.filter(status__in=['published', 'in_progress']).count()
-        })
+    # Suggestions come from the precomputed skill/location/category index
+    suggestions = get_suggestions(query)
     
     serializer = ProjectListSerializer(projects, many=True)
     
@@ -308,7 +333,7 @@ class MyProjectsView(generics.ListAPIView):
         if category and category != 'all':
             queryset = queryset.filter(category__slug=category)
         
-        return queryset
+        return with_expansions(queryset, self.request)
 
 
 class ProjectImageViewSet(ModelViewSet):
@@ -41,19 +41,17 @@ class ProposalFilter(django_filters.FilterSet):
     # العروض التي تشمل المواد
     includes_materials = django_filters.BooleanFilter()
     
-    # ترتيب
+    # ترتيب، نفس خيارات ProposalPagination
     ordering = django_filters.OrderingFilter(
         fields=(
             ('created_at', 'created_at'),
             ('amount', 'amount'),
             ('professional__rating_average', 'rating'),
-            ('timeline', 'timeline'),
         ),
         field_labels={
             'created_at': 'تاريخ الإنشاء',
             'amount': 'المبلغ',
             'rating': 'التقييم',
-            'timeline': 'المدة الزمنية',
         }
     )
     
@@ -77,5 +75,6 @@ class ProposalFilter(django_filters.FilterSet):
             Q(professional__last_name__icontains=value) |
             Q(professional__company_name__icontains=value) |
             Q(project__title__icontains=value) |
+            Q(project__description__icontains=value) |
             Q(timeline__icontains=value)
         ) 
\ No newline at end of file
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proposals', '0003_proposal_contract'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proposal',
+            index=models.Index(fields=['project', '-created_at', '-id'], name='proposals_project_649da5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='proposal',
+            index=models.Index(fields=['professional', '-created_at', '-id'], name='proposals_profess_80ee59_idx'),
+        ),
+    ]
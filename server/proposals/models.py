@@ -184,34 +184,37 @@ class Proposal(models.Model):
             models.Index(fields=['status', 'created_at']),
             models.Index(fields=['is_featured', 'created_at']),
             models.Index(fields=['amount']),
+            # Keyset pages of a project's or a professional's proposals
+            models.Index(fields=['project', '-created_at', '-id']),
+            models.Index(fields=['professional', '-created_at', '-id']),
         ]
         unique_together = ['project', 'professional']
     
     def __str__(self):
         return f"{self.professional.get_full_name()} - {self.project.title} - ${self.amount}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Status as loaded, so save() sees transitions without reading the row again
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+    
     def save(self, *args, **kwargs):
         # Update response time when status changes
-        if self.pk:
-            try:
-                old_proposal = Proposal.objects.get(pk=self.pk)
-                if old_proposal.status != self.status and self.status in ['accepted', 'rejected']:
-                    self.responded_at = timezone.now()
-            except Proposal.DoesNotExist:
-                # New proposal, no need to compare status
-                pass
+        if not self._state.adding:
+            previous = getattr(self, '_loaded_status', None)
+            if previous is None:
+                # Loaded without its status or built by hand
+                previous = Proposal.objects.filter(pk=self.pk).values_list('status', flat=True).first()
+            if previous != self.status and self.status in ['accepted', 'rejected']:
+                self.responded_at = timezone.now()
+                if kwargs.get('update_fields') is not None:
+                    kwargs['update_fields'] = {*kwargs['update_fields'], 'responded_at'}
         
-        # Save proposal first
-        is_new = not self.pk
+        # The project's proposals_count follows from dashboard.signals
         super().save(*args, **kwargs)
-        
-        # Update proposal counter in project after saving
-        if is_new:
-            try:
-                self.project.increment_proposals()
-            except:
-                # If increment_proposals function doesn't exist, ignore error
-                pass
+        self._loaded_status = self.status
     
     def get_status_display_en(self):
         """Get proposal status in English"""
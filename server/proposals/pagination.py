@@ -0,0 +1,21 @@
+from messaging.pagination import KeysetPagination
+
+
+class ProposalPagination(KeysetPagination):
+    """Newest proposals first, or one of ProposalFilter's orderings"""
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    ordering_query_param = 'ordering'
+    anchor_schema = {'type': 'string', 'format': 'uuid'}
+    # ?ordering= value -> keyset ordering, ties broken by id
+    orderings = {
+        'created_at': ('created_at', 'id'),
+        '-created_at': ('-created_at', '-id'),
+        'amount': ('amount', 'id'),
+        '-amount': ('-amount', '-id'),
+        'rating': ('professional__rating_average', 'id'),
+        '-rating': ('-professional__rating_average', '-id'),
+    }
+
+    def get_ordering(self, request):
+        return self.orderings.get(request.query_params.get(self.ordering_query_param), self.ordering)
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from alist_backend.serializers import SparseFieldsetMixin
 from .models import Proposal, ProposalMilestone, ProposalAttachment, ProposalView
 from contracts.models import Contract
 
@@ -54,8 +55,8 @@ class ProposalAttachmentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'file_size', 'file_size_display', 'created_at']
 
 
-class ProposalListSerializer(serializers.ModelSerializer):
-    """سيريالايزر لقائمة العروض"""
+class ProposalListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """سيريالايزر لقائمة العروض، يقرأ العدادات من with_list_counts() إن وجدت"""
     professional = UserBasicSerializer(read_only=True)
     contract = ContractBasicSerializer(read_only=True)
     status_display = serializers.CharField(source='get_status_display_ar', read_only=True)
@@ -79,12 +80,18 @@ class ProposalListSerializer(serializers.ModelSerializer):
         read_only_fields = fields
     
     def get_milestones_count(self, obj):
+        if hasattr(obj, 'list_milestones_count'):
+            return obj.list_milestones_count
         return obj.milestones.count()
     
     def get_milestones_total(self, obj):
+        if hasattr(obj, 'list_milestones_total'):
+            return obj.list_milestones_total
         return sum(milestone.amount for milestone in obj.milestones.all())
     
     def get_views_count(self, obj):
+        if hasattr(obj, 'list_views_count'):
+            return obj.list_views_count
         return obj.views.count()
     
     def get_can_be_accepted(self, obj):
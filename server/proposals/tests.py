@@ -1,3 +1,107 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from projects.models import Project, Category
+from .models import Proposal, ProposalMilestone, ProposalView
 
-# Create your tests here.
+User = get_user_model()
+
+
+class ProposalListTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.category = Category.objects.create(name='Plumbing', description='Plumbing work')
+        self.project = Project.objects.create(
+            title='Fix sink',
+            description='Leaking kitchen sink',
+            client=self.client_user,
+            category=self.category,
+            budget_min=100,
+            budget_max=500,
+            location='New York',
+            status='published'
+        )
+        self.professionals = []
+        self.proposals = []
+        for index in range(5):
+            professional = User.objects.create_user(
+                username=f'pro{index}',
+                email=f'pro{index}@example.com',
+                password='testpass123',
+                user_type='home_pro'
+            )
+            proposal = Proposal.objects.create(
+                project=self.project,
+                professional=professional,
+                cover_letter='I can fix it',
+                amount=Decimal(100 + index * 50),
+                timeline='1 day'
+            )
+            ProposalMilestone.objects.create(proposal=proposal, title='Parts', amount=Decimal('40.00'), order=1)
+            ProposalMilestone.objects.create(proposal=proposal, title='Labour', amount=Decimal('60.00'), order=2)
+            ProposalView.objects.create(proposal=proposal, viewer=self.client_user)
+            self.professionals.append(professional)
+            self.proposals.append(proposal)
+        self.api = APIClient()
+
+    def collect(self, url, params):
+        """Follow the next links, returns the pages' results"""
+        pages = []
+        response = self.api.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json()['results'])
+            if not response.json()['next']:
+                return pages
+            response = self.api.get(response.json()['next'])
+
+    def test_keyset_pages_with_bounded_queries(self):
+        """Pages come from one query, two with a cursor, with the counts annotated"""
+        url = reverse('project-proposals', args=[self.project.id])
+        with self.assertNumQueries(1):
+            response = self.api.get(url, {'page_size': 2})
+        data = response.json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(data['results'][0]['milestones_count'], 2)
+        self.assertEqual(Decimal(str(data['results'][0]['milestones_total'])), Decimal('100.00'))
+        self.assertEqual(data['results'][0]['views_count'], 1)
+        self.assertIsNone(data['previous'])
+
+        with self.assertNumQueries(2):
+            response = self.api.get(data['next'])
+        self.assertEqual(len(response.json()['results']), 2)
+
+        pages = self.collect(url, {'page_size': 2})
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        ids = [row['id'] for page in pages for row in page]
+        self.assertEqual(sorted(ids), sorted(str(proposal.id) for proposal in self.proposals))
+
+    def test_filters_ordering_and_fields(self):
+        """ProposalFilter narrows the list, ?ordering= pages by amount, ?fields= trims rows"""
+        url = reverse('proposal-list')
+        pages = self.collect(url, {'page_size': 2, 'ordering': '-amount', 'amount_min': 150, 'fields': 'id,amount'})
+        rows = [row for page in pages for row in page]
+        self.assertEqual([Decimal(row['amount']) for row in rows], [Decimal(300), Decimal(250), Decimal(200), Decimal(150)])
+        self.assertEqual(set(rows[0]), {'id', 'amount'})
+
+        response = self.api.get(url, {'before': 'not-a-uuid'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_professional_proposals(self):
+        """Professionals see only their own proposals, other users are refused"""
+        url = reverse('professional-proposals')
+        self.api.force_authenticate(self.client_user)
+        self.assertEqual(self.api.get(url).status_code, 403)
+
+        self.api.force_authenticate(self.professionals[0])
+        response = self.api.get(url, {'status': 'pending'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()['results']], [str(self.proposals[0].id)])
@@ -4,9 +4,15 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db.models import Q
+from django.db.models import Count, DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django_filters.rest_framework import DjangoFilterBackend
 from datetime import datetime, timedelta
-from .models import Proposal, ProposalMilestone
+from decimal import Decimal
+from .filters import ProposalFilter
+from .models import Proposal, ProposalMilestone, ProposalView
+from .pagination import ProposalPagination
+from .permissions import IsProfessional
 from .serializers import (
     ProposalListSerializer, ProposalDetailSerializer, 
     CreateProposalSerializer
@@ -14,50 +20,52 @@ from .serializers import (
 from contracts.models import Contract, ContractMilestone
 
 
-@api_view(['GET'])
-@permission_classes([AllowAny])  # Allow anyone to view proposals
-def proposal_list(request):
-    """Get all proposals"""
-    try:
-        proposals = Proposal.objects.all().select_related(
-            'professional', 'project'
-        ).prefetch_related('milestones')
-        
-        serializer = ProposalListSerializer(proposals, many=True)
-        return Response({
-            'count': proposals.count(),
-            'results': serializer.data
-        })
-    except Exception as e:
-        return Response(
-            {'error': str(e)}, 
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+def with_list_counts(queryset):
+    """
+    Annotate proposals with the milestone and view counts ProposalListSerializer
+    shows, as subqueries so a page of proposals costs one query
+    """
+    milestones = ProposalMilestone.objects.filter(proposal=OuterRef('pk')).order_by().values('proposal')
+    views = ProposalView.objects.filter(proposal=OuterRef('pk')).order_by().values('proposal')
+    return queryset.annotate(
+        list_milestones_count=Coalesce(Subquery(milestones.annotate(total=Count('pk')).values('total')), 0),
+        list_milestones_total=Coalesce(
+            Subquery(milestones.annotate(total=Sum('amount')).values('total')),
+            Value(Decimal('0')),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+        list_views_count=Coalesce(Subquery(views.annotate(total=Count('pk')).values('total')), 0),
+    )
 
 
-@api_view(['GET'])
-@permission_classes([AllowAny])  # Allow anyone to view project proposals
-def project_proposals(request, project_id):
-    """Get proposals for a specific project"""
-    try:
-        proposals = Proposal.objects.filter(
-            project_id=project_id
-        ).select_related(
-            'professional', 'project'
-        ).prefetch_related('milestones')
-        
-        serializer = ProposalListSerializer(proposals, many=True)
-        return Response({
-            'count': proposals.count(),
-            'results': serializer.data
-        })
-    except Exception as e:
-        return Response(
-            {'error': str(e)}, 
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+class ProposalListView(generics.ListAPIView):
+    """
+    Keyset-paginated proposals, filtered by ProposalFilter and trimmed with
+    ?fields=. Every page is two queries at most (the cursor's row and the
+    page itself), whatever its size.
+    """
+    serializer_class = ProposalListSerializer
+    permission_classes = [AllowAny]  # Allow anyone to view proposals
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ProposalFilter
+    pagination_class = ProposalPagination
+
+    def get_base_queryset(self):
+        return Proposal.objects.all()
+
+    def get_queryset(self):
+        return with_list_counts(
+            self.get_base_queryset().select_related('professional', 'project', 'contract')
         )
 
 
+class ProjectProposalsView(ProposalListView):
+    """Proposals for a specific project"""
+
+    def get_base_queryset(self):
+        return Proposal.objects.filter(project_id=self.kwargs['project_id'])
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_proposal(request):
@@ -407,57 +415,9 @@ def reject_proposal(request, proposal_id):
         )
 
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def professional_proposals(request):
-    """Get all proposals for the authenticated professional"""
-    try:
-        # Check if user is a professional
-        if not request.user.is_professional():
-            return Response(
-                {'error': 'User is not a professional'}, 
-                status=status.HTTP_403_FORBIDDEN
-            )
-        
-        # Get all proposals for this professional
-        proposals = Proposal.objects.filter(
-            professional=request.user
-        ).select_related(
-            'project', 
-            'project__client', 
-            'project__category'
-        ).prefetch_related(
-            'milestones',
-            'attachments_files'
-        ).order_by('-created_at')
-        
-        # Apply filters if provided
-        status_filter = request.GET.get('status')
-        if status_filter:
-            proposals = proposals.filter(status=status_filter)
-        
-        priority_filter = request.GET.get('priority')
-        if priority_filter:
-            proposals = proposals.filter(priority=priority_filter)
-        
-        search_query = request.GET.get('search')
-        if search_query:
-            proposals = proposals.filter(
-                Q(project__title__icontains=search_query) |
-                Q(project__description__icontains=search_query) |
-                Q(cover_letter__icontains=search_query)
-            )
-        
-        # Serialize the proposals
-        serializer = ProposalListSerializer(proposals, many=True)
-        
-        return Response({
-            'proposals': serializer.data,
-            'count': proposals.count()
-        })
-        
-    except Exception as e:
-        return Response(
-            {'error': str(e)}, 
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
+class ProfessionalProposalsView(ProposalListView):
+    """Proposals of the authenticated professional"""
+    permission_classes = [IsAuthenticated, IsProfessional]
+
+    def get_base_queryset(self):
+        return Proposal.objects.filter(professional=self.request.user)
@@ -1,6 +1,5 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from django.db.models import Avg
 from .models import Review
 
 User = get_user_model()
@@ -148,19 +147,8 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
         # Set client from request user
         validated_data['client'] = self.context['request'].user
         
-        review = super().create(validated_data)
-        
-        # Update professional's rating
-        professional = review.professional
-        all_reviews = Review.objects.filter(professional=professional)
-        
-        # Calculate new average rating
-        avg_rating = all_reviews.aggregate(avg=Avg('rating'))['avg']
-        professional.rating_average = avg_rating or 0
-        professional.rating_count = all_reviews.count()
-        professional.save(update_fields=['rating_average', 'rating_count'])
-        
-        return review
+        # The professional's rating is refreshed by dashboard.signals
+        return super().create(validated_data)
 
 
 class ReviewUpdateSerializer(serializers.ModelSerializer):
@@ -204,19 +192,8 @@ class ReviewUpdateSerializer(serializers.ModelSerializer):
         return value
     
     def update(self, instance, validated_data):
-        review = super().update(instance, validated_data)
-        
-        # Update professional's rating
-        professional = review.professional
-        all_reviews = Review.objects.filter(professional=professional)
-        
-        # Calculate new average rating
-        avg_rating = all_reviews.aggregate(avg=Avg('rating'))['avg']
-        professional.rating_average = avg_rating or 0
-        professional.rating_count = all_reviews.count()
-        professional.save(update_fields=['rating_average', 'rating_count'])
-        
-        return review
+        # The professional's rating is refreshed by dashboard.signals
+        return super().update(instance, validated_data)
 
 
 class ReviewListSerializer(serializers.ModelSerializer):
@@ -184,17 +184,9 @@ class ReviewDeleteView(generics.DestroyAPIView):
                 'error': 'Reviews can only be deleted within 24 hours of creation'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Update professional's rating after deletion
-        professional = instance.professional
+        # The professional's rating is refreshed by dashboard.signals
         self.perform_destroy(instance)
         
-        # Recalculate professional's rating
-        all_reviews = Review.objects.filter(professional=professional)
-        avg_rating = all_reviews.aggregate(avg=Avg('rating'))['avg']
-        professional.rating_average = avg_rating or 0
-        professional.rating_count = all_reviews.count()
-        professional.save(update_fields=['rating_average', 'rating_count'])
-        
         return Response(status=status.HTTP_204_NO_CONTENT)
     
     @extend_schema(
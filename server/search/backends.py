@@ -0,0 +1,116 @@
+"""
+Database specific full-text search backends.
+
+Each backend answers ``search(doc_type, tokens, limit)`` with a list of
+(object_id, rank) pairs, best match first, and ``matching_ids(doc_type,
+tokens)`` with an unranked subquery of object ids that can be used in
+``pk__in`` filters. Both run over the SearchDocument table:
+
+- SQLite: an external content FTS5 table kept in sync by triggers, ranked by bm25
+- PostgreSQL: a GIN index on to_tsvector('simple', content), ranked by ts_rank
+- anything else: icontains over the documents, unranked
+
+The FTS5 table, its triggers and the GIN index are created by the search
+app's initial migration.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+FTS_TABLE = 'search_documents_fts'
+
+# 'simple' keeps Arabic and English words as-is instead of stemming them
+POSTGRES_SEARCH_CONFIG = 'simple'
+
+_backend = None
+
+
+class SimpleSearchBackend:
+    """Fallback used when the database has no full-text index"""
+
+    def documents(self, doc_type, tokens):
+        from .models import SearchDocument
+
+        documents = SearchDocument.objects.filter(doc_type=doc_type)
+        for token in tokens:
+            documents = documents.filter(content__icontains=token)
+        return documents
+
+    def search(self, doc_type, tokens, limit):
+        object_ids = self.documents(doc_type, tokens).order_by('-updated_at').values_list(
+            'object_id', flat=True
+        )[:limit]
+        return [(object_id, 1.0) for object_id in object_ids]
+
+    def matching_ids(self, doc_type, tokens):
+        return self.documents(doc_type, tokens).values('object_id')
+
+
+class SQLiteFTSBackend:
+
+    def build_query(self, tokens):
+        # Quoted prefix terms, implicitly AND-ed by FTS5
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, doc_type, tokens, limit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT d.object_id, bm25({FTS_TABLE}) AS score '
+                f'FROM {FTS_TABLE} JOIN search_documents d ON d.id = {FTS_TABLE}.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s AND d.doc_type = %s '
+                f'ORDER BY score LIMIT %s',
+                [self.build_query(tokens), doc_type, limit]
+            )
+            # bm25 is lower for better matches
+            return [(object_id, -score) for object_id, score in cursor.fetchall()]
+
+    def matching_ids(self, doc_type, tokens):
+        return RawSQL(
+            f'SELECT d.object_id FROM {FTS_TABLE} JOIN search_documents d ON d.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND d.doc_type = %s',
+            [self.build_query(tokens), doc_type]
+        )
+
+
+class PostgresSearchBackend:
+
+    def build_query(self, tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def search(self, doc_type, tokens, limit):
+        with connection.cursor() as cursor:
+            # The vector expression must match the GIN index definition exactly
+            vector = f"to_tsvector('{POSTGRES_SEARCH_CONFIG}', content)"
+            cursor.execute(
+                f"SELECT object_id, ts_rank({vector}, query) AS score "
+                f"FROM search_documents, to_tsquery('{POSTGRES_SEARCH_CONFIG}', %s) AS query "
+                f"WHERE doc_type = %s AND {vector} @@ query "
+                f"ORDER BY score DESC LIMIT %s",
+                [self.build_query(tokens), doc_type, limit]
+            )
+            return cursor.fetchall()
+
+    def matching_ids(self, doc_type, tokens):
+        return RawSQL(
+            f"SELECT object_id FROM search_documents WHERE doc_type = %s "
+            f"AND to_tsvector('{POSTGRES_SEARCH_CONFIG}', content) @@ to_tsquery('{POSTGRES_SEARCH_CONFIG}', %s)",
+            [doc_type, self.build_query(tokens)]
+        )
+
+
+def _default_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        return SQLiteFTSBackend()
+    return SimpleSearchBackend()
+
+
+def get_backend():
+    """The configured SEARCH_BACKEND, or the best one for the database"""
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'SEARCH_BACKEND', '')
+        _backend = import_string(backend_path)() if backend_path else _default_backend()
+    return _backend
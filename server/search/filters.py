@@ -0,0 +1,35 @@
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from .index import matching, rank_queryset
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    Drop-in replacement for SearchFilter backed by the full-text index.
+    Views set ``search_doc_type``; results are ordered by rank unless the
+    client asked for an explicit ordering.
+    """
+    search_param = api_settings.SEARCH_PARAM
+    ordering_param = api_settings.ORDERING_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+
+        if request.query_params.get(self.ordering_param):
+            # Every match in the requested order, the ranks aren't needed
+            return queryset.filter(matching(view.search_doc_type, query))
+        return rank_queryset(queryset, view.search_doc_type, query).order_by('-search_rank', '-pk')
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.search_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Full-text search term.',
+                'schema': {'type': 'string'},
+            },
+        ]
@@ -0,0 +1,151 @@
+"""
+Full-text search index.
+
+Projects, users and messages are flattened into SearchDocument rows whose
+``content`` is indexed by the database (see backends.py). Documents are
+updated from post_save/post_delete signals, so searches only touch the
+index instead of running icontains scans over the source tables.
+"""
+import re
+from dataclasses import dataclass, field
+
+from django.apps import apps
+from django.db.models import Case, FloatField, Q, Value, When
+
+from .backends import get_backend
+from .models import SearchDocument
+
+# Upper bound on ranked hits returned for a single query
+MAX_RESULTS = 500
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+@dataclass(frozen=True)
+class SearchSpec:
+    doc_type: str
+    model: str
+    fields: tuple
+    # Only index instances for which this returns True (others are removed)
+    condition: object = field(default=None, compare=False)
+
+    def get_model(self, app_registry=apps):
+        return app_registry.get_model(self.model)
+
+    def should_index(self, instance):
+        return self.condition is None or self.condition(instance)
+
+    def content(self, instance):
+        parts = []
+        for name in self.fields:
+            value = getattr(instance, name, None)
+            if isinstance(value, (list, tuple)):
+                parts.extend(str(item) for item in value if item)
+            elif value:
+                parts.append(str(value))
+        return ' '.join(parts)
+
+
+SEARCH_SPECS = {
+    spec.doc_type: spec for spec in [
+        SearchSpec('project', 'projects.Project', ('title', 'description', 'location')),
+        SearchSpec('user', 'authentication.User', ('first_name', 'last_name', 'company_name', 'skills')),
+        SearchSpec('message', 'messaging.Message', ('content',),
+                   condition=lambda message: not message.is_deleted),
+    ]
+}
+
+
+def tokenize(query):
+    return _TOKEN.findall(str(query).lower())
+
+
+def index_instance(spec, instance):
+    """Create, update or drop the search document of one instance"""
+    if not spec.should_index(instance):
+        remove_instance(spec, instance)
+        return
+    SearchDocument.objects.update_or_create(
+        doc_type=spec.doc_type,
+        object_id=instance.pk,
+        defaults={'content': spec.content(instance)},
+    )
+
+
+def index_new_instances(spec, instances):
+    """Bulk insert the documents of freshly created instances"""
+    SearchDocument.objects.bulk_create([
+        SearchDocument(doc_type=spec.doc_type, object_id=instance.pk, content=spec.content(instance))
+        for instance in instances if spec.should_index(instance)
+    ])
+
+
+def remove_instance(spec, instance):
+    SearchDocument.objects.filter(doc_type=spec.doc_type, object_id=instance.pk).delete()
+
+
+def build_documents(spec, app_registry=apps, document_model=SearchDocument, batch_size=1000):
+    """Yield unsaved documents for every indexable instance of a spec"""
+    queryset = spec.get_model(app_registry).objects.all()
+    if spec.condition is None:
+        queryset = queryset.only('pk', *spec.fields)
+    for instance in queryset.iterator(chunk_size=batch_size):
+        if spec.should_index(instance):
+            yield document_model(doc_type=spec.doc_type, object_id=instance.pk, content=spec.content(instance))
+
+
+def rebuild_index(doc_types=None, batch_size=1000):
+    """Drop and recreate the documents of the given types (all by default)"""
+    rebuilt = {}
+    for doc_type in doc_types or SEARCH_SPECS:
+        spec = SEARCH_SPECS[doc_type]
+        SearchDocument.objects.filter(doc_type=doc_type).delete()
+        documents = list(build_documents(spec, batch_size=batch_size))
+        SearchDocument.objects.bulk_create(documents, batch_size=batch_size)
+        rebuilt[doc_type] = len(documents)
+    return rebuilt
+
+
+def search(doc_type, query, limit=MAX_RESULTS):
+    """
+    Ranked hits for a query as a list of (object_id, rank) pairs, best first.
+    Every token of the query must match the start of a word.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+    return get_backend().search(doc_type, tokens, limit)
+
+
+def search_ids(doc_type, query, limit=MAX_RESULTS):
+    return [object_id for object_id, _ in search(doc_type, query, limit)]
+
+
+def matching(doc_type, query, field='pk'):
+    """
+    Q object keeping rows whose ``field`` is the id of a matching document.
+    Unranked and unlimited, the match runs as a subquery in the database.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return Q(pk__in=[])
+    return Q(**{f'{field}__in': get_backend().matching_ids(doc_type, tokens)})
+
+
+def rank_queryset(queryset, doc_type, query, limit=MAX_RESULTS):
+    """
+    Restrict ``queryset`` to every row matching a query and annotate each
+    with its ``search_rank`` (higher is better). Only the ``limit`` best hits
+    are ranked, other matches get 0, so filters the caller adds afterwards
+    still see the whole match set. Ordering is left to the caller.
+    """
+    hits = search(doc_type, query, limit)
+    if not hits:
+        return queryset.none()
+    return queryset.filter(matching(doc_type, query)).annotate(
+        search_rank=Case(
+            *[When(pk=object_id, then=Value(rank)) for object_id, rank in hits],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
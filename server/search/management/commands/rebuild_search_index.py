@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from search.index import SEARCH_SPECS, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search documents from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            action='append',
+            dest='doc_types',
+            choices=sorted(SEARCH_SPECS),
+            help='Limit to the given document type (may be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Rebuilding search index...')
+        rebuilt = rebuild_index(options['doc_types'])
+        for doc_type, count in rebuilt.items():
+            self.stdout.write(f'  {doc_type}: {count} documents')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {sum(rebuilt.values())} documents'))
@@ -0,0 +1,23 @@
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    مستند البحث النصي
+    One row per indexed object; the database specific full-text index
+    (SQLite FTS5 or a Postgres GIN index) is built over ``content``.
+    """
+    doc_type = models.CharField(max_length=20, help_text='Indexed model, e.g. project, user, message')
+    object_id = models.PositiveBigIntegerField()
+    content = models.TextField(blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'search_documents'
+        verbose_name = 'Search Document'
+        verbose_name_plural = 'Search Documents'
+        unique_together = ['doc_type', 'object_id']
+
+    def __str__(self):
+        return f"{self.doc_type} #{self.object_id}"
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+
+from .index import SEARCH_SPECS, index_instance, remove_instance
+
+
+def _save_handler(spec):
+    def update_search_document(sender, instance, raw=False, update_fields=None, **kwargs):
+        """Re-index an instance when one of its indexed fields may have changed"""
+        if raw:
+            return
+        if update_fields is not None and spec.condition is None and not set(spec.fields) & set(update_fields):
+            return
+        index_instance(spec, instance)
+    return update_search_document
+
+
+def _delete_handler(spec):
+    def remove_search_document(sender, instance, **kwargs):
+        remove_instance(spec, instance)
+    return remove_search_document
+
+
+def connect_signals():
+    for spec in SEARCH_SPECS.values():
+        model = spec.get_model()
+        post_save.connect(_save_handler(spec), sender=model, weak=False,
+                          dispatch_uid=f'search_index_save_{spec.doc_type}')
+        post_delete.connect(_delete_handler(spec), sender=model, weak=False,
+                            dispatch_uid=f'search_index_delete_{spec.doc_type}')
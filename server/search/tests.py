@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from messaging.models import Conversation, Message
+from projects.models import Category, Project
+from .index import rank_queryset, rebuild_index, search, search_ids
+from .models import SearchDocument
+
+User = get_user_model()
+
+
+class FullTextSearchTest(TestCase):
+    def setUp(self):
+        """Set up test data"""
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client',
+            first_name='Sara',
+            last_name='Hassan'
+        )
+        self.professional_user = User.objects.create_user(
+            username='professional1',
+            email='professional1@example.com',
+            password='testpass123',
+            user_type='home_pro',
+            first_name='Omar',
+            last_name='Nabil',
+            company_name='Bright Plumbing Co',
+            skills=['Plumbing', 'Water Heaters']
+        )
+        self.category = Category.objects.create(name='Bathroom Renovation', slug='bathroom-renovation')
+
+    def create_project(self, title, description='Project description', location='New York'):
+        return Project.objects.create(
+            title=title,
+            description=description,
+            client=self.client_user,
+            category=self.category,
+            location=location,
+            status='published'
+        )
+
+    def test_documents_follow_saves_and_deletes(self):
+        """Saving, soft-deleting and deleting rows keeps the index in sync"""
+        project = self.create_project('Bathroom tiling')
+        self.assertEqual(search_ids('project', 'tiling'), [project.id])
+
+        project.title = 'Bathroom painting'
+        project.save()
+        self.assertEqual(search_ids('project', 'tiling'), [])
+        self.assertEqual(search_ids('project', 'paint'), [project.id])
+
+        conversation = Conversation.objects.create()
+        message = Message.objects.create(conversation=conversation, sender=self.client_user, content='Leaking pipe')
+        self.assertEqual(search_ids('message', 'pipe'), [message.id])
+        message.is_deleted = True
+        message.save()
+        self.assertEqual(search_ids('message', 'pipe'), [])
+
+        project.delete()
+        self.assertFalse(SearchDocument.objects.filter(doc_type='project', object_id=project.id).exists())
+
+    def test_ranked_prefix_search_and_rebuild(self):
+        """Every token must match a word prefix and better matches rank first"""
+        kitchen = self.create_project('Kitchen plumbing', description='Plumbing for a kitchen sink')
+        garden = self.create_project('Garden lights', description='Outdoor plumbing and wiring')
+
+        self.assertEqual(search_ids('project', 'plumb'), [kitchen.id, garden.id])
+        self.assertEqual(search_ids('project', 'plumbing garden'), [garden.id])
+        self.assertEqual(search_ids('user', 'bright plumb'), [self.professional_user.id])
+        self.assertEqual(search('project', '!!!'), [])
+
+        SearchDocument.objects.all().delete()
+        rebuild_index()
+        self.assertEqual(search_ids('project', 'plumb'), [kitchen.id, garden.id])
+
+    def test_matches_beyond_the_ranked_hits_are_kept(self):
+        """Filters and orderings apply to every match, not only the best ranked ones"""
+        kitchen = self.create_project('Kitchen plumbing', description='Plumbing for a kitchen sink')
+        garden = self.create_project('Garden lights', description='Outdoor plumbing and wiring')
+
+        ranked = rank_queryset(Project.objects.all(), 'project', 'plumb', limit=1).order_by('-search_rank', '-pk')
+        self.assertEqual([project.id for project in ranked], [kitchen.id, garden.id])
+        self.assertEqual(ranked[1].search_rank, 0)
+
+        response = self.client.get('/api/projects/', {'search': 'plumb', 'ordering': '-created_at'})
+        self.assertEqual([item['id'] for item in response.json()['results']], [garden.id, kitchen.id])
+
+    def test_search_endpoints(self):
+        """Project list, user search and conversation search use the index"""
+        project = self.create_project('Shower repair')
+        conversation = Conversation.objects.create(project=project)
+        conversation.participants.add(self.client_user, self.professional_user)
+        Message.objects.create(conversation=conversation, sender=self.client_user, content='Grout is cracked')
+        self.client.force_login(self.client_user)
+
+        response = self.client.get('/api/projects/', {'search': 'shower'})
+        self.assertEqual([item['id'] for item in response.json()['results']], [project.id])
+
+        response = self.client.get('/api/auth/users/search/', {'q': 'heaters'})
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.professional_user.id])
+
+        for query in ['grout', 'omar', 'shower']:
+            response = self.client.get('/api/messages/conversations/search/', {'query': query})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([item['id'] for item in response.json()['results']], [conversation.id])
+
+        response = self.client.get('/api/messages/conversations/search/', {'query': 'roof'})
+        self.assertEqual(response.json()['results'], [])
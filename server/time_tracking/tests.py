@@ -1,3 +1,70 @@
+from datetime import date, time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from projects.models import Project, Category
+from .models import TimeEntry
+
+User = get_user_model()
+
+
+class TimeSummaryTest(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(
+            username='client1',
+            email='client1@example.com',
+            password='testpass123',
+            user_type='client'
+        )
+        self.professional = User.objects.create_user(
+            username='pro1',
+            email='pro1@example.com',
+            password='testpass123',
+            user_type='home_pro'
+        )
+        self.project = Project.objects.create(
+            title='Fix sink',
+            description='Leaking kitchen sink',
+            client=self.client_user,
+            category=Category.objects.create(name='Plumbing', description='Plumbing work'),
+            budget_min=100,
+            budget_max=200,
+            location='New York',
+            status='published'
+        )
+        self.api = APIClient()
+
+    def create_entry(self, status, minutes, cost):
+        return TimeEntry.objects.create(
+            project=self.project,
+            professional=self.professional,
+            task='Replace pipe',
+            date=date.today(),
+            start_time=time(9, 0),
+            end_time=time(10, 0),
+            duration=minutes,
+            hourly_rate=Decimal('50.00'),
+            total_cost=Decimal(cost),
+            status=status
+        )
+
+    def test_summary_comes_from_one_query(self):
+        """Totals and counts per status are aggregated together"""
+        self.create_entry('pending', 60, '50.00')
+        self.create_entry('approved', 90, '75.00')
+        self.create_entry('approved', 30, '25.00')
+        self.api.force_authenticate(self.professional)
+
+        with self.assertNumQueries(1):
+            response = self.api.get('/api/time-tracking/summary/')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_hours'], 3)
+        self.assertEqual(response.data['total_cost'], Decimal('150.00'))
+        self.assertEqual(
+            [response.data[key] for key in ('total_entries', 'pending_entries', 'approved_entries', 'rejected_entries')],
+            [3, 1, 2, 0]
+        )
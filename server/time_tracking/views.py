@@ -1,10 +1,11 @@
 from rest_framework import generics, permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q, Sum
+from django.db.models import Count, Q, Sum
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import OrderingFilter
 from drf_spectacular.utils import extend_schema
+from alist_backend.aggregates import aggregate_totals, count_by
 from .models import TimeEntry
 from .serializers import TimeEntrySerializer, TimeEntryCreateSerializer, TimeEntryUpdateSerializer
 
@@ -172,16 +173,19 @@ def time_summary(request):
     else:
         entries = TimeEntry.objects.filter(professional=user)
     
-    summary = entries.aggregate(
+    summary = aggregate_totals(
+        entries,
         total_hours=Sum('duration'),
-        total_cost=Sum('total_cost')
+        total_cost=Sum('total_cost'),
+        total_entries=Count('pk'),
+        **count_by('status', ['pending', 'approved', 'rejected'], prefix='status_')
     )
     
     return Response({
-        'total_hours': (summary['total_hours'] or 0) / 60,
-        'total_cost': summary['total_cost'] or 0,
-        'total_entries': entries.count(),
-        'pending_entries': entries.filter(status='pending').count(),
-        'approved_entries': entries.filter(status='approved').count(),
-        'rejected_entries': entries.filter(status='rejected').count()
+        'total_hours': summary['total_hours'] / 60,
+        'total_cost': summary['total_cost'],
+        'total_entries': summary['total_entries'],
+        'pending_entries': summary['status_pending'],
+        'approved_entries': summary['status_approved'],
+        'rejected_entries': summary['status_rejected']
     })